@@ -3,12 +3,17 @@ from robyn.robyn import Response
 from subRouters.v1.user import userRouterV1
 from subRouters.v1.service import serviceRouterV1
 from subRouters.v1.api import apiRouterV1
+from mailer import mail_queue
+from services.outbox import outbox_dispatcher
+from database.database import async_session
 
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 PORT = int(os.getenv("PORT") or 1024)
+# 事件发件箱分发器运行位置：app（默认，在应用进程内运行）或 external（独立运行 python -m services.outbox）
+OUTBOX_DISPATCH = os.getenv("OUTBOX_DISPATCH") or "app"
 
 
 app = Robyn(__file__)
@@ -26,6 +31,18 @@ def handle_exception(error):
     return Response(status_code=500, headers={}, description=f"error msg: {error}")
 
 
+@app.startup_handler
+async def start_outbox_dispatcher():
+    if OUTBOX_DISPATCH == "app":
+        outbox_dispatcher.start(async_session)
+
+
+# 进程退出前尽量发送完队列中的通知邮件
+@app.shutdown_handler
+async def flush_mail_queue():
+    await mail_queue.flush()
+
+
 @app.get("/")
 async def index():
     return "OK"
@@ -2,7 +2,7 @@ from robyn.robyn import Request, Identity
 from robyn.authentication import AuthenticationHandler
 
 from database.database import session
-from services.user import decodeAccessToken, userGetUserById
+from services.user import IDENTITY_CACHE, decodeAccessToken, userGetCurrentUser
 
 from database.enums import UserLevel
 
@@ -21,14 +21,25 @@ class AuthHandler(AuthenticationHandler):
             id = payload["id"]
         except Exception:
             return None
-        with session() as db:
-            user = userGetUserById(db, id)["user"]
-            # 检查接口权限
-            api_path = request.url.path
-            user_level = user["level"]
-            if (
-                api_path in API_PERMISSION_MAP
-                and user_level.value > API_PERMISSION_MAP[api_path].value
-            ):  # 在API_PERMISSION_MAP中，且用户等级低于最低要求，拒绝访问
-                return None
-        return Identity(claims={"user": f"{ user }"})
+        # 身份缓存命中时无需访问数据库
+        user = IDENTITY_CACHE.get(id)
+        if user is None:
+            with session() as db:
+                user = userGetCurrentUser(db, id)
+        if user is None:
+            return None
+        # 检查接口权限
+        api_path = request.url.path
+        if (
+            api_path in API_PERMISSION_MAP
+            and user.level.value > API_PERMISSION_MAP[api_path].value
+        ):  # 在API_PERMISSION_MAP中，且用户等级低于最低要求，拒绝访问
+            return None
+        # 身份放入request.identity，供接口通过 userGetUserIdByAccessToken 直接读取
+        return Identity(
+            claims={
+                "id": str(user.id),
+                "username": user.username,
+                "level": str(user.level.value),
+            }
+        )
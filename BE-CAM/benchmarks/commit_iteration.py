@@ -0,0 +1,202 @@
+# service 迭代提交（serviceCommitIteration）回归基准测试
+# 在 .env 中 DATABASE_URI 指向的数据库中构造一个大服务（默认 300 个 api、共 10k 个参数），
+# 多轮执行 发起迭代 -> 提交迭代，统计耗时后清理全部测试数据
+# 用法（在 BE-CAM 目录下）：
+#   uv run python -m benchmarks.commit_iteration --apis 300 --params 10000 --rounds 3
+# 通过 --changed 指定每轮迭代中修改的 api 数量（提交为增量发布，耗时与变更量相关）
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from sqlalchemy import insert
+
+from database.database import session
+from database.enums import ApiLevel, HttpMethod, ParamLocation, ParamType
+from database.models import (
+    User,
+    Service,
+    ServiceIteration,
+    Api,
+    RequestParam,
+    ResponseParam,
+    ApiDraft,
+)
+from services.bulk import reserveIds
+from services.parampath import paramPath
+from services.overlay import materializeApiDraft, toVirtualDraftId
+from services.service import serviceStartIteration, serviceCommitIteration
+
+
+# 为一个api生成count个参数的树（每个object节点最多width个子节点），返回按层级排序的参数行
+def _buildParamRows(ids: list, api_id: int, count: int, width: int, is_request: bool):
+    rows = []
+    parents = [(None, "")]  # (父参数id, 父参数路径)
+    while len(rows) < count:
+        next_parents = []
+        for parent, parent_path in parents:
+            for i in range(width):
+                if len(rows) >= count:
+                    break
+                param_id = ids[len(rows)]
+                row = {
+                    "id": param_id,
+                    "api_id": api_id,
+                    "parent_param_id": parent,
+                    "tree_path": paramPath(parent_path, param_id),
+                    "name": f"field_{param_id}_{i}",
+                    "type": ParamType.OBJECT,
+                    "required": i % 2 == 0,
+                    "description": "benchmark field",
+                    "example": "{}",
+                }
+                if is_request:
+                    row["location"] = ParamLocation.BODY
+                else:
+                    row["status_code"] = 200
+                rows.append(row)
+                next_parents.append((param_id, row["tree_path"]))
+        parents = next_parents
+    return rows
+
+
+def seedService(db, api_count: int, param_count: int, width: int) -> tuple:
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        username=f"bench-{suffix}",
+        password=User.hashPassword(suffix),
+        email=f"bench-{suffix}@example.com",
+    )
+    db.add(user)
+    db.flush()
+    service = Service(
+        service_uuid=f"bench/commit/{suffix}",
+        owner_id=user.id,
+        version="0.0.1",
+        description="commit iteration benchmark",
+    )
+    db.add(service)
+    db.flush()
+    api_ids = reserveIds(db, Api, api_count)
+    db.execute(
+        insert(Api),
+        [
+            {
+                "id": api_id,
+                "service_id": service.id,
+                "owner_id": user.id,
+                "name": f"bench{api_id}",
+                "method": HttpMethod.POST,
+                "path": f"/bench/{api_id}",
+                "description": "benchmark api",
+                "level": ApiLevel.P2,
+            }
+            for api_id in api_ids
+        ],
+    )
+    # 参数平均分给每个api，一半为请求参数，一半为响应参数
+    per_api = max(param_count // api_count // 2, 1)
+    req_ids = reserveIds(db, RequestParam, per_api * api_count)
+    resp_ids = reserveIds(db, ResponseParam, per_api * api_count)
+    req_rows, resp_rows = [], []
+    for i, api_id in enumerate(api_ids):
+        window = slice(i * per_api, (i + 1) * per_api)
+        req_rows += _buildParamRows(req_ids[window], api_id, per_api, width, True)
+        resp_rows += _buildParamRows(resp_ids[window], api_id, per_api, width, False)
+    db.execute(insert(RequestParam), req_rows)
+    db.execute(insert(ResponseParam), resp_rows)
+    db.commit()
+    return user.id, service.id
+
+
+def cleanup(db, user_id: int, service_id: int) -> None:
+    iteration_ids = [
+        i.id
+        for i in db.query(ServiceIteration).filter(
+            ServiceIteration.service_id == service_id
+        )
+    ]
+    # 参数通过 CASCADE 删除
+    db.query(ApiDraft).filter(ApiDraft.service_iteration_id.in_(iteration_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(ServiceIteration).filter(ServiceIteration.service_id == service_id).delete(
+        synchronize_session=False
+    )
+    db.query(Api).filter(Api.service_id == service_id).delete(
+        synchronize_session=False
+    )
+    db.query(Service).filter(Service.id == service_id).delete(
+        synchronize_session=False
+    )
+    db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+    db.commit()
+
+
+# 修改迭代中前count个api的描述，模拟一次局部变更（写时复制迭代中先物化为草稿）
+def touchDrafts(db, service_iteration_id: int, count: int, tag: str) -> None:
+    service_iteration = db.get(ServiceIteration, service_iteration_id)
+    api_ids = [
+        a.id
+        for a in db.query(Api.id)
+        .filter(Api.service_id == service_iteration.service_id)
+        .order_by(Api.id)
+        .limit(count)
+    ]
+    for api_id in api_ids:
+        api_draft = materializeApiDraft(
+            db=db,
+            service_iteration=service_iteration,
+            api_draft_id=toVirtualDraftId(api_id),
+        )
+        api_draft.description = f"benchmark api {tag}"
+    db.flush()
+
+
+async def run(
+    api_count: int, param_count: int, width: int, rounds: int, changed: int
+) -> None:
+    with session() as db:
+        start = time.perf_counter()
+        user_id, service_id = seedService(db, api_count, param_count, width)
+        print(f"seed: {time.perf_counter() - start:.3f}s")
+    start_times, commit_times = [], []
+    try:
+        for i in range(rounds):
+            with session() as db:
+                start = time.perf_counter()
+                res = serviceStartIteration(db=db, service_id=service_id, user_id=user_id)
+                start_times.append(time.perf_counter() - start)
+                touchDrafts(db, res["service_iteration_id"], changed, str(i))
+                start = time.perf_counter()
+                res = await serviceCommitIteration(
+                    db=db,
+                    service_iteration_id=res["service_iteration_id"],
+                    new_version=f"1.0.{i}",
+                    user_id=user_id,
+                )
+                commit_times.append(time.perf_counter() - start)
+                assert res["status"] == 200, res
+    finally:
+        with session() as db:
+            cleanup(db, user_id, service_id)
+    print(
+        f"apis: {api_count}, params: {param_count}, changed apis: {changed}, rounds: {rounds}"
+    )
+    print(
+        f"startIteration  median: {statistics.median(start_times):.3f}s, max: {max(start_times):.3f}s"
+    )
+    print(
+        f"commitIteration median: {statistics.median(commit_times):.3f}s, max: {max(commit_times):.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apis", type=int, default=300)
+    parser.add_argument("--params", type=int, default=10000)
+    parser.add_argument("--width", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--changed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.apis, args.params, args.width, args.rounds, args.changed))
@@ -0,0 +1,116 @@
+# 同步 / 异步数据库访问的并发吞吐基准测试
+# 模拟一个worker上同时处理的多个请求：每个请求打开一个会话并调用 userGetUserById + 用户搜索，
+# 分别使用同步Session（阻塞事件循环，请求实际串行执行）与AsyncSession（asyncpg，请求的数据库等待可以重叠），
+# 统计总耗时、吞吐量与单个请求延迟，结束后清理测试数据
+# 用法（在 BE-CAM 目录下）：
+#   uv run python -m benchmarks.db_load --requests 2000 --concurrency 50
+# 通过 --latency 为每个请求额外执行 pg_sleep（毫秒），模拟数据库位于远端时的网络往返耗时
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from sqlalchemy import text
+
+from database.database import async_session, session
+from database.models import User
+from services.user import (
+    userGetUserById,
+    userGetUserByIdAsync,
+    userGetUserByUsernameOrNicknameOrEmail,
+    userGetUserByUsernameOrNicknameOrEmailAsync,
+)
+
+
+def seedUser(db) -> tuple:
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        username=f"bench-{suffix}",
+        password=User.hashPassword(suffix),
+        email=f"bench-{suffix}@example.com",
+    )
+    db.add(user)
+    db.commit()
+    return user.id, user.username
+
+
+def cleanup(db, user_id: int) -> None:
+    db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+    db.commit()
+
+
+async def syncRequest(user_id: int, keyword: str, latency: float) -> None:
+    with session() as db:
+        if latency:
+            db.execute(text("SELECT pg_sleep(:s)"), {"s": latency})
+        assert userGetUserById(db=db, id=user_id)["status"] == 200
+        userGetUserByUsernameOrNicknameOrEmail(
+            db=db, username_or_nickname_or_email=keyword
+        )
+
+
+async def asyncRequest(user_id: int, keyword: str, latency: float) -> None:
+    async with async_session() as db:
+        if latency:
+            await db.execute(text("SELECT pg_sleep(:s)"), {"s": latency})
+        assert (await userGetUserByIdAsync(db=db, id=user_id))["status"] == 200
+        await userGetUserByUsernameOrNicknameOrEmailAsync(
+            db=db, username_or_nickname_or_email=keyword
+        )
+
+
+# 以concurrency个并发任务执行count个请求，返回 (总耗时, 各请求耗时)
+async def load(request, count: int, concurrency: int) -> tuple:
+    latencies = []
+    remaining = iter(range(count))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, count: int, elapsed: float, latencies: list) -> None:
+    latencies.sort()
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    print(
+        f"{name}: {elapsed:.3f}s, {count / elapsed:.0f} req/s, "
+        f"median: {statistics.median(latencies) * 1000:.1f}ms, p99: {p99 * 1000:.1f}ms"
+    )
+
+
+async def run(count: int, concurrency: int, latency_ms: float) -> None:
+    with session() as db:
+        user_id, username = seedUser(db)
+    latency = latency_ms / 1000
+    try:
+        # 预热两个连接池
+        await load(lambda: syncRequest(user_id, username, 0), concurrency, 1)
+        await load(lambda: asyncRequest(user_id, username, 0), concurrency, concurrency)
+        sync_elapsed, sync_latencies = await load(
+            lambda: syncRequest(user_id, username, latency), count, concurrency
+        )
+        async_elapsed, async_latencies = await load(
+            lambda: asyncRequest(user_id, username, latency), count, concurrency
+        )
+    finally:
+        with session() as db:
+            cleanup(db, user_id)
+    print(f"requests: {count}, concurrency: {concurrency}, latency: {latency_ms}ms")
+    report("sync ", count, sync_elapsed, sync_latencies)
+    report("async", count, async_elapsed, async_latencies)
+    print(f"throughput: {sync_elapsed / async_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency))
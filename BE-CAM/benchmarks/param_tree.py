@@ -0,0 +1,268 @@
+# 参数树微基准：对比原实现（toJson后多趟整理 + 递归构建Schema）与参数树引擎（services/paramtree.py）
+# 不依赖数据库，在内存中构造一个宽而深的参数树（默认共 20k 个参数），分别统计api详情（嵌套参数字典）与
+# OpenAPI Schema 的耗时（校验两种实现输出完全一致），并验证深层嵌套（超过Python递归深度）的参数树可以正常输出
+# 用法（在 BE-CAM 目录下）：
+#   uv run python -m benchmarks.param_tree --params 20000 --rounds 5
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from database.enums import ParamLocation, ParamType
+from database.models import RequestParam, ResponseParam
+from services.parampath import paramPath
+from services.paramtree import ParamTree
+from services.utils import (
+    _build_param_schema,
+    _get_type_schema,
+    organizeReqParams,
+    organizeRespParams,
+)
+
+
+# 原 organizeReqParams / organizeRespParams 实现，作为对照
+def legacyOrganizeReqParams(request_params: list) -> dict:
+    request_params_raw = [rp.toJson() for rp in request_params]
+    request_params_by_location = {
+        ParamLocation.QUERY.value: [],
+        ParamLocation.PATH.value: [],
+        ParamLocation.HEADER.value: [],
+        ParamLocation.COOKIE.value: [],
+        ParamLocation.BODY.value: [],
+    }
+    req_index = {p["id"]: p for p in request_params_raw}
+    for p in request_params_raw:
+        for field in ("location", "type", "array_child_type"):
+            p[field] = getattr(p.get(field), "value", p.get(field))
+    for p in request_params_raw:
+        parent_id = p.get("parent_param_id")
+        if parent_id:
+            parent = req_index.get(parent_id)
+            if parent is not None:
+                parent.setdefault("children_params", []).append(p)
+        else:
+            request_params_by_location[p["location"]].append(p)
+    return request_params_by_location
+
+
+def legacyOrganizeRespParams(response_params: list) -> dict:
+    response_params_raw = [rp.toJson() for rp in response_params]
+    resp_index = {p["id"]: p for p in response_params_raw}
+    for p in response_params_raw:
+        for field in ("type", "array_child_type"):
+            p[field] = getattr(p.get(field), "value", p.get(field))
+    response_params_by_status_code = {}
+    for p in response_params_raw:
+        parent_id = p.get("parent_param_id")
+        if parent_id:
+            parent = resp_index.get(parent_id)
+            if parent is not None:
+                parent.setdefault("children_params", []).append(p)
+        else:
+            key = str(p["status_code"])
+            response_params_by_status_code.setdefault(key, []).append(p)
+    return response_params_by_status_code
+
+
+# 原 _build_param_schema 实现（递归，参数为整理后的字典），作为对照
+def legacyParamSchema(param: dict) -> dict:
+    schema = _get_type_schema(param.get("type", "string"))
+
+    def properties(target: dict) -> None:
+        props, required = {}, []
+        for child in param.get("children_params", []):
+            props[child["name"]] = legacyParamSchema(child)
+            if child.get("required"):
+                required.append(child["name"])
+        if props:
+            target["properties"] = props
+            target["additionalProperties"] = False
+        if required:
+            target["required"] = required
+
+    if param.get("type") == "object":
+        properties(schema)
+    elif param.get("type") == "array":
+        child_type = param.get("array_child_type", "string")
+        if child_type == "object":
+            schema["items"] = {"type": "object"}
+            properties(schema["items"])
+        else:
+            schema["items"] = _get_type_schema(child_type)
+    if param.get("example"):
+        schema["example"] = param.get("example")
+    if param.get("default_value"):
+        if param.get("default_value") in ("null", "undefined"):
+            schema["default"] = None
+        else:
+            match param.get("type"):
+                case "string":
+                    schema["default"] = str(param.get("default_value"))
+                case "int":
+                    schema["default"] = int(param.get("default_value"))
+                case "double":
+                    schema["default"] = float(param.get("default_value"))
+                case "boolean":
+                    schema["default"] = bool(param.get("default_value"))
+                case _:
+                    schema["default"] = param.get("default_value")
+    return schema
+
+
+# 每个object参数有4个子参数，参数按层级编号（父参数id小于子参数）
+def buildParams(param_count: int) -> tuple:
+    now = datetime.now()
+    request_params, response_params = [], []
+    paths = {None: ""}
+    for i in range(param_count // 2):
+        is_leaf = i * 4 + 1 >= param_count // 2
+        param_type = ParamType.STRING if is_leaf else ParamType.OBJECT
+        paths[i + 1] = paramPath(paths[i // 4 or None], i + 1)
+        request_params.append(
+            RequestParam(
+                id=i + 1,
+                api_id=1,
+                parent_param_id=i // 4 or None,
+                name=f"field_{i}",
+                location=ParamLocation.BODY if i < 4 else ParamLocation.QUERY,
+                type=param_type,
+                required=i % 2 == 0,
+                default_value="x" if is_leaf else None,
+                description="benchmark field",
+                example=None,
+                array_child_type=None,
+                tree_path=paths[i + 1],
+                updated_at=now,
+            )
+        )
+        response_params.append(
+            ResponseParam(
+                id=i + 1,
+                api_id=1,
+                parent_param_id=i // 4 or None,
+                status_code=200,
+                name=f"field_{i}",
+                type=param_type,
+                required=i % 2 == 1,
+                description=None,
+                example="e" if is_leaf else None,
+                array_child_type=None,
+                tree_path=paths[i + 1],
+                updated_at=now,
+            )
+        )
+    return request_params, response_params
+
+
+def buildDeepParams(depth: int) -> list:
+    params = []
+    path = ""
+    for i in range(1, depth + 1):
+        path = paramPath(path, i)
+        params.append(
+            RequestParam(
+                id=i,
+                api_id=1,
+                parent_param_id=i - 1 or None,
+                name=f"level_{i}",
+                location=ParamLocation.BODY,
+                type=ParamType.OBJECT,
+                required=True,
+                default_value=None,
+                description=None,
+                example=None,
+                array_child_type=None,
+                tree_path=path,
+                updated_at=None,
+            )
+        )
+    return params
+
+
+# api详情：整理为嵌套的参数字典
+def legacyOrganize(request_params: list, response_params: list) -> list:
+    return [
+        legacyOrganizeReqParams(request_params),
+        legacyOrganizeRespParams(response_params),
+    ]
+
+
+def treeOrganize(request_params: list, response_params: list) -> list:
+    return [organizeReqParams(request_params), organizeRespParams(response_params)]
+
+
+# OpenAPI导出：原实现先整理为嵌套字典再递归构建Schema，参数树引擎直接由节点树构建
+def legacySchemas(request_params: list, response_params: list) -> list:
+    return [
+        legacyParamSchema(p)
+        for groups in legacyOrganize(request_params, response_params)
+        for params in groups.values()
+        for p in params
+    ]
+
+
+def treeSchemas(request_params: list, response_params: list) -> list:
+    return [
+        _build_param_schema(node)
+        for params in (request_params, response_params)
+        for node in ParamTree.fromParams(params).roots
+    ]
+
+
+def timeit(fn, rounds: int) -> list:
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def compare(label: str, legacy_fn, tree_fn, rounds: int) -> None:
+    legacy = statistics.median(timeit(legacy_fn, rounds))
+    tree = statistics.median(timeit(tree_fn, rounds))
+    print(
+        f"{label}: legacy {legacy * 1000:.1f}ms, param tree {tree * 1000:.1f}ms, "
+        f"speedup {legacy / tree:.1f}x"
+    )
+
+
+def run(param_count: int, rounds: int) -> None:
+    request_params, response_params = buildParams(param_count)
+    params = (request_params, response_params)
+    assert legacyOrganize(*params) == treeOrganize(*params)
+    # 测试数据中根参数的分组顺序与输入顺序一致，两种实现的Schema顺序相同
+    assert legacySchemas(*params) == treeSchemas(*params)
+    print(f"params: {len(request_params) + len(response_params)}, rounds: {rounds}")
+    compare(
+        "detail json",
+        lambda: legacyOrganize(*params),
+        lambda: treeOrganize(*params),
+        rounds,
+    )
+    compare(
+        "openapi schema",
+        lambda: legacySchemas(*params),
+        lambda: treeSchemas(*params),
+        rounds,
+    )
+    # 深层嵌套：原递归实现超过递归深度限制时抛出RecursionError
+    depth = sys.getrecursionlimit() * 2
+    deep_params = buildDeepParams(depth)
+    try:
+        legacySchemas(deep_params, [])
+        legacy_deep = "ok"
+    except RecursionError:
+        legacy_deep = "RecursionError"
+    treeOrganize(deep_params, [])
+    treeSchemas(deep_params, [])
+    print(f"depth {depth}: legacy {legacy_deep}, param tree ok")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--params", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    run(args.params, args.rounds)
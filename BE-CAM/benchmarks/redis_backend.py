@@ -0,0 +1,260 @@
+# RedisBackend 自检与往返耗时：在进程内启动一个假的Redis服务器（RESP协议，支持 GET/SET PX/DEL/INCR/AUTH/SELECT），
+# 不依赖真实Redis，校验 RESP 编码与解析、AUTH / SELECT、断线重连、retry_interval 退避与超时，最后统计单次命令往返耗时
+# 用法（在 BE-CAM 目录下）：
+#   uv run python -m benchmarks.redis_backend --ops 5000
+import argparse
+import io
+import socket
+import socketserver
+import threading
+import time
+
+from cache import Cache, CacheUnavailable, RedisBackend
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.clients.append(self.connection)
+        while True:
+            try:
+                args = self._readCommand()
+            except (OSError, ValueError):
+                return
+            if args is None:
+                return
+            server.commands.append(args)
+            if server.hang:
+                time.sleep(server.hang)
+                return
+            try:
+                self.wfile.write(server.execute(args))
+            except OSError:
+                return
+
+    def _readCommand(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0, password: bytes | None = None):
+        super().__init__(("127.0.0.1", port), FakeRedisHandler)
+        self.password = password
+        self.data = {}  # key -> (value, 过期时间)
+        self.commands = []
+        self.clients = []
+        self.connections = 0
+        self.hang = 0.0  # 大于0时收到命令后不回复，等待hang秒后断开
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def execute(self, args) -> bytes:
+        command = args[0].upper()
+        with self.lock:
+            if command == b"AUTH":
+                return b"+OK\r\n" if args[1] == self.password else b"-ERR invalid password\r\n"
+            if command == b"SELECT":
+                return b"+OK\r\n"
+            if command == b"GET":
+                item = self.data.get(args[1])
+                if item and item[1] is not None and item[1] <= time.monotonic():
+                    del self.data[args[1]]
+                    item = None
+                if item is None:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(item[0]), item[0])
+            if command == b"SET":
+                expire_at = None
+                if len(args) == 5 and args[3].upper() == b"PX":
+                    expire_at = time.monotonic() + int(args[4]) / 1000
+                self.data[args[1]] = (args[2], expire_at)
+                return b"+OK\r\n"
+            if command == b"DEL":
+                return b":%d\r\n" % sum(self.data.pop(k, None) is not None for k in args[1:])
+            if command == b"INCR":
+                value = int(self.data.get(args[1], (b"0", None))[0]) + 1
+                self.data[args[1]] = (str(value).encode(), None)
+                return b":%d\r\n" % value
+        return b"-ERR unknown command\r\n"
+
+    # 断开全部客户端连接（模拟Redis重启 / 连接被中间设备回收）
+    def dropClients(self) -> None:
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.dropClients()
+
+
+def checkEncode() -> None:
+    assert RedisBackend._encode("SET", "k", b"v\r\n", "PX", 1000) == (
+        b"*5\r\n$3\r\nSET\r\n$1\r\nk\r\n$3\r\nv\r\n\r\n$2\r\nPX\r\n$4\r\n1000\r\n"
+    )
+    assert RedisBackend._encode("GET", "键") == b"*2\r\n$3\r\nGET\r\n$3\r\n\xe9\x94\xae\r\n"
+
+
+def checkRead() -> None:
+    def read(raw: bytes):
+        return RedisBackend._read(io.BytesIO(raw))
+
+    assert read(b"+OK\r\n") == "OK"
+    assert read(b":42\r\n") == 42
+    assert read(b"$5\r\na\r\nbc\r\n") == b"a\r\nbc"
+    assert read(b"$0\r\n\r\n") == b""
+    assert read(b"$-1\r\n") is None
+    assert read(b"*-1\r\n") is None
+    assert read(b"*3\r\n:1\r\n$1\r\nx\r\n*1\r\n+OK\r\n") == [1, b"x", ["OK"]]
+    try:
+        read(b"-ERR wrong type\r\n")
+        raise AssertionError("error reply not raised")
+    except CacheUnavailable as e:
+        assert str(e) == "ERR wrong type"
+    # 连接断开 / 回复被截断 / 无法识别的回复：ConnectionError（调用方需丢弃连接）
+    for raw in (b"", b"+OK", b"$5\r\nab", b"?\r\n"):
+        try:
+            read(raw)
+            raise AssertionError(f"{raw!r} not raised")
+        except ConnectionError:
+            pass
+
+
+def checkRoundTrip() -> None:
+    server = FakeRedisServer(password=b"secret")
+    try:
+        backend = RedisBackend("127.0.0.1", server.port, db=2, password="secret")
+        cache = Cache(backend, namespace="check", ttl=60)
+        cache.set("a", {"x": [1, "二"]})
+        assert cache.get("a") == {"x": [1, "二"]}
+        assert cache.get("missing") is None
+        assert cache.getOrLoad("b", lambda: 1, scope="svc:1") == 1
+        assert cache.getOrLoad("b", lambda: 2, scope="svc:1") == 1
+        cache.invalidate("svc:1")
+        assert cache.getOrLoad("b", lambda: 3, scope="svc:1") == 3
+        cache.set("short", 1, ttl=0.05)
+        time.sleep(0.1)
+        assert cache.get("short") is None
+        cache.delete("a")
+        assert cache.get("a") is None
+        assert server.commands[:2] == [[b"AUTH", b"secret"], [b"SELECT", b"2"]]
+        assert server.connections == 1
+
+        # 错误回复不丢弃连接
+        try:
+            backend._command("UNKNOWN")
+            raise AssertionError("error reply not raised")
+        except CacheUnavailable:
+            pass
+        assert cache.get("b", scope="svc:1") == 3
+        assert server.connections == 1
+
+        # 密码错误：连接失败并退避
+        wrong = RedisBackend("127.0.0.1", server.port, password="wrong", retry_interval=60)
+        assert Cache(wrong).get("a") is None
+        assert wrong._down_until > time.monotonic()
+    finally:
+        server.stop()
+
+
+def checkReconnect() -> None:
+    server = FakeRedisServer()
+    port = server.port
+    try:
+        backend = RedisBackend("127.0.0.1", port, retry_interval=0.2)
+        cache = Cache(backend, namespace="check")
+        cache.set("a", 1)
+        # 服务端断开连接：本次视为未命中，退避retry_interval后重新连接
+        server.dropClients()
+        assert cache.get("a") is None
+        assert backend._local.conn is None
+        assert cache.get("a") is None  # 退避期间直接跳过，不尝试连接
+        assert server.connections == 1
+        time.sleep(0.25)
+        assert cache.get("a") == 1
+        assert server.connections == 2
+
+        # Redis停止：连接失败后retry_interval内不再尝试连接
+        server.stop()
+        assert cache.get("a") is None
+        start = time.perf_counter()
+        for _ in range(1000):
+            try:
+                backend.get("check:a")
+                raise AssertionError("backend should be down")
+            except CacheUnavailable:
+                pass
+        assert time.perf_counter() - start < 0.1
+        # Redis恢复（同一端口）：退避结束后重新连接
+        server = FakeRedisServer(port=port)
+        time.sleep(0.25)
+        cache.set("a", 2)
+        assert cache.get("a") == 2
+        assert server.connections == 1
+    finally:
+        server.stop()
+
+
+def checkTimeout() -> None:
+    server = FakeRedisServer()
+    try:
+        backend = RedisBackend("127.0.0.1", server.port, timeout=0.1, retry_interval=60)
+        cache = Cache(backend, namespace="check")
+        server.hang = 1.0
+        start = time.perf_counter()
+        assert cache.get("a") is None
+        assert cache.get("a") is None  # 超时后退避，第二次不再等待
+        assert time.perf_counter() - start < 0.5
+    finally:
+        server.stop()
+
+
+def benchmarkRoundTrip(ops: int) -> None:
+    server = FakeRedisServer()
+    try:
+        cache = Cache(RedisBackend("127.0.0.1", server.port), namespace="check")
+        value = {"id": 1, "name": "getUserInfo", "children_params": list(range(50))}
+        start = time.perf_counter()
+        for i in range(ops):
+            cache.set(f"k{i % 100}", value)
+            cache.get(f"k{i % 100}")
+        elapsed = time.perf_counter() - start
+        print(f"round trip: {elapsed / (ops * 2) * 1e6:.1f}us per command ({ops} set + {ops} get)")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=5000)
+    args = parser.parse_args()
+
+    for check in (checkEncode, checkRead, checkRoundTrip, checkReconnect, checkTimeout):
+        check()
+        print(f"{check.__name__}: ok")
+    benchmarkRoundTrip(args.ops)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# toJson 序列化微基准：对比逐列反射的原实现与编译后的序列化函数
+# 不依赖数据库，在内存中构造一个大api（默认共 15k 个参数）及其关联对象，校验两种实现输出完全一致后统计耗时
+# 用法（在 BE-CAM 目录下）：
+#   uv run python -m benchmarks.serializer --params 15000 --rounds 5
+import argparse
+import statistics
+import time
+from datetime import datetime
+from sqlalchemy import inspect
+
+from database.enums import ApiLevel, HttpMethod, ParamLocation, ParamType
+from database.models import (
+    User,
+    Service,
+    ServiceIteration,
+    Api,
+    ApiCategory,
+    RequestParam,
+    ResponseParam,
+)
+from services.parampath import paramPath
+
+
+# 原 SerializableMixin.toJson 实现（逐列反射），作为对照
+def legacyToJson(obj, include=None, exclude=["password"], include_relations=False):
+    include = set(include) if include else None
+    exclude = set(exclude) if exclude else set()
+    mapper = inspect(obj.__class__)
+    if not mapper:
+        return {}
+
+    data = {}
+    for column in mapper.columns:
+        name = column.key
+        if include:
+            if name not in include:
+                continue
+            for rel in mapper.relationships:
+                if rel.key in include:
+                    value = getattr(obj, rel.key)
+                    data[rel.key] = legacyToJson(value) if value else None
+                    continue
+        if name in exclude:
+            continue
+        value = getattr(obj, name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[name] = value
+
+    if include_relations:
+        for rel in mapper.relationships:
+            if rel.key in exclude:
+                continue
+            value = getattr(obj, rel.key)
+            if value is None:
+                data[rel.key] = None
+            elif isinstance(value, list):
+                data[rel.key] = [legacyToJson(v) for v in value]
+            else:
+                data[rel.key] = legacyToJson(value)
+    return data
+
+
+def buildApi(param_count: int) -> Api:
+    now = datetime.now()
+    owner = User(id=1, username="bench", password="x", email="bench@example.com")
+    service = Service(
+        id=1, service_uuid="bench/serializer/x", owner=owner, version="0.0.1"
+    )
+    category = ApiCategory(id=1, name="bench", service=service)
+    api = Api(
+        id=1,
+        service=service,
+        owner=owner,
+        category=category,
+        name="bench",
+        method=HttpMethod.POST,
+        path="/bench",
+        description="serializer benchmark",
+        level=ApiLevel.P2,
+        created_at=now,
+        updated_at=now,
+    )
+    # 与从数据库加载的实例一致，全部列均赋值
+    paths = {None: ""}
+    for i in range(param_count // 2):
+        paths[i + 1] = paramPath(paths[i // 4 or None], i + 1)
+        RequestParam(
+            id=i + 1,
+            api=api,
+            api_id=api.id,
+            parent_param_id=i // 4 or None,
+            name=f"field_{i}",
+            location=ParamLocation.BODY,
+            type=ParamType.OBJECT,
+            required=i % 2 == 0,
+            default_value=None,
+            description="benchmark field",
+            example="{}",
+            array_child_type=None,
+            tree_path=paths[i + 1],
+            updated_at=now,
+        )
+        ResponseParam(
+            id=i + 1,
+            api=api,
+            api_id=api.id,
+            parent_param_id=i // 4 or None,
+            status_code=200,
+            name=f"field_{i}",
+            type=ParamType.STRING,
+            required=i % 2 == 1,
+            description=None,
+            example=None,
+            array_child_type=None,
+            tree_path=paths[i + 1],
+            updated_at=now,
+        )
+    ServiceIteration(id=1, service=service, creator=owner, version="0.0.1")
+    return api
+
+
+# 两种实现在各种参数组合下的输出需完全一致（包括键的顺序）
+def checkIdentical(api: Api) -> None:
+    cases = [
+        (api, {}),
+        (api, {"include_relations": True}),
+        (api, {"include": ["id", "name", "category"]}),
+        (api, {"exclude": ["description", "category"], "include_relations": True}),
+        (api.owner, {}),
+        (api.owner, {"exclude": None}),
+        (api.service, {"include_relations": True}),
+        (
+            api.service.iterations[0],
+            {"include_relations": True, "exclude": ["api_drafts"]},
+        ),
+        (api.request_params[0], {}),
+        (api.response_params[0], {}),
+    ]
+    for obj, kwargs in cases:
+        old, new = legacyToJson(obj, **kwargs), obj.toJson(**kwargs)
+        assert list(old.items()) == list(new.items()), (type(obj).__name__, kwargs)
+
+
+def timeit(fn, rounds: int) -> list:
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(param_count: int, rounds: int) -> None:
+    api = buildApi(param_count)
+    checkIdentical(api)
+    params = api.request_params + api.response_params
+    legacy = timeit(lambda: [legacyToJson(p) for p in params], rounds)
+    compiled = timeit(lambda: [p.toJson() for p in params], rounds)
+    print(f"params: {len(params)}, rounds: {rounds}")
+    print(f"legacy toJson   median: {statistics.median(legacy) * 1000:.1f}ms")
+    print(f"compiled toJson median: {statistics.median(compiled) * 1000:.1f}ms")
+    print(f"speedup: {statistics.median(legacy) / statistics.median(compiled):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--params", type=int, default=15000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    run(args.params, args.rounds)
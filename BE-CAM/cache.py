@@ -0,0 +1,310 @@
+import enum
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Hashable
+from dotenv import load_dotenv
+
+
+# 进程内 TTL + LRU 缓存（线程安全）
+# 超过maxsize时淘汰最久未访问的条目；条目超过ttl（秒）后视为失效
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()  # key -> (过期时间, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expire_at, value = item
+            if expire_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    # ttl为空时使用默认ttl，且不会超过默认ttl
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ---- 跨进程共享缓存 ----
+# 生产环境多进程多worker部署，进程内缓存在每个worker中各自冷启动；共享缓存通过可插拔的存储后端在worker间共享：
+# - MemoryBackend：进程内存储（未配置Redis时使用，如本地开发）
+# - RedisBackend：Redis协议（RESP）存储，只依赖标准库socket
+# 缓存键带命名空间；失效通过版本化作用域实现：键中包含作用域当前版本号，失效时只需将版本号加一，旧键随TTL自然过期
+
+
+class CacheUnavailable(Exception):
+    pass
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 4096):
+        self._data = TTLCache(maxsize=maxsize, ttl=24 * 3600)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+        return self._data.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data.set(key, value, ttl=ttl)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.delete(key)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    def __init__(
+        self,
+        host: str,
+        port: int = 6379,
+        db: int = 0,
+        password: str | None = None,
+        timeout: float = 0.5,
+        retry_interval: float = 5,
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        # 连接失败后retry_interval秒内不再尝试连接，避免Redis不可用时每个请求都等待超时
+        self.retry_interval = retry_interval
+        self._down_until = 0.0
+        self._local = threading.local()  # 每个线程一个连接
+
+    def _connect(self):
+        if time.monotonic() < self._down_until:
+            raise CacheUnavailable("redis is unavailable")
+        try:
+            sock = socket.create_connection((self.host, self.port), self.timeout)
+            sock.settimeout(self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", self.db)
+            return conn
+        except (OSError, CacheUnavailable) as e:
+            self._markDown()
+            raise CacheUnavailable(str(e))
+
+    # 连接出错（断开、超时、协议错乱）：关闭当前线程的连接，retry_interval秒后再重连
+    def _markDown(self) -> None:
+        self._close()
+        self._down_until = time.monotonic() + self.retry_interval
+
+    def _close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    # 读取一个回复；连接断开或回复格式错误时抛出ConnectionError（连接已不可用），错误回复（-ERR）抛出CacheUnavailable（连接仍可用）
+    @classmethod
+    def _read(cls, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode()
+        if prefix == b"-":
+            raise CacheUnavailable(body.decode())
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("connection closed")
+            return data[:-2]
+        if prefix == b"*":
+            length = int(body)
+            return None if length < 0 else [cls._read(reader) for _ in range(length)]
+        raise ConnectionError(f"unexpected reply: {line!r}")
+
+    def _command(self, *args):
+        conn = getattr(self._local, "conn", None) or self._connect()
+        try:
+            conn[0].sendall(self._encode(*args))
+            return self._read(conn[1])
+        except (OSError, ValueError) as e:
+            self._markDown()
+            raise CacheUnavailable(str(e))
+
+    def get(self, key: str) -> bytes | None:
+        return self._command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._command("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._command("DEL", *keys)
+
+    def incr(self, key: str) -> int:
+        return self._command("INCR", key)
+
+
+def _jsonDefault(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# 共享缓存：值以JSON存储（枚举存为其value，与接口返回的JSON一致）
+# 后端不可用时读视为未命中、写被忽略，缓存故障不影响接口
+class Cache:
+    def __init__(self, backend, namespace: str = "cam", ttl: float = 300):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _versionKey(self, scope: str) -> str:
+        return self._key(f"ver:{scope}")
+
+    # 作用域当前版本号
+    def version(self, scope: str) -> int:
+        raw = self.backend.get(self._versionKey(scope))
+        return int(raw) if raw else 0
+
+    def _fullKey(self, key: str, scope: str | None) -> str:
+        if scope is None:
+            return self._key(key)
+        return self._key(f"{scope}@{self.version(scope)}:{key}")
+
+    def get(self, key: str, scope: str | None = None) -> Any:
+        try:
+            raw = self.backend.get(self._fullKey(key, scope))
+        except CacheUnavailable:
+            return None
+        return None if raw is None else json.loads(raw)
+
+    def set(
+        self, key: str, value: Any, ttl: float | None = None, scope: str | None = None
+    ) -> None:
+        try:
+            self.backend.set(
+                self._fullKey(key, scope),
+                json.dumps(value, default=_jsonDefault, ensure_ascii=False).encode(),
+                self.ttl if ttl is None else ttl,
+            )
+        except CacheUnavailable:
+            pass
+
+    # 读取缓存，未命中时调用loader生成并写入（作用域版本号只读取一次）
+    def getOrLoad(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        scope: str | None = None,
+        ttl: float | None = None,
+    ) -> Any:
+        try:
+            full_key = self._fullKey(key, scope)
+            raw = self.backend.get(full_key)
+        except CacheUnavailable:
+            return loader()
+        if raw is not None:
+            return json.loads(raw)
+        value = loader()
+        try:
+            self.backend.set(
+                full_key,
+                json.dumps(value, default=_jsonDefault, ensure_ascii=False).encode(),
+                self.ttl if ttl is None else ttl,
+            )
+        except CacheUnavailable:
+            pass
+        return value
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(self._key(key))
+        except CacheUnavailable:
+            pass
+
+    # 使作用域下的全部缓存失效（应在数据库事务提交后调用）
+    def invalidate(self, scope: str) -> None:
+        try:
+            self.backend.incr(self._versionKey(scope))
+        except CacheUnavailable:
+            pass
+
+
+# 根据 .env 配置创建共享缓存：配置了REDIS_HOST时使用Redis，否则使用进程内存储
+def createCacheFromEnv() -> Cache:
+    load_dotenv()
+    host = os.getenv("REDIS_HOST")
+    if host:
+        backend = RedisBackend(
+            host=host,
+            port=int(os.getenv("REDIS_PORT") or 6379),
+            db=int(os.getenv("REDIS_DB") or 0),
+            password=os.getenv("REDIS_PASSWORD") or None,
+        )
+    else:
+        backend = MemoryBackend()
+    return Cache(backend=backend, ttl=float(os.getenv("CACHE_TTL") or 300))
+
+
+shared_cache = createCacheFromEnv()
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
@@ -16,3 +17,28 @@ engine = create_engine(
     pool_pre_ping=True,  # 每次借出连接前 ping 一下，防止取到断开的连接
 )
 session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# 异步引擎使用asyncpg驱动：未单独配置ASYNC_DATABASE_URI时，将DATABASE_URI中的驱动替换为asyncpg
+# （asyncpg不支持psycopg2的部分连接参数，如sslmode，此时需单独配置ASYNC_DATABASE_URI）
+def _asyncDatabaseUri(uri: str) -> str:
+    scheme, sep, rest = uri.partition("://")
+    if not sep or not scheme.startswith("postgresql"):
+        return uri
+    return f"postgresql+asyncpg://{rest}"
+
+
+async_engine = create_async_engine(
+    url=os.getenv("ASYNC_DATABASE_URI")
+    or _asyncDatabaseUri(os.getenv("DATABASE_URI") or ""),
+    echo=False,
+    pool_size=20,
+    max_overflow=30,
+    pool_timeout=60,
+    pool_recycle=3600,
+    pool_pre_ping=True,
+)
+# expire_on_commit=False：提交后仍可读取已加载的属性，异步环境中不会触发隐式的懒加载查询
+async_session = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
@@ -55,3 +55,10 @@ class UserLevel(enum.Enum):
     L2 = 2
     L3 = 3
     L4 = 4
+
+
+# 事件发件箱中事件的投递状态
+class OutboxStatus(enum.Enum):
+    PENDING = "pending"  # 待投递（含等待重试）
+    DELIVERED = "delivered"  # 已投递到全部sink
+    FAILED = "failed"  # 超过最大尝试次数，不再投递
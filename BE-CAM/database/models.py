@@ -10,9 +10,13 @@ from sqlalchemy import (
     Text,
     DateTime,
     UniqueConstraint,
+    JSON,
+    LargeBinary,
+    Index,
     func,
 )
 from sqlalchemy.orm import relationship, declarative_base
+import keyword
 from datetime import datetime, timezone
 
 from .enums import (
@@ -22,6 +26,7 @@ from .enums import (
     ParamType,
     UserRole,
     UserLevel,
+    OutboxStatus,
 )
 from bcrypt import hashpw, gensalt, checkpw
 
@@ -37,46 +42,98 @@ naming_convention = {
 Base.metadata.naming_convention = naming_convention
 
 
-# 可序列化Mixin基类，提供toJson方法将模型实例转换为JSON
-class SerializableMixin:
-    def toJson(self, include=None, exclude=["password"], include_relations=False):
-        include = set(include) if include else None
-        exclude = set(exclude) if exclude else set()
-        mapper = inspect(self.__class__)
-        if not mapper:
-            return {}
-
-        data = {}
-        for column in mapper.columns:
-            name = column.key
-            if include:
-                if name not in include:
-                    continue
-                # 若有 include，则要检查关系是否在 include 中
+# ---- 编译序列化函数 ----
+# toJson 按 (模型, include, exclude, include_relations) 生成专用的序列化函数并缓存：
+# 列、关系与日期列在编译时一次确定，序列化时只剩属性读取与一个字典字面量，不再每次反射遍历mapper
+_SERIALIZERS = {}
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# include 中的关系：与原实现一致，直接调用关系对象的toJson
+def _includedRelationToJson(value):
+    return value.toJson() if value else None
+
+
+def _relationToJson(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [v.toJson() for v in value]
+    return value.toJson()
+
+
+# 已加载的列直接从实例__dict__读取（与属性描述符返回的值相同），未加载 / 已过期的列仍通过属性读取触发加载
+def _attrExpr(key: str, is_column: bool = False) -> str:
+    if key.isidentifier() and not keyword.iskeyword(key):
+        expr = f"obj.{key}"
+    else:
+        expr = f"getattr(obj, {key!r})"
+    if is_column:
+        return f"(d[{key!r}] if {key!r} in d else {expr})"
+    return expr
+
+
+# 生成序列化函数，输出（键、顺序与值）与逐列反射的实现完全一致：
+# - 有include时，只输出include中的列；include中的关系在第一个被输出的列之前输出
+# - exclude中的列不输出；DateTime列转为isoformat字符串，枚举保持原值
+# - include_relations为True时，在列之后输出exclude之外的全部关系
+def compileSerializer(model, include=None, exclude=None, include_relations=False):
+    mapper = inspect(model)
+    include = set(include) if include else None
+    exclude = set(exclude) if exclude else set()
+    items = []
+    relations_included = False
+    for column in mapper.columns:
+        name = column.key
+        if include:
+            if name not in include:
+                continue
+            if not relations_included:
                 for rel in mapper.relationships:
                     if rel.key in include:
-                        value = getattr(self, rel.key)
-                        data[rel.key] = value.toJson() if value else None
-                        continue
-            if name in exclude:
+                        items.append(
+                            (rel.key, f"_includedRelationToJson({_attrExpr(rel.key)})")
+                        )
+                relations_included = True
+        if name in exclude:
+            continue
+        if isinstance(column.type, DateTime):
+            items.append((name, f"_isoformat({_attrExpr(name, True)})"))
+        else:
+            items.append((name, _attrExpr(name, True)))
+    if include_relations:
+        for rel in mapper.relationships:
+            if rel.key in exclude:
                 continue
-            value = getattr(self, name)
-            if isinstance(value, datetime):
-                value = value.isoformat()
-            data[name] = value
-
-        if include_relations:
-            for rel in mapper.relationships:
-                if rel.key in exclude:
-                    continue
-                value = getattr(self, rel.key)
-                if value is None:
-                    data[rel.key] = None
-                elif isinstance(value, list):
-                    data[rel.key] = [v.toJson() for v in value]
-                else:
-                    data[rel.key] = value.toJson()
-        return data
+            items.append((rel.key, f"_relationToJson({_attrExpr(rel.key)})"))
+    source = "def serialize(obj):\n    d = obj.__dict__\n    return {\n%s\n    }\n" % "\n".join(
+        f"        {key!r}: {expr}," for key, expr in items
+    )
+    namespace = {
+        "_isoformat": _isoformat,
+        "_includedRelationToJson": _includedRelationToJson,
+        "_relationToJson": _relationToJson,
+    }
+    exec(compile(source, f"<serializer {model.__name__}>", "exec"), namespace)
+    return namespace["serialize"]
+
+
+# 可序列化Mixin基类，提供toJson方法将模型实例转换为JSON
+class SerializableMixin:
+    def toJson(self, include=None, exclude=["password"], include_relations=False):
+        key = (
+            self.__class__,
+            tuple(include) if include else None,
+            tuple(exclude) if exclude else None,
+            bool(include_relations),
+        )
+        serializer = _SERIALIZERS.get(key)
+        if serializer is None:
+            serializer = _SERIALIZERS[key] = compileSerializer(*key)
+        return serializer(self)
 
 
 # ---- 用户-服务关联表 ----
@@ -161,6 +218,13 @@ class ServiceIteration(Base, SerializableMixin):
     created_at = Column(DateTime, default=datetime.now(timezone.utc))
     # 是否已发布
     is_committed = Column(Boolean, default=False)
+    # 写时复制：迭代中只物化被编辑 / 复制 / 删除的api，其余api沿用基线版本
+    # 为空或False表示该迭代为完整快照（历史数据）
+    is_copy_on_write = Column(Boolean, default=True)
+    # 基线迭代（发布时该服务最新的已发布迭代），历史版本通过逐级叠加基线迭代还原
+    base_iteration_id = Column(
+        Integer, ForeignKey("service_iteration.id"), nullable=True, index=True
+    )
 
     def __repr__(self):
         return f"<ServiceIteration {self.service_id}:{self.version}>"
@@ -223,6 +287,14 @@ class Api(Base, SerializableMixin):
 # ---- 请求参数 ----
 class RequestParam(Base, SerializableMixin):
     __tablename__ = "request_param"
+    # text_pattern_ops：前缀查询（LIKE 'prefix%'）可以使用索引
+    __table_args__ = (
+        Index(
+            "ix_request_param_tree_path",
+            "tree_path",
+            postgresql_ops={"tree_path": "text_pattern_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     api_id = Column(
@@ -253,6 +325,8 @@ class RequestParam(Base, SerializableMixin):
     parent_param = relationship(
         "RequestParam", backref="child_params", remote_side=[id]
     )
+    # 物化路径：从根参数到该参数的id序列（如 "12/34/56/"），子树为该前缀的范围查询
+    tree_path = Column(Text, nullable=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
@@ -262,6 +336,14 @@ class RequestParam(Base, SerializableMixin):
 # ---- 响应参数 ----
 class ResponseParam(Base, SerializableMixin):
     __tablename__ = "response_param"
+    # text_pattern_ops：前缀查询（LIKE 'prefix%'）可以使用索引
+    __table_args__ = (
+        Index(
+            "ix_response_param_tree_path",
+            "tree_path",
+            postgresql_ops={"tree_path": "text_pattern_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     api_id = Column(
@@ -285,6 +367,8 @@ class ResponseParam(Base, SerializableMixin):
     parent_param = relationship(
         "ResponseParam", backref="child_params", remote_side=[id]
     )
+    # 物化路径：从根参数到该参数的id序列（如 "12/34/56/"），子树为该前缀的范围查询
+    tree_path = Column(Text, nullable=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
@@ -318,6 +402,14 @@ class ApiDraft(Base, SerializableMixin):
         Integer, ForeignKey("api_category.id"), nullable=True, index=True
     )
     category = relationship("ApiCategory", backref="api_drafts")
+    # 对应的正式表api id（跨版本标识同一个api，不设外键：正式api删除后历史版本仍需保留该标识），新增api发布后回填
+    base_api_id = Column(Integer, nullable=True, index=True)
+    # 墓碑：标记本迭代中删除了base_api_id对应的api
+    is_tombstone = Column(Boolean, default=False)
+    # 已发布迭代的参数树以内容寻址方式存储在param_node中，这里按顺序记录各根参数的哈希
+    # 为空表示参数仍存储在request_param_draft / response_param_draft中（进行中的迭代）
+    request_param_hashes = Column(JSON, nullable=True)
+    response_param_hashes = Column(JSON, nullable=True)
 
     name = Column(String(128), nullable=False)
     method = Column(Enum(HttpMethod), nullable=False, index=True)
@@ -335,6 +427,14 @@ class ApiDraft(Base, SerializableMixin):
 # ---- 请求参数草稿 ----
 class RequestParamDraft(Base, SerializableMixin):
     __tablename__ = "request_param_draft"
+    # text_pattern_ops：前缀查询（LIKE 'prefix%'）可以使用索引
+    __table_args__ = (
+        Index(
+            "ix_request_param_draft_tree_path",
+            "tree_path",
+            postgresql_ops={"tree_path": "text_pattern_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     api_draft_id = Column(
@@ -366,6 +466,8 @@ class RequestParamDraft(Base, SerializableMixin):
     parent_param = relationship(
         "RequestParamDraft", backref="child_params", remote_side=[id]
     )
+    # 物化路径：从根参数到该参数的id序列（如 "12/34/56/"），子树为该前缀的范围查询
+    tree_path = Column(Text, nullable=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
@@ -375,6 +477,14 @@ class RequestParamDraft(Base, SerializableMixin):
 # ---- 响应参数草稿 ----
 class ResponseParamDraft(Base, SerializableMixin):
     __tablename__ = "response_param_draft"
+    # text_pattern_ops：前缀查询（LIKE 'prefix%'）可以使用索引
+    __table_args__ = (
+        Index(
+            "ix_response_param_draft_tree_path",
+            "tree_path",
+            postgresql_ops={"tree_path": "text_pattern_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     api_draft_id = Column(
@@ -403,7 +513,80 @@ class ResponseParamDraft(Base, SerializableMixin):
     parent_param = relationship(
         "ResponseParamDraft", backref="child_params", remote_side=[id]
     )
+    # 物化路径：从根参数到该参数的id序列（如 "12/34/56/"），子树为该前缀的范围查询
+    tree_path = Column(Text, nullable=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
         return f"<ResponseParamDraft {self.name} ({self.status_code})>"
+
+
+# ---- 参数节点表（内容寻址，历史版本的请求参数和响应参数共用） ----
+class ParamNode(Base, SerializableMixin):
+    __tablename__ = "param_node"
+
+    # 节点哈希：由参数自身字段与子节点哈希计算（sha256），相同子树只存储一次
+    hash = Column(String(64), primary_key=True)
+
+    name = Column(String(64), nullable=False)
+    location = Column(Enum(ParamLocation), nullable=True)  # 请求参数
+    status_code = Column(Integer, nullable=True)  # 响应参数
+    type = Column(Enum(ParamType), nullable=False)
+    required = Column(Boolean, default=False)
+    default_value = Column(String(256), nullable=True)
+    description = Column(Text)
+    example = Column(String(256))
+    array_child_type = Column(Enum(ParamType), nullable=True)
+    # 有序的子节点哈希列表
+    child_hashes = Column(JSON, nullable=False, default=list)
+
+    def __repr__(self):
+        return f"<ParamNode {self.name} {self.hash[:8]}>"
+
+
+# ---- 预生成的OpenAPI文档（发布迭代时生成，导出时直接返回） ----
+class OpenapiDocument(Base, SerializableMixin):
+    __tablename__ = "openapi_document"
+
+    service_iteration_id = Column(
+        Integer,
+        ForeignKey("service_iteration.id", ondelete="CASCADE"),
+        primary_key=True,
+    )  # 级联删除：删除迭代时，删除其OpenAPI文档
+    # 文档JSON的sha256，作为ETag
+    etag = Column(String(64), nullable=False)
+    # 未压缩的JSON字节数
+    size = Column(Integer, nullable=False)
+    # 预压缩的文档：JSON（gzip）、JSON（brotli）、YAML（gzip）；brotli / PyYAML 成为必需依赖之前生成的文档后两者为空
+    json_gzip = Column(LargeBinary, nullable=False)
+    json_br = Column(LargeBinary, nullable=True)
+    yaml_gzip = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<OpenapiDocument {self.service_iteration_id} {self.etag[:8]}>"
+
+
+# ---- 事件发件箱（与业务数据在同一事务中写入，由 services/outbox.py 中的分发器异步投递到各个sink） ----
+class OutboxEvent(Base, SerializableMixin):
+    __tablename__ = "outbox_event"
+    # 分发器按 状态 + 下次尝试时间 取待投递的事件
+    __table_args__ = (
+        Index("ix_outbox_event_status_next", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(64), nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    # 已投递成功的sink名称，重试时跳过
+    delivered_sinks = Column(JSON, nullable=False, default=list)
+    attempts = Column(Integer, nullable=False, default=0)
+    # 下次尝试时间，为空表示立即投递
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    delivered_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<OutboxEvent {self.id} {self.event_type} {self.status}>"
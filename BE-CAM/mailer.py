@@ -1,5 +1,8 @@
+import asyncio
+import functools
 import os
 import ssl
+import time
 import certifi
 import aiosmtplib
 from email.mime.text import MIMEText
@@ -13,54 +16,236 @@ SMTP_PORT = int(os.getenv("MAIL_PORT", 465))
 SMTP_USER = os.getenv("MAIL_USERNAME")
 SMTP_PASSWORD = os.getenv("MAIL_PASSWORD")
 SMTP_SENDER = os.getenv("MAIL_DEFAULT_SENDER")
+# 单封邮件的收件人数量上限（多数SMTP服务器限制单封邮件的收件人数）
+MAIL_MAX_RECIPIENTS = 50
+# SMTP连接空闲超过该时间（秒）后主动断开，下次发送时重新连接
+MAIL_IDLE_TIMEOUT = 60
 
 
-async def send_email(
-    to_email: list[str], subject: str, content: str, is_html: bool = False
-) -> dict:
-    """
-    异步发送邮件工具函数
-    :param to_email: 收件人邮箱列表
-    :param subject: 邮件主题
-    :param content: 邮件内容
-    :param is_html: 是否为HTML格式
-    :return: 发送结果字典
-    """
-    if not all([SMTP_SERVER, SMTP_USER, SMTP_PASSWORD]):
-        print("Error: SMTP configuration missing")
-        return {"status": -1, "message": "SMTP config missing"}
+# SSL 上下文只创建一次（读取 certifi 的 CA 证书文件开销较大）
+@functools.lru_cache(maxsize=1)
+def _sslContext() -> ssl.SSLContext:
+    return ssl.create_default_context(cafile=certifi.where())
 
-    if not to_email:
-        return {"status": -1, "message": "No recipients provided"}
 
-    # 构建邮件对象
+def _smtpConfigured() -> bool:
+    return all([SMTP_SERVER, SMTP_USER, SMTP_PASSWORD])
+
+
+def _buildMessage(
+    to_email: list[str], subject: str, content: str, is_html: bool
+) -> MIMEMultipart:
     message = MIMEMultipart()
     message["From"] = SMTP_SENDER
     message["To"] = ", ".join(
         to_email
     )  # 邮件头中的To字段，展示给用户看，通常用逗号连接
     message["Subject"] = subject
-
     # 设置邮件正文
     msg_type = "html" if is_html else "plain"
     message.attach(MIMEText(content, msg_type, "utf-8"))
+    return message
 
-    try:
-        # 创建 SSL 上下文，使用 certifi 提供的 CA 证书
-        context = ssl.create_default_context(cafile=certifi.where())
-        
-        # 异步连接并发送
-        await aiosmtplib.send(
-            message,
-            recipients=to_email,  # 显式指定收件人列表
+
+# 复用的已认证SMTP连接：首次发送时连接并登录，之后的邮件沿用同一连接
+# 连接被服务器断开时自动重连一次；同一时间只有一个发送操作使用该连接
+class SmtpConnection:
+    def __init__(self):
+        self._client: aiosmtplib.SMTP | None = None
+        self._lock: asyncio.Lock | None = None
+        self._loop = None
+        self._last_used = 0.0
+
+    def _getLock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 连接与锁绑定在创建它们的事件循环上
+            self._loop, self._lock, self._client = loop, asyncio.Lock(), None
+        return self._lock  # type: ignore
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
             hostname=SMTP_SERVER,
             port=SMTP_PORT,
             username=SMTP_USER,
             password=SMTP_PASSWORD,
             use_tls=True,  # 如果端口是 465 通常需要 True，587 通常用 start_tls
-            tls_context=context, # 显式传入 SSL 上下文
+            tls_context=_sslContext(),
         )
+        await client.connect()
+        return client
+
+    async def send(self, message: MIMEMultipart, recipients: list[str]) -> None:
+        async with self._getLock():
+            if (
+                self._client is not None
+                and time.monotonic() - self._last_used > MAIL_IDLE_TIMEOUT
+            ):
+                await self._close()
+            for attempt in range(2):
+                if self._client is None or not self._client.is_connected:
+                    self._client = await self._connect()
+                try:
+                    await self._client.send_message(message, recipients=recipients)
+                    break
+                except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                    # 空闲连接可能已被服务器断开，重连后重试一次
+                    self._client = None
+                    if attempt:
+                        raise
+            self._last_used = time.monotonic()
+
+    async def _close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None and client.is_connected:
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+    async def close(self) -> None:
+        async with self._getLock():
+            await self._close()
+
+
+smtp_connection = SmtpConnection()
+
+
+async def send_email(
+    to_email: list[str], subject: str, content: str, is_html: bool = False
+) -> dict:
+    """
+    异步发送邮件工具函数
+    :param to_email: 收件人邮箱列表
+    :param subject: 邮件主题
+    :param content: 邮件内容
+    :param is_html: 是否为HTML格式
+    :return: 发送结果字典
+    """
+    if not _smtpConfigured():
+        print("Error: SMTP configuration missing")
+        return {"status": -1, "message": "SMTP config missing"}
+
+    if not to_email:
+        return {"status": -1, "message": "No recipients provided"}
+
+    try:
+        # 收件人较多时分多封发送，复用同一个SMTP连接
+        for i in range(0, len(to_email), MAIL_MAX_RECIPIENTS):
+            recipients = to_email[i : i + MAIL_MAX_RECIPIENTS]
+            await smtp_connection.send(
+                _buildMessage(recipients, subject, content, is_html),
+                recipients,  # 显式指定收件人列表
+            )
         return {"status": 200, "message": "Email sent successfully"}
     except Exception as e:
         print(f"Failed to send email: {str(e)}")
         return {"status": -2, "message": f"Failed to send email: {str(e)}"}
+
+
+# ---- 后台邮件队列 ----
+# 接口只将邮件放入队列即返回，由事件循环上的后台任务发送，SMTP慢或不可用时不影响接口响应：
+# - 批量：一次取出队列中已有的全部邮件，主题与内容相同的邮件合并收件人后发送，全部邮件复用同一个SMTP连接
+# - 重试：发送失败的邮件按指数退避（retry_delay * 2^n 秒）重新入队，最多重试max_retries次
+# put返回的Future在邮件最终发送成功或放弃后完成，结果为send_email的返回值（调用方可不等待）
+# 队列在进程内存中，进程退出时未发送的邮件会丢失（shutdown时会尽量发送完）
+class MailQueue:
+    def __init__(self, max_retries: int = 3, retry_delay: float = 2):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop = None
+        self._pending = 0  # 队列中及等待重试的邮件数
+
+    # 放入一封邮件（需在事件循环中调用），首次调用时启动后台任务
+    def put(
+        self, to_email: list[str], subject: str, content: str, is_html: bool = False
+    ) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not to_email:
+            future.set_result({"status": -1, "message": "No recipients provided"})
+            return future
+        if self._loop is not loop:
+            self._loop, self._queue, self._worker = loop, asyncio.Queue(), None
+            self._pending = 0
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        self._pending += 1
+        self._queue.put_nowait(  # type: ignore
+            (list(to_email), subject, content, is_html, 0, [future])
+        )
+        return future
+
+    # 合并主题、内容相同的邮件（保持先后顺序，收件人去重）
+    @staticmethod
+    def _merge(jobs: list) -> list:
+        merged = {}
+        for to_email, subject, content, is_html, attempt, futures in jobs:
+            key = (subject, content, is_html)
+            if key not in merged:
+                merged[key] = ({}, attempt, [])
+            recipients, prev_attempt, merged_futures = merged[key]
+            recipients.update(dict.fromkeys(to_email))
+            merged[key] = (
+                recipients,
+                max(prev_attempt, attempt),
+                merged_futures + futures,
+            )
+        return [
+            (list(recipients), subject, content, is_html, attempt, futures)
+            for (subject, content, is_html), (
+                recipients,
+                attempt,
+                futures,
+            ) in merged.items()
+        ]
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            try:
+                jobs = [await asyncio.wait_for(queue.get(), MAIL_IDLE_TIMEOUT)]  # type: ignore
+            except asyncio.TimeoutError:
+                # 队列空闲时断开SMTP连接
+                await smtp_connection.close()
+                continue
+            while not queue.empty():  # type: ignore
+                jobs.append(queue.get_nowait())  # type: ignore
+            for job in self._merge(jobs):
+                await self._deliver(job)
+            self._pending -= len(jobs)
+
+    async def _deliver(self, job: tuple) -> None:
+        to_email, subject, content, is_html, attempt, futures = job
+        res = await send_email(
+            to_email=to_email, subject=subject, content=content, is_html=is_html
+        )
+        # 配置缺失（-1）重试也无法成功
+        if res["status"] == -2 and attempt < self.max_retries:
+            self._pending += 1
+            asyncio.get_running_loop().call_later(
+                self.retry_delay * 2**attempt,
+                self._queue.put_nowait,  # type: ignore
+                (to_email, subject, content, is_html, attempt + 1, futures),
+            )
+            return
+        if res["status"] == -2:
+            print(f"Send email failed after {attempt + 1} attempts: {res['message']}")
+        for future in futures:
+            if not future.done():
+                future.set_result(res)
+
+    # 等待队列中的邮件（含等待重试的邮件）全部处理完，超时返回False；用于进程退出前
+    async def flush(self, timeout: float = 10) -> bool:
+        deadline = time.monotonic() + timeout
+        while self._pending > 0 and self._loop is asyncio.get_running_loop():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        await smtp_connection.close()
+        return True
+
+
+mail_queue = MailQueue()
@@ -0,0 +1,25 @@
+import functools
+from typing import Any, Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# ---- 服务函数的异步版本 ----
+# 服务函数均基于同步Session编写；异步版本通过 AsyncSession.run_sync 在greenlet中执行同一份同步代码，
+# 其中的数据库IO由asyncpg在事件循环上等待，等待期间worker可以继续处理其他请求（同步Session会阻塞整个事件循环）
+# 注意：run_sync中的非数据库操作仍在事件循环线程上同步执行，耗时的部分需单独实现异步版本（通过 asyncio.to_thread 移出事件循环），例如：
+# - CPU密集计算：bcrypt校验 / 哈希（见 services/user.py）、发布时OpenAPI文档的序列化与压缩（见 serviceCommitIterationAsync）
+# - 同步网络IO：共享缓存使用Redis后端时（配置了REDIS_HOST），shared_cache的读写是阻塞的socket调用，
+#   每次最多等待RedisBackend的timeout（默认0.5秒）；Redis不可用时在retry_interval内直接跳过缓存，不会反复等待
+# 用法：
+#   async with async_session() as db:
+#       res = await serviceGetServiceByIdAsync(db=db, id=id, user_id=user_id)
+
+
+# 由同步服务函数（第一个参数为db: Session）生成异步版本（第一个参数为db: AsyncSession），其余参数与返回值不变
+def asyncVariant(fn: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(fn, *args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = f"{fn.__name__}Async"
+    return wrapper
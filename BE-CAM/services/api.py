@@ -1,22 +1,54 @@
+import hashlib
+import json
 import time
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from typing import List
+from urllib.parse import unquote
+from sqlalchemy import delete, func, insert, literal, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, contains_eager, joinedload
 
 from database.models import (
+    User,
     Service,
     Api,
     ApiCategory,
-    User,
     ApiDraft,
+    ServiceIteration,
     RequestParamDraft,
     ResponseParamDraft,
 )
 from database.enums import ApiLevel, HttpMethod, ParamType, ParamLocation
+from cache import shared_cache
 from services.utils import (
+    FROZEN_CACHE_TTL,
     checkServiceIterationPermission,
+    frozenCacheKey,
+    invalidateServiceCache,
+    isServiceMaintainer,
+    maintainerExists,
+    serviceCacheScope,
     organizeReqParams,
     organizeRespParams,
 )
+from services.user import userGetCurrentUser
+from services.bulk import LIVE_TABLES, DRAFT_TABLES, copyApiTrees, reserveIds
+from services.aio import asyncVariant
+from services.overlay import (
+    isVirtualDraftId,
+    materializeApiDraft,
+    materializeApiDraftWithParamIds,
+    resolveCommittedApiDrafts,
+    toVirtualDraftId,
+)
+from services.parampath import (
+    findParamByPath,
+    movePathsStatement,
+    paramPath,
+    subtreeFilter,
+)
+from services.paramtree import ParamTree
+from services.projection import decodeCursor, encodeCursor
+from services.store import loadApiDraftParams, loadApiParams
 
 
 # 通过service_id获取全部categories
@@ -28,7 +60,7 @@ def apiGetAllCategoriesByServiceId(db: Session, service_id: int, user_id: int) -
             "message": "Service not found",
         }
     # 非L0用户只能查看自己的服务
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
             "status": -2,
@@ -59,7 +91,7 @@ def apiGetAllApisByServiceId(
             "message": "Service not found",
         }
     # 非L0用户只能查看自己的服务
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
             "status": -2,
@@ -76,66 +108,579 @@ def apiGetAllApisByServiceId(
     }
 
 
+# 批量获取api详情时每页api数量的默认值与上限
+API_DETAIL_PAGE_SIZE = 100
+API_DETAIL_MAX_PAGE_SIZE = 500
+# 一次查询内容变化的服务版本数量上限
+SERVICE_VERSION_CHANGES_MAX_COUNT = 100
+
+
+# 查询api（is_latest为False时为api草稿）的语句：连同所属服务（草稿为所属迭代及服务）、owner一并查询，
+# 当前用户是否为维护者以EXISTS子查询作为一列返回，权限校验无需额外查询
+def _selectApisWithPermission(user_id: int, is_latest: bool):
+    if is_latest:
+        return (
+            select(Api, maintainerExists(Api.service_id, user_id).label("is_maintainer"))
+            .join(Api.service)
+            .options(contains_eager(Api.service), joinedload(Api.owner))
+        )
+    return (
+        select(
+            ApiDraft,
+            maintainerExists(ServiceIteration.service_id, user_id).label(
+                "is_maintainer"
+            ),
+        )
+        .join(ApiDraft.service_iteration)
+        .join(ServiceIteration.service)
+        .options(
+            contains_eager(ApiDraft.service_iteration).contains_eager(
+                ServiceIteration.service
+            ),
+            joinedload(ApiDraft.owner),
+        )
+    )
+
+
+# 非L0用户只能查看自己的服务（owner或maintainer），历史版本的api草稿还允许迭代creator查看
+def _canViewApi(user, api, is_latest: bool, is_maintainer: bool) -> bool:
+    if user.level.value == 0 or is_maintainer:
+        return True
+    if is_latest:
+        return api.service.owner_id == user.id
+    return user.id in (
+        api.service_iteration.creator_id,
+        api.service_iteration.service.owner_id,
+    )
+
+
+# api详情：api自身字段、owner，以及按location / status_code组织的参数
+# owner由调用方传入（批量构建时一次查询全部owner），不通过关系懒加载
+def _apiDetailJson(
+    api, owner: User | None, request_params: list, response_params: list
+) -> dict:
+    api_info = api.toJson(
+        include_relations=True,
+        exclude=[
+            "request_params",
+            "response_params",
+            "service",
+            "service_iteration",
+            "category",
+            "owner",
+        ],  # 不包含无用嵌套数据，owner单独序列化
+    )
+    api_info["owner"] = owner.toJson() if owner else None
+    api_info["request_params_by_location"] = organizeReqParams(request_params)
+    api_info["response_params_by_status_code"] = organizeRespParams(response_params)
+    return api_info
+
+
+# 批量构建api详情：items为Api / ApiDraft实例（可混合），参数按表批量查询
+# 历史版本中的正式api（写时复制迭代尚未物化的api）以虚拟草稿id（-api_id）返回
+def _apiDetailsJson(db: Session, items: list, is_latest: bool) -> List[dict]:
+    # 全部owner一次查询
+    owner_ids = {item.owner_id for item in items}
+    owners = (
+        {user.id: user for user in db.scalars(select(User).where(User.id.in_(owner_ids)))}
+        if owner_ids
+        else {}
+    )
+    apis = [item for item in items if isinstance(item, Api)]
+    api_drafts = [item for item in items if isinstance(item, ApiDraft)]
+    api_params = loadApiParams(db, LIVE_TABLES, [api.id for api in apis]) if apis else {}
+    api_draft_params = loadApiDraftParams(db, api_drafts) if api_drafts else {}
+    details = []
+    for item in items:
+        if isinstance(item, Api):
+            detail = _apiDetailJson(
+                item, owners.get(item.owner_id), *api_params[item.id]
+            )
+            if not is_latest:
+                detail["id"] = toVirtualDraftId(item.id)  # type: ignore
+        else:
+            detail = _apiDetailJson(
+                item, owners.get(item.owner_id), *api_draft_params[item.id]
+            )
+        details.append(detail)
+    return details
+
+
+# 查询当前用户可查看的api（is_latest为False时为api草稿，虚拟草稿id转换为正式表api）
+# 返回 {"is_ok": False, "error": 错误响应} 或 {"is_ok": True, "api", "is_latest", "virtual_draft_id"}
+def _loadViewableApi(db: Session, api_id: int, user_id: int, is_latest: bool) -> dict:
+    # 写时复制迭代中尚未物化的api（虚拟草稿，id为 -api_id），直接读取正式表
+    virtual_draft_id = None
+    if not is_latest and isVirtualDraftId(api_id):
+        virtual_draft_id, api_id, is_latest = api_id, -api_id, True
+    model = Api if is_latest else ApiDraft
+    row = db.execute(
+        _selectApisWithPermission(user_id, is_latest).where(model.id == api_id)
+    ).first()
+    if not row or (not is_latest and row[0].is_tombstone):
+        return {
+            "is_ok": False,
+            "error": {
+                "status": -1,
+                "message": "Api not found",
+            },
+        }
+    api, is_maintainer = row
+    user = userGetCurrentUser(db, user_id)
+    if not user:
+        return {
+            "is_ok": False,
+            "error": {
+                "status": -2,
+                "message": "User not found",
+            },
+        }
+    if not _canViewApi(user, api, is_latest, is_maintainer):
+        if is_latest:
+            error = {
+                "status": -3,
+                "message": "You are neither the owner nor the maintainer of this service",
+            }
+        else:
+            error = {
+                "status": -4,
+                "message": "You are neither the owner nor the maintainer of this service, nor the creator of this service iteration",
+            }
+        return {"is_ok": False, "error": error}
+    return {
+        "is_ok": True,
+        "api": api,
+        "is_latest": is_latest,
+        "virtual_draft_id": virtual_draft_id,
+    }
+
+
 # 通过api_id获取api详情（包括api内包含的params）
 # 若传入is_latest为False，则api_id为api_draft_id，对应的是历史版本的api，相应params也来自param_draft
 def apiGetApiById(
     db: Session, api_id: int, user_id: int, is_latest: bool = True
 ) -> dict:
-    api = db.get(Api, api_id) if is_latest else db.get(ApiDraft, api_id)
-    if not api:
+    check_res = _loadViewableApi(db, api_id, user_id, is_latest)
+    if not check_res["is_ok"]:
+        return check_res["error"]
+    api, is_latest = check_res["api"], check_res["is_latest"]
+    api_id, virtual_draft_id = api.id, check_res["virtual_draft_id"]
+
+    # 满足查询条件
+    def loadApiInfo() -> dict:
+        # 请求参数和响应参数一次查询（UNION ALL）取回，已发布迭代的参数从内容寻址存储中还原
+        request_params, response_params = (
+            loadApiParams(db, LIVE_TABLES, [api.id])[api.id]
+            if is_latest
+            else loadApiDraftParams(db, [api])[api.id]
+        )
+        return _apiDetailJson(api, api.owner, request_params, response_params)
+
+    # 最新版本api和已发布迭代中的api草稿可缓存（进行中迭代的草稿随时被编辑，不缓存）
+    if is_latest:
+        api_info = shared_cache.getOrLoad(
+            key=f"api:{api_id}",
+            loader=loadApiInfo,
+            scope=serviceCacheScope(api.service_id),  # type: ignore
+        )
+    elif api.service_iteration.is_committed:
+        # 已发布迭代的草稿不可变（删除迭代时草稿可能并入其他迭代，因此键中包含所属迭代）
+        api_info = shared_cache.getOrLoad(
+            key=f"frozen:api_draft:{api_id}@{api.service_iteration_id}",
+            loader=loadApiInfo,
+            ttl=FROZEN_CACHE_TTL,
+        )
+    else:
+        api_info = loadApiInfo()
+    if virtual_draft_id is not None:
+        api_info["id"] = virtual_draft_id
+    return {
+        "status": 200,
+        "message": "Get api success",
+        "api": api_info,
+    }
+
+
+# 通过点分路径（如 data.items.name）获取api的单个参数及其全部子参数（与getApiById中的参数结构一致）
+# kind为req（请求参数）或resp（响应参数），location / status_code可选，用于限定根参数
+# 参数行通过 (api, name) 查询候选行、tree_path前缀查询子树，共两次索引查询，与api的参数总数无关
+def apiGetApiParamByPath(
+    db: Session,
+    api_id: int,
+    user_id: int,
+    kind: str,
+    path: str,
+    location: str | None = None,
+    status_code: int | None = None,
+    is_latest: bool = True,
+) -> dict:
+    check_res = _loadViewableApi(db, api_id, user_id, is_latest)
+    if not check_res["is_ok"]:
+        return check_res["error"]
+    api, is_latest = check_res["api"], check_res["is_latest"]
+    names = path.split(".")
+    if kind not in ("req", "resp") or not all(names):
         return {
-            "status": -1,
-            "message": "Api not found",
+            "status": -5,
+            "message": "kind must be req or resp, and path must be a dotted param path",
         }
-    # 非L0用户只能查看自己的服务
-    user = db.get(User, user_id)
-    if not user:
+    scope = {}
+    if kind == "req" and location:
+        scope["location"] = location
+    if kind == "resp" and status_code is not None:
+        scope["status_code"] = status_code
+    if not is_latest and api.request_param_hashes is not None:
+        # 已转存到内容寻址存储的历史草稿：还原后在内存中查找
+        params = loadApiDraftParams(db, [api])[api.id][0 if kind == "req" else 1]
+        columns = ("id", "name", "tree_path", *scope)
+        param = findParamByPath(
+            [{c: getattr(p, c) for c in columns} for p in params], names, scope
+        )
+        if param is not None:
+            param_tree = ParamTree.fromParams(
+                [p for p in params if p.tree_path.startswith(param["tree_path"])]
+            )
+    else:
+        tables = LIVE_TABLES if is_latest else DRAFT_TABLES
+        model = tables[kind]
+        param = findParamByPath(
+            db.execute(
+                select(
+                    model.id,
+                    model.name,
+                    model.tree_path,
+                    *[getattr(model, column) for column in scope],
+                ).where(
+                    getattr(model, tables["api_key"]) == api.id,
+                    model.name.in_(set(names)),
+                )
+            ).mappings(),
+            names,
+            scope,
+        )
+        if param is not None:
+            param_tree = ParamTree.fromRows(
+                model,
+                db.execute(
+                    select(model.__table__)
+                    .where(subtreeFilter(model, param["tree_path"]))
+                    .order_by(model.id)
+                ).mappings(),
+            )
+    if param is None:
         return {
-            "status": -2,
-            "message": "User not found",
+            "status": -6,
+            "message": "Param not found",
         }
-    if user.level.value != 0:
-        if (
-            is_latest
-            and api.service.owner_id != user_id
-            and user not in api.service.maintainers
-        ):
+    return {
+        "status": 200,
+        "message": "Get api param success",
+        "param": param_tree.toJson([param_tree.nodes[param["id"]]])[0],
+        # 子孙参数数（不含自身）
+        "descendant_count": len(param_tree.nodes) - 1,
+    }
+
+
+# 校验service_uuid对应的服务版本是否存在、当前用户是否有权限查看
+# 返回的字典中status为200时，service为所属服务，service_iteration为历史版本对应的迭代（最新版本为None）
+def _checkServiceVersionPermission(
+    db: Session, service_uuid: str, version: str, user_id: int
+) -> dict:
+    # 把 url 编码的字符串解码，否则 / 是 %2F
+    service_uuid = unquote(service_uuid).strip()
+    curr_service = (
+        db.query(Service)
+        .filter(
+            Service.service_uuid == service_uuid,
+            ~Service.is_deleted,
+        )
+        .first()
+    )
+    if not curr_service:
+        return {
+            "status": -1,
+            "message": "Service not found",
+        }
+    is_latest = curr_service.version == version or version == "latest"  # type: ignore
+    service_iteration = None
+    if not is_latest:
+        service_iteration = (
+            db.query(ServiceIteration)
+            .filter(
+                ServiceIteration.service_id == curr_service.id,
+                ServiceIteration.version == version,
+            )
+            .first()
+        )
+        if not service_iteration:
+            return {
+                "status": -2,
+                "message": "Service version not found",
+            }
+    user = userGetCurrentUser(db, user_id)
+    # 非L0用户，为当前service owner或maintainer或当前迭代creator，才有权限查看
+    if curr_service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, curr_service.id, user_id):  # type: ignore
+        if is_latest:
             return {
                 "status": -3,
                 "message": "You are neither the owner nor the maintainer of this service",
             }
-        elif (
-            not is_latest
-            and api.service_iteration.creator_id != user_id
-            and user not in api.service_iteration.service.maintainers
-            and api.service_iteration.service.owner_id != user_id
-        ):
+        elif service_iteration.creator_id != user_id:  # type: ignore
             return {
                 "status": -4,
-                "message": "You are neither the owner nor the maintainer of this service, nor the creator of this service iteration",
+                "message": "You are not the creator of this service iteration",
             }
-    # 满足查询条件
-    # 处理request_params
-    request_params_by_location = organizeReqParams(api.request_params)
-    # 处理response_params
-    response_params_by_status_code = organizeRespParams(api.response_params)
+    return {
+        "status": 200,
+        "message": "Permission check passed",
+        "service": curr_service,
+        "service_iteration": service_iteration,
+    }
 
-    api_info = api.toJson(
-        include_relations=True,
-        exclude=[
-            "request_params",
-            "response_params",
-            "service",
-            "service_iteration",
-            "category",
-        ],  # 需要包含owner，但不包含其他无用嵌套数据
+
+# 获取服务版本的一页api详情：返回 {apis, next_cursor, total}
+# 最新版本按api id游标分页；历史版本的api列表不可变（进行中迭代除外），游标记录在还原后列表中的位置
+def _loadApiDetailsPage(
+    db: Session,
+    service: Service,
+    service_iteration: ServiceIteration | None,
+    position: int,
+    page_size: int,
+) -> dict:
+    if service_iteration is None:
+        apis = db.scalars(
+            select(Api)
+            .where(Api.service_id == service.id, Api.id > position)
+            .order_by(Api.id)
+            .limit(page_size + 1)
+        ).all()
+        has_more = len(apis) > page_size
+        apis = apis[:page_size]
+        return {
+            "apis": _apiDetailsJson(db, apis, is_latest=True),
+            "next_cursor": encodeCursor("next", apis[-1].id) if has_more else None,  # type: ignore
+            "total": db.scalar(
+                select(func.count())
+                .select_from(Api)
+                .where(Api.service_id == service.id)
+            ),
+        }
+    if service_iteration.is_committed:  # type: ignore
+        items = resolveCommittedApiDrafts(db, service_iteration)
+    else:
+        # 进行中的迭代：本迭代的草稿 + 写时复制迭代中尚未物化的正式api（与迭代详情中的api列表顺序一致）
+        api_drafts = (
+            db.query(ApiDraft)
+            .filter(ApiDraft.service_iteration_id == service_iteration.id)
+            .order_by(ApiDraft.id)
+            .all()
+        )
+        items = [d for d in api_drafts if not d.is_tombstone]
+        if service_iteration.is_copy_on_write:  # type: ignore
+            overridden_api_ids = {
+                d.base_api_id for d in api_drafts if d.base_api_id is not None
+            }
+            items += [
+                api
+                for api in db.query(Api)
+                .filter(Api.service_id == service.id)
+                .order_by(Api.id)
+                .all()
+                if api.id not in overridden_api_ids
+            ]
+    page = items[position : position + page_size]
+    has_more = position + page_size < len(items)
+    return {
+        "apis": _apiDetailsJson(db, page, is_latest=False),
+        "next_cursor": (
+            encodeCursor("next", position + page_size) if has_more else None
+        ),
+        "total": len(items),
+    }
+
+
+# 带缓存获取一页api详情：最新版本按服务作用域缓存，已发布迭代不可变（删除迭代时草稿并入以其为基线的迭代，还原结果不变），
+# 进行中迭代的草稿随时被编辑，不缓存
+def _getApiDetailsPage(
+    db: Session,
+    service: Service,
+    service_iteration: ServiceIteration | None,
+    position: int,
+    page_size: int,
+) -> dict:
+    def loader() -> dict:
+        return _loadApiDetailsPage(db, service, service_iteration, position, page_size)
+
+    key = f"api_details:{position}:{page_size}"
+    if service_iteration is None:
+        return shared_cache.getOrLoad(
+            key=key, loader=loader, scope=serviceCacheScope(service.id)  # type: ignore
+        )
+    if service_iteration.is_committed:  # type: ignore
+        return shared_cache.getOrLoad(
+            key=frozenCacheKey(key, service_iteration.id),  # type: ignore
+            loader=loader,
+            ttl=FROZEN_CACHE_TTL,
+        )
+    return loader()
+
+
+# 服务版本的内容哈希：该版本全部api详情的sha256，任一api或参数变化时哈希随之变化
+def _getApiDetailsHash(
+    db: Session, service: Service, service_iteration: ServiceIteration | None
+) -> str:
+    def loader() -> str:
+        digest = hashlib.sha256()
+        position, has_more = 0, True
+        while has_more:
+            page = _getApiDetailsPage(
+                db, service, service_iteration, position, API_DETAIL_MAX_PAGE_SIZE
+            )
+            for api_info in page["apis"]:
+                # 先按JSON还原（枚举转为value、整数键转为字符串），与从缓存读取的页保持一致
+                api_info = json.loads(
+                    json.dumps(api_info, default=lambda value: value.value)
+                )
+                digest.update(
+                    json.dumps(api_info, ensure_ascii=False, sort_keys=True).encode()
+                )
+            has_more = page["next_cursor"] is not None
+            if has_more:
+                position = decodeCursor(page["next_cursor"])[1]
+        return digest.hexdigest()
+
+    if service_iteration is None:
+        return shared_cache.getOrLoad(
+            key="api_details_hash",
+            loader=loader,
+            scope=serviceCacheScope(service.id),  # type: ignore
+        )
+    if service_iteration.is_committed:  # type: ignore
+        return shared_cache.getOrLoad(
+            key=frozenCacheKey("api_details_hash", service_iteration.id),  # type: ignore
+            loader=loader,
+            ttl=FROZEN_CACHE_TTL,
+        )
+    return loader()
+
+
+# 通过service_uuid和version批量获取该版本全部api的详情（包括params），供代码生成等需要全部api详情的场景使用
+# 按页返回：cursor为空时返回第一页，响应中的next_cursor用于获取下一页（没有下一页时为None）
+def apiGetApiDetailsByServiceUuidAndVersion(
+    db: Session,
+    service_uuid: str,
+    version: str,
+    user_id: int,
+    page_size: int = API_DETAIL_PAGE_SIZE,
+    cursor: str | None = None,
+) -> dict:
+    check_res = _checkServiceVersionPermission(db, service_uuid, version, user_id)
+    if check_res["status"] != 200:
+        return check_res
+    service_iteration = check_res["service_iteration"]
+    page = _getApiDetailsPage(
+        db,
+        check_res["service"],
+        service_iteration,
+        position=decodeCursor(cursor)[1] if cursor else 0,
+        page_size=min(max(page_size, 1), API_DETAIL_MAX_PAGE_SIZE),
     )
-    api_info["request_params_by_location"] = request_params_by_location
-    api_info["response_params_by_status_code"] = response_params_by_status_code
     return {
         "status": 200,
-        "message": "Get api success",
-        "api": api_info,
+        "message": "Get api details success",
+        "is_latest": service_iteration is None,
+        **page,
+    }
+
+
+# 一次性查询多个服务版本的内容是否发生变化，供客户端增量更新
+# services为 [{service_uuid, version, hash}]，hash为客户端上次拉取时记录的内容哈希（没有时为None）
+# 返回每个服务版本当前的内容哈希及是否变化；服务版本不存在或无权限查看时返回其status和message
+def apiGetServiceVersionChanges(db: Session, services: List[dict], user_id: int) -> dict:
+    if len(services) > SERVICE_VERSION_CHANGES_MAX_COUNT:
+        return {
+            "status": -1,
+            "message": f"At most {SERVICE_VERSION_CHANGES_MAX_COUNT} services can be checked at once",
+        }
+    changes = []
+    for item in services:
+        service_uuid, version = item["service_uuid"], item["version"]
+        check_res = _checkServiceVersionPermission(db, service_uuid, version, user_id)
+        if check_res["status"] != 200:
+            changes.append(
+                {
+                    "service_uuid": service_uuid,
+                    "version": version,
+                    "status": check_res["status"],
+                    "message": check_res["message"],
+                    "hash": None,
+                    "changed": True,
+                }
+            )
+            continue
+        content_hash = _getApiDetailsHash(
+            db, check_res["service"], check_res["service_iteration"]
+        )
+        changes.append(
+            {
+                "service_uuid": service_uuid,
+                "version": version,
+                "status": 200,
+                "message": "ok",
+                "hash": content_hash,
+                "changed": content_hash != item.get("hash"),
+            }
+        )
+    return {
+        "status": 200,
+        "message": "Get service version changes success",
+        "services": changes,
+    }
+
+
+# 通过api_id列表批量获取api详情（包括params），返回顺序与api_ids一致
+# 不存在或无权限查看的api不返回详情，其id记录在failed_api_ids中
+# 若传入is_latest为False，则api_ids为api_draft_id（负数为写时复制迭代中尚未物化的正式api）
+def apiGetApiDetailsByIds(
+    db: Session, api_ids: List[int], user_id: int, is_latest: bool = True
+) -> dict:
+    user = userGetCurrentUser(db, user_id)
+    if not user:
+        return {
+            "status": -2,
+            "message": "User not found",
+        }
+    if len(api_ids) > API_DETAIL_MAX_PAGE_SIZE:
+        return {
+            "status": -1,
+            "message": f"At most {API_DETAIL_MAX_PAGE_SIZE} apis can be requested at once",
+        }
+    live_ids = [api_id for api_id in api_ids if is_latest or isVirtualDraftId(api_id)]
+    draft_ids = [api_id for api_id in api_ids if not is_latest and not isVirtualDraftId(api_id)]
+    found = {}
+    if live_ids:
+        for api, is_maintainer in db.execute(
+            _selectApisWithPermission(user_id, is_latest=True).where(
+                Api.id.in_([abs(api_id) for api_id in live_ids])
+            )
+        ):
+            if _canViewApi(user, api, True, is_maintainer):
+                found[api.id if is_latest else toVirtualDraftId(api.id)] = api  # type: ignore
+    if draft_ids:
+        for api_draft, is_maintainer in db.execute(
+            _selectApisWithPermission(user_id, is_latest=False).where(
+                ApiDraft.id.in_(draft_ids), ApiDraft.is_tombstone.is_(False)
+            )
+        ):
+            if _canViewApi(user, api_draft, False, is_maintainer):
+                found[api_draft.id] = api_draft
+    api_ids = list(dict.fromkeys(api_ids))
+    items = [found[api_id] for api_id in api_ids if api_id in found]
+    return {
+        "status": 200,
+        "message": "Get api details success",
+        "apis": _apiDetailsJson(db, items, is_latest=is_latest),
+        "failed_api_ids": [api_id for api_id in api_ids if api_id not in found],
     }
 
 
@@ -154,8 +699,8 @@ def apiAddCategoryByServiceId(
             "message": "Service not found",
         }
     # 非L0用户只能操作自己的服务
-    user = db.get(User, user_id)
-    if service.owner_id != user_id and user not in service.maintainers and user.level.value != 0:  # type: ignore
+    user = userGetCurrentUser(db, user_id)
+    if service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, service.id, user_id):  # type: ignore
         return {
             "status": -2,
             "message": "You are neither the owner nor the maintainer of this service",
@@ -176,6 +721,7 @@ def apiAddCategoryByServiceId(
     )
     db.add(category)
     db.commit()
+    invalidateServiceCache(service_id)
     return {
         "status": 200,
         "message": "Add category success",
@@ -192,19 +738,21 @@ def apiDeleteCategoryById(db: Session, category_id: int, user_id: int) -> dict:
             "message": "Category not found",
         }
     # 非L0用户只能操作自己的服务
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if not user:
         return {
             "status": -2,
             "message": "User not found",
         }
-    if category.service.owner_id != user_id and user not in category.service.maintainers and user.level.value != 0:  # type: ignore
+    if category.service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, category.service.id, user_id):  # type: ignore
         return {
             "status": -3,
             "message": "You are neither the owner nor the maintainer of this service",
         }
+    service_id = category.service_id
     db.delete(category)
     db.commit()
+    invalidateServiceCache(service_id)  # type: ignore
     return {
         "status": 200,
         "message": "Delete category success",
@@ -226,7 +774,7 @@ def apiUpdateCategoryById(
             "message": "Category not found",
         }
     # 非L0用户只能操作自己的服务
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if not user:
         return {
             "status": -2,
@@ -264,6 +812,7 @@ def apiUpdateCategoryById(
     category.name = category_name  # type: ignore
     category.description = description  # type: ignore
     db.commit()
+    invalidateServiceCache(category.service_id)  # type: ignore
     return {
         "status": 200,
         "message": "Update category success",
@@ -282,13 +831,13 @@ def apiUpdateApiCategory(
             "message": "Api not found",
         }
     # 非L0用户只能操作自己的服务
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if not user:
         return {
             "status": -2,
             "message": "User not found",
         }
-    if api.service.owner_id != user_id and user not in api.service.maintainers and user.level.value != 0:  # type: ignore
+    if api.service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, api.service.id, user_id):  # type: ignore
         return {
             "status": -3,
             "message": "You are neither the owner nor the maintainer of this service",
@@ -302,6 +851,7 @@ def apiUpdateApiCategory(
     if category_id == -1:
         api.category_id = None  # type: ignore
         db.commit()
+        invalidateServiceCache(api.service_id)  # type: ignore
         return {
             "status": 200,
             "message": "Update api category success",
@@ -319,6 +869,7 @@ def apiUpdateApiCategory(
         }
     api.category_id = category_id  # type: ignore
     db.commit()
+    invalidateServiceCache(api.service_id)  # type: ignore
     return {
         "status": 200,
         "message": "Update api category success",
@@ -326,27 +877,15 @@ def apiUpdateApiCategory(
 
 
 # ---- ⚠️ 以下为service迭代流程相关方法 ----
-# 通过service_iteration_id新增api（存ApiDraft表，可指定category_id）
-def apiAddApi(
+# 查找迭代中与 method + name / path 冲突的api，返回 (冲突的正式api, 冲突的api草稿（含墓碑）)
+def _findConflictingApis(
     db: Session,
-    service_iteration_id: int,
-    user_id: int,
+    service_iteration: ServiceIteration,
+    method,
     name: str,
-    method: str,
     path: str,
-    description: str,
-    level: str,
-    category_id: int | None = None,
-) -> dict:
-    # 版本迭代行为权限校验
-    check_res = checkServiceIterationPermission(
-        db=db, service_iteration_id=service_iteration_id, user_id=user_id
-    )
-    if not check_res["is_ok"]:
-        return check_res["error"]
-    service_iteration = check_res["service_iteration"]
-    # 检查当前服务中是否已存在同名同路径的api
-    # 当前服务最新版本的api
+) -> tuple:
+    # 当前服务最新版本的api（已在本迭代物化为草稿的api以草稿为准）
     existing_api = (
         db.query(Api)
         .filter(
@@ -356,6 +895,12 @@ def apiAddApi(
                 Api.path == path,
                 Api.name == name,
             ),
+            ~Api.id.in_(
+                db.query(ApiDraft.base_api_id).filter(
+                    ApiDraft.service_iteration_id == service_iteration.id,
+                    ApiDraft.base_api_id.isnot(None),
+                )
+            ),
         )
         .first()
     )
@@ -363,7 +908,7 @@ def apiAddApi(
     existing_api_draft = (
         db.query(ApiDraft)
         .filter(
-            ApiDraft.service_iteration_id == service_iteration_id,
+            ApiDraft.service_iteration_id == service_iteration.id,
             ApiDraft.method == method,
             or_(
                 ApiDraft.path == path,
@@ -372,6 +917,38 @@ def apiAddApi(
         )
         .first()
     )
+    return existing_api, existing_api_draft
+
+
+# 通过service_iteration_id新增api（存ApiDraft表，可指定category_id）
+def apiAddApi(
+    db: Session,
+    service_iteration_id: int,
+    user_id: int,
+    name: str,
+    method: str,
+    path: str,
+    description: str,
+    level: str,
+    category_id: int | None = None,
+) -> dict:
+    # 版本迭代行为权限校验
+    check_res = checkServiceIterationPermission(
+        db=db, service_iteration_id=service_iteration_id, user_id=user_id
+    )
+    if not check_res["is_ok"]:
+        return check_res["error"]
+    service_iteration = check_res["service_iteration"]
+    # 检查当前服务中是否已存在同名同路径的api
+    existing_api, existing_api_draft = _findConflictingApis(
+        db=db, service_iteration=service_iteration, method=method, name=name, path=path
+    )
+    # 本迭代中已删除（墓碑）的同名同路径api：直接复用该墓碑，视为恢复并重新定义该api
+    if existing_api_draft and existing_api_draft.is_tombstone and not existing_api:
+        tombstone = existing_api_draft
+        existing_api_draft = None
+    else:
+        tombstone = None
     if existing_api or existing_api_draft:
         return {
             "status": -1,
@@ -400,17 +977,28 @@ def apiAddApi(
                 "message": "Category not belongs to this service",
             }
 
-    api_draft = ApiDraft(
-        service_iteration_id=service_iteration_id,
-        owner_id=user_id,
-        name=name,
-        method=api_method,
-        path=path,
-        description=description,
-        level=api_level,
-        category_id=category_id,
-    )
-    db.add(api_draft)
+    if tombstone:
+        api_draft = tombstone
+        api_draft.is_tombstone = False  # type: ignore
+        api_draft.owner_id = user_id  # type: ignore
+        api_draft.name = name  # type: ignore
+        api_draft.method = api_method  # type: ignore
+        api_draft.path = path  # type: ignore
+        api_draft.description = description  # type: ignore
+        api_draft.level = api_level  # type: ignore
+        api_draft.category_id = category_id  # type: ignore
+    else:
+        api_draft = ApiDraft(
+            service_iteration_id=service_iteration_id,
+            owner_id=user_id,
+            name=name,
+            method=api_method,
+            path=path,
+            description=description,
+            level=api_level,
+            category_id=category_id,
+        )
+        db.add(api_draft)
     db.commit()
     return {
         "status": 200,
@@ -419,55 +1007,59 @@ def apiAddApi(
     }
 
 
-# 辅助函数：递归复制参数列表，支持嵌套的object类型参数
-def _copy_params_recursively(
-    db: Session,
-    source_params: list,
-    target_api_draft_id: int,
-    parent_param_id: int | None = None,
-    param_model_class=RequestParamDraft,
-) -> None:
-    for param in source_params:
-        if param_model_class is RequestParamDraft:
-            new_param = RequestParamDraft(
-                api_draft_id=target_api_draft_id,
-                name=param.name,
-                location=param.location,
-                type=param.type,
-                required=param.required,
-                default_value=param.default_value,
-                description=param.description,
-                example=param.example,
-                array_child_type=param.array_child_type,
-                parent_param_id=parent_param_id,
-            )
-        else:
-            new_param = ResponseParamDraft(
-                api_draft_id=target_api_draft_id,
-                status_code=param.status_code,
-                name=param.name,
-                type=param.type,
-                required=param.required,
-                description=param.description,
-                example=param.example,
-                array_child_type=param.array_child_type,
-                parent_param_id=parent_param_id,
-            )
-
-        db.add(new_param)
-        db.flush()  # 获取新创建记录的ID
-
-        if param.child_params:
-            _copy_params_recursively(
-                db=db,
-                source_params=param.child_params,
-                target_api_draft_id=target_api_draft_id,
-                parent_param_id=new_param.id,
-                param_model_class=param_model_class,
+# 解析被复制的api：返回 {"is_ok", "error"} 或 {"is_ok", "tables", "api", "owner_id"}（表结构、api、api归属id）
+# 尚未物化的api（负数id）直接从正式表复制，无需先物化；已在本迭代物化过的api以草稿为准
+def _resolveCopySource(
+    db: Session, service_iteration: ServiceIteration, api_draft_id: int
+) -> dict:
+    not_found = {
+        "is_ok": False,
+        "error": {
+            "status": -1,
+            "message": "Api draft not found",
+        },
+    }
+    if isVirtualDraftId(api_draft_id):
+        api_draft = (
+            db.query(ApiDraft)
+            .filter(
+                ApiDraft.service_iteration_id == service_iteration.id,
+                ApiDraft.base_api_id == -api_draft_id,
             )
+            .first()
+        )
+        if api_draft is None:
+            api = db.get(Api, -api_draft_id)
+            if not api or api.service_id != service_iteration.service_id:
+                return not_found
+            return {
+                "is_ok": True,
+                "tables": LIVE_TABLES,
+                "api": api,
+                "owner_id": api.service_id,
+            }
+    else:
+        api_draft = db.get(ApiDraft, api_draft_id)
+    if not api_draft or api_draft.is_tombstone:
+        return not_found
+    if api_draft.service_iteration_id != service_iteration.id:  # type: ignore
+        return {
+            "is_ok": False,
+            "error": {
+                "status": -2,
+                "message": "Api draft not belongs to this service iteration",
+            },
+        }
+    return {
+        "is_ok": True,
+        "tables": DRAFT_TABLES,
+        "api": api_draft,
+        "owner_id": service_iteration.id,
+    }
 
 
 # 通过service_iteration_id、api_draft_id复制api
+# api连同参数树通过批量拷贝引擎复制（见 services/bulk.py），数据库往返次数与参数数量无关
 def apiCopyApiByApiDraftId(
     db: Session, service_iteration_id: int, api_draft_id: int, user_id: int
 ) -> dict:
@@ -477,64 +1069,99 @@ def apiCopyApiByApiDraftId(
     )
     if not check_res["is_ok"]:
         return check_res["error"]
-    api_draft = db.get(ApiDraft, api_draft_id)
-    if not api_draft:
-        return {
-            "status": -1,
-            "message": "Api draft not found",
-        }
-    if api_draft.service_iteration_id != service_iteration_id:  # type: ignore
-        return {
-            "status": -2,
-            "message": "Api draft not belongs to this service iteration",
-        }
+    service_iteration = check_res["service_iteration"]
+    source = _resolveCopySource(db, service_iteration, api_draft_id)
+    if not source["is_ok"]:
+        return source["error"]
     # 符合复制条件
+    tables, api, owner_id = source["tables"], source["api"], source["owner_id"]
     timestamp = int(time.time())  # 用时间戳作为哈希值，确保唯一
-    new_name = f"{api_draft.name}-copy-{timestamp}"
-    new_path = f"{api_draft.path}-copy-{timestamp}"
-
-    new_api_draft = ApiDraft(
-        service_iteration_id=service_iteration_id,
-        owner_id=user_id,
-        name=new_name,
-        method=api_draft.method,
-        path=new_path,
-        description=api_draft.description,
-        level=api_draft.level,
-        category_id=api_draft.category_id,
-        is_enabled=api_draft.is_enabled,
+    api_id_mapping = copyApiTrees(
+        db=db,
+        src=tables,
+        dst=DRAFT_TABLES,
+        src_owner_id=owner_id,
+        dst_owner_id=service_iteration_id,
+        api_ids=[api.id],  # type: ignore
+        overrides={
+            "owner_id": user_id,
+            "name": f"{api.name}-copy-{timestamp}",
+            "path": f"{api.path}-copy-{timestamp}",
+        },
     )
-    db.add(new_api_draft)
-    db.flush()
-
-    # 复制请求参数
-    root_req_params = [p for p in api_draft.request_params if p.parent_param_id is None]
-    if root_req_params:
-        _copy_params_recursively(
-            db=db,
-            source_params=root_req_params,
-            target_api_draft_id=new_api_draft.id,
-            parent_param_id=None,
-            param_model_class=RequestParamDraft,
-        )
+    db.commit()
+    return {
+        "status": 200,
+        "message": "Copy api success",
+        "api_draft_id": api_id_mapping[api.id],
+    }
 
-    # 复制响应参数
-    root_resp_params = [
-        p for p in api_draft.response_params if p.parent_param_id is None
-    ]
-    if root_resp_params:
-        _copy_params_recursively(
-            db=db,
-            source_params=root_resp_params,
-            target_api_draft_id=new_api_draft.id,
-            parent_param_id=None,
-            param_model_class=ResponseParamDraft,
-        )
 
+# 将api（连同参数树）复制到另一个service迭代（可以是其他service），保留名称与路径
+# 需同时具有源迭代与目标迭代的迭代操作权限；category_id为目标service中的分类（为空时不分类）
+def apiCopyApiToServiceIteration(
+    db: Session,
+    service_iteration_id: int,
+    api_draft_id: int,
+    target_service_iteration_id: int,
+    user_id: int,
+    category_id: int | None = None,
+) -> dict:
+    # 版本迭代行为权限校验
+    check_res = checkServiceIterationPermission(
+        db=db, service_iteration_id=service_iteration_id, user_id=user_id
+    )
+    if not check_res["is_ok"]:
+        return check_res["error"]
+    target_check_res = checkServiceIterationPermission(
+        db=db, service_iteration_id=target_service_iteration_id, user_id=user_id
+    )
+    if not target_check_res["is_ok"]:
+        return target_check_res["error"]
+    service_iteration = check_res["service_iteration"]
+    target_service_iteration = target_check_res["service_iteration"]
+    source = _resolveCopySource(db, service_iteration, api_draft_id)
+    if not source["is_ok"]:
+        return source["error"]
+    tables, api, owner_id = source["tables"], source["api"], source["owner_id"]
+    # 目标service中不能已存在同名同路径的api（含目标迭代中已删除的api）
+    existing_api, existing_api_draft = _findConflictingApis(
+        db=db,
+        service_iteration=target_service_iteration,
+        method=api.method,
+        name=api.name,  # type: ignore
+        path=api.path,  # type: ignore
+    )
+    if existing_api or existing_api_draft:
+        return {
+            "status": -3,
+            "message": "Api method and name/path already exists in target service",
+        }
+    if category_id is not None:
+        category = db.get(ApiCategory, category_id)
+        if (
+            not category
+            or category.service_id != target_service_iteration.service_id
+        ):
+            return {
+                "status": -4,
+                "message": "Category not found in target service",
+            }
+    # 符合复制条件
+    api_id_mapping = copyApiTrees(
+        db=db,
+        src=tables,
+        dst=DRAFT_TABLES,
+        src_owner_id=owner_id,
+        dst_owner_id=target_service_iteration_id,
+        api_ids=[api.id],  # type: ignore
+        overrides={"owner_id": user_id, "category_id": category_id},
+    )
     db.commit()
     return {
         "status": 200,
-        "message": "Copy api success",
+        "message": "Copy api to service iteration success",
+        "api_draft_id": api_id_mapping[api.id],
     }
 
 
@@ -548,25 +1175,32 @@ def apiDeleteApiByApiDraftId(
     )
     if not check_res["is_ok"]:
         return check_res["error"]
-    api_draft = db.get(ApiDraft, api_draft_id)
+    service_iteration = check_res["service_iteration"]
+    # 尚未物化的api先物化（无需参数），再标记为墓碑
+    api_draft = materializeApiDraft(
+        db=db,
+        service_iteration=service_iteration,
+        api_draft_id=api_draft_id,
+        with_params=False,
+    )
     if not api_draft:
         return {
             "status": -1,
             "message": "Api draft not found",
         }
-    if api_draft.service_iteration_id != service_iteration_id:  # type: ignore
-        return {
-            "status": -2,
-            "message": "Api draft not belongs to this service iteration",
-        }
     # 符合删除条件
+    api_draft_id = api_draft.id  # type: ignore
     db.query(RequestParamDraft).filter(
         RequestParamDraft.api_draft_id == api_draft_id
     ).delete(synchronize_session=False)
     db.query(ResponseParamDraft).filter(
         ResponseParamDraft.api_draft_id == api_draft_id
     ).delete(synchronize_session=False)
-    db.delete(api_draft)
+    # 对应正式api的草稿保留为墓碑，发布时删除正式api；本迭代新增的草稿直接删除
+    if api_draft.base_api_id is not None and service_iteration.is_copy_on_write:
+        api_draft.is_tombstone = True  # type: ignore
+    else:
+        db.delete(api_draft)
     db.commit()
     return {
         "status": 200,
@@ -643,22 +1277,16 @@ def apiDeleteApiByApiDraftId(
 """
 
 
-# 辅助函数：递归处理参数列表，支持嵌套的object类型参数
-def _process_params_recursively(
-    db: Session,
-    params: list,
-    api_draft_id: int,
-    parent_param_id: int | None = None,
-    parent_location: str | None = None,
-    param_model_class=RequestParamDraft,
-) -> None:
-    for param in params:
-        param_name = param["name"]
-        param_type = param["type"]
-        param_required = param.get("required", False)
-        param_default_value = param.get("default_value")
-        param_description = param.get("description")
-        param_example = param.get("example")
+# 辅助函数：将嵌套的参数树展开为参数行，按深度优先先序排列（父参数在子参数之前，与逐个插入时的id顺序一致）
+# 返回 [(父参数在列表中的下标, 参数字段)]，根参数的父参数下标为None；parent_location为根参数继承的location
+def _flattenParams(
+    params: list, is_request: bool, parent_location: str | None = None
+) -> List[tuple]:
+    rows = []
+    # 栈中元素：(参数, 父参数下标, 父参数location)
+    stack = [(param, None, parent_location) for param in reversed(params)]
+    while stack:
+        param, parent_index, parent_location = stack.pop()
         param_array_child_type = param.get("array_child_type")
         param_children = param.get("children")
 
@@ -675,7 +1303,7 @@ def _process_params_recursively(
             param_location_enum = ParamLocation.BODY
 
         try:
-            param_type_enum = ParamType(param_type)
+            param_type_enum = ParamType(param["type"])
         except ValueError:
             param_type_enum = ParamType.STRING
 
@@ -687,52 +1315,75 @@ def _process_params_recursively(
             except ValueError:
                 param_array_child_type_enum = None
 
-        # 创建参数记录
-        if param_model_class is RequestParamDraft:
-            param_record = RequestParamDraft(
-                api_draft_id=api_draft_id,
-                name=param_name,
-                location=param_location_enum,
-                type=param_type_enum,
-                required=param_required,
-                default_value=param_default_value,
-                description=param_description,
-                example=param_example,
-                array_child_type=param_array_child_type_enum,
-                parent_param_id=parent_param_id,
-            )
-        else:  # ResponseParamDraft
+        fields = {
+            "name": param["name"],
+            "type": param_type_enum,
+            "required": param.get("required", False),
+            "description": param.get("description"),
+            "example": param.get("example"),
+            "array_child_type": param_array_child_type_enum,
+        }
+        if is_request:
+            fields["location"] = param_location_enum
+            fields["default_value"] = param.get("default_value")
+        else:
             # 响应参数需要status_code，这里使用默认值200
-            status_code = param.get("status_code", 200)
-            param_record = ResponseParamDraft(
-                api_draft_id=api_draft_id,
-                status_code=status_code,
-                name=param_name,
-                type=param_type_enum,
-                required=param_required,
-                description=param_description,
-                example=param_example,
-                array_child_type=param_array_child_type_enum,
-                parent_param_id=parent_param_id,
-            )
+            fields["status_code"] = param.get("status_code", 200)
+        rows.append((parent_index, fields))
 
-        db.add(param_record)
-        db.flush()  # 获取新创建记录的ID
-
-        # 如果是object类型且有子参数，或array类型且array_child_type为object且有子参数，递归处理子参数
+        # 如果是object类型且有子参数，或array类型且array_child_type为object且有子参数，继续处理子参数
         if (param_type_enum == ParamType.OBJECT and param_children) or (
             param_type_enum == ParamType.ARRAY
             and param_array_child_type_enum == ParamType.OBJECT
             and param_children
         ):
-            _process_params_recursively(
-                db=db,
-                params=param_children,
-                api_draft_id=api_draft_id,
-                parent_param_id=param_record.id,  # type: ignore
-                parent_location=param_location,
-                param_model_class=param_model_class,
+            index = len(rows) - 1
+            stack.extend(
+                (child, index, param_location) for child in reversed(param_children)
             )
+    return rows
+
+
+# 辅助函数：批量写入参数树，一次预取全部id后一次批量INSERT，语句数与参数数量、树深度无关
+# 参数树挂在parent_param_id（路径为parent_path）下（为None时为根参数），返回写入的参数行
+def _insertParams(
+    db: Session,
+    params: list,
+    api_draft_id: int,
+    param_model_class=RequestParamDraft,
+    parent_param_id: int | None = None,
+    parent_location: str | None = None,
+    parent_path: str = "",
+) -> List[dict]:
+    rows = _flattenParams(
+        params,
+        is_request=param_model_class is RequestParamDraft,
+        parent_location=parent_location,
+    )
+    if not rows:
+        return []
+    ids = reserveIds(db, param_model_class, len(rows))
+    values = []
+    # 先序排列，父参数的路径先于子参数生成
+    for param_id, (parent_index, fields) in zip(ids, rows):
+        if parent_index is None:
+            parent_id, path = parent_param_id, parent_path
+        else:
+            parent_id, path = ids[parent_index], values[parent_index]["tree_path"]
+        values.append(
+            {
+                **fields,
+                "id": param_id,
+                "api_draft_id": api_draft_id,
+                "parent_param_id": parent_id,
+                "tree_path": paramPath(path, param_id),
+            }
+        )
+    # render_nulls：值为None的列也显式写入NULL，所有行的列相同，合并为一条批量INSERT（否则按非空列分组拆成多条）
+    db.execute(
+        insert(param_model_class).execution_options(render_nulls=True), values
+    )
+    return values
 
 
 # 通过service_iteration_id、api_draft_id更新API
@@ -755,17 +1406,19 @@ def apiUpdateApiByApiDraftId(
     )
     if not check_res["is_ok"]:
         return check_res["error"]
-    api_draft = db.get(ApiDraft, api_draft_id)
+    # 尚未物化的api先物化（参数随后整体替换，无需拷贝）
+    api_draft = materializeApiDraft(
+        db=db,
+        service_iteration=check_res["service_iteration"],
+        api_draft_id=api_draft_id,
+        with_params=False,
+    )
     if not api_draft:
         return {
             "status": -1,
             "message": "Api draft not found",
         }
-    if api_draft.service_iteration_id != service_iteration_id:  # type: ignore
-        return {
-            "status": -2,
-            "message": "Api draft not belongs to this service iteration",
-        }
+    api_draft_id = api_draft.id  # type: ignore
     # 符合更新条件
     try:
         api_method = HttpMethod(method)
@@ -791,7 +1444,7 @@ def apiUpdateApiByApiDraftId(
 
     # 处理请求参数（支持嵌套结构）
     if req_params:
-        _process_params_recursively(
+        _insertParams(
             db=db,
             params=req_params,
             api_draft_id=api_draft_id,
@@ -800,7 +1453,7 @@ def apiUpdateApiByApiDraftId(
 
     # 处理响应参数（支持嵌套结构）
     if resp_params:
-        _process_params_recursively(
+        _insertParams(
             db=db,
             params=resp_params,
             api_draft_id=api_draft_id,
@@ -812,3 +1465,460 @@ def apiUpdateApiByApiDraftId(
         "status": 200,
         "message": "Update api success",
     }
+
+
+# ---- 参数树局部修改（patch）----
+# 编辑器只提交变更的操作，只读取操作涉及的子树及其祖先参数，每个操作只写入受影响的行，读写量与变更量成正比，与api的参数总数无关
+"""
+约定ops参数格式（按顺序在同一事务中执行，任一操作失败则全部回滚）：
+[
+    # 新增参数（可带children子树）：parent_id为null时为根参数，否则挂在该参数下（子参数继承父参数的location）
+    {"op": "add", "kind": "req", "parent_id": 12, "param": {"name": "age", "type": "int", "children": null}},
+    # 删除参数及其全部子参数
+    {"op": "remove", "kind": "resp", "id": 34},
+    # 修改参数字段（只修改传入的字段，不影响子参数；修改根请求参数的location时子参数随之修改）
+    {"op": "replace", "kind": "req", "id": 12, "fields": {"description": "用户信息", "required": true}},
+    # 移动参数（连同子参数）到新的父参数下，parent_id为null时移动为根参数
+    {"op": "move", "kind": "req", "id": 13, "parent_id": null}
+]
+
+说明：
+- kind为req（请求参数）或resp（响应参数），id为参数id（getApiById返回的id）
+- 同级参数按id排序，移动不改变参数在同级中的相对顺序
+- api_draft_id为尚未物化的api（负数id）时先物化，返回的param_id_mapping为 原参数id -> 新参数id，
+  之后的编辑应使用返回的api_draft_id和新参数id
+"""
+# 单次patch的操作数上限
+PARAM_PATCH_MAX_OPS = 200
+PARAM_PATCH_KINDS = {"req": RequestParamDraft, "resp": ResponseParamDraft}
+# replace可修改的字段
+PARAM_PATCH_FIELDS = {
+    "req": [
+        "name",
+        "location",
+        "type",
+        "required",
+        "default_value",
+        "description",
+        "example",
+        "array_child_type",
+    ],
+    "resp": [
+        "status_code",
+        "name",
+        "type",
+        "required",
+        "description",
+        "example",
+        "array_child_type",
+    ],
+}
+
+
+class _ParamPatchError(Exception):
+    pass
+
+
+def _canHaveChildren(param_type, array_child_type) -> bool:
+    return param_type == ParamType.OBJECT or (
+        param_type == ParamType.ARRAY and array_child_type == ParamType.OBJECT
+    )
+
+
+# 参数树的结构索引（不含参数内容），在执行操作的过程中同步维护
+# 只加载操作涉及的参数：ids中的参数连同其子树（完整），以及其祖先参数（由tree_path得到，只用于向上查找，子参数列表不完整），
+# 读取量与操作涉及的子树大小成正比，与api的参数总数无关
+class _ParamTreeIndex:
+    def __init__(self, db: Session, model, api_draft_id: int, ids: set):
+        self.nodes = {}
+        self.children = {}
+        if not ids:
+            return
+        # 响应参数没有location
+        location = getattr(model, "location", literal(None))
+        columns = (
+            model.id,
+            model.parent_param_id,
+            model.type,
+            model.array_child_type,
+            location,
+            model.tree_path,
+        )
+        paths = sorted(
+            db.scalars(
+                select(model.tree_path).where(
+                    model.api_draft_id == api_draft_id, model.id.in_(ids)
+                )
+            )
+        )
+        if not paths:
+            return
+        # 互相包含的子树只保留最外层的路径前缀
+        subtree_paths = []
+        for path in paths:
+            if not subtree_paths or not path.startswith(subtree_paths[-1]):
+                subtree_paths.append(path)
+        ancestor_ids = {int(i) for path in paths for i in path.split("/")[:-2]}
+        for row in db.execute(
+            select(*columns)
+            .where(
+                model.api_draft_id == api_draft_id,
+                or_(
+                    model.id.in_(ancestor_ids),
+                    *[subtreeFilter(model, path) for path in subtree_paths],
+                ),
+            )
+            .order_by(model.id)
+        ):
+            self.add(*row)
+
+    def add(
+        self, id, parent_id, param_type, array_child_type, location, tree_path
+    ) -> None:
+        self.nodes[id] = {
+            "parent_id": parent_id,
+            "type": param_type,
+            "array_child_type": array_child_type,
+            "location": location,
+            "tree_path": tree_path,
+        }
+        self.children.setdefault(parent_id, []).append(id)
+
+    def get(self, id) -> dict:
+        if not isinstance(id, int) or id not in self.nodes:
+            raise _ParamPatchError(f"Param {id} not found")
+        return self.nodes[id]
+
+    # 以id为根的子树中全部参数id（含自身），父参数在子参数之前
+    def subtree(self, id: int) -> List[int]:
+        ids = [id]
+        for curr in ids:
+            ids.extend(self.children.get(curr, []))
+        return ids
+
+    def detach(self, id: int) -> None:
+        self.children[self.nodes[id]["parent_id"]].remove(id)
+
+    def remove(self, id: int) -> List[int]:
+        ids = self.subtree(id)
+        self.detach(id)
+        for curr in ids:
+            self.nodes.pop(curr)
+            self.children.pop(curr, None)
+        return ids
+
+    # 检查parent_id可以作为（id的）父参数，返回父参数（根参数时为None）
+    def checkParent(self, parent_id, id: int | None = None) -> dict | None:
+        if parent_id is None:
+            return None
+        parent = self.get(parent_id)
+        if not _canHaveChildren(parent["type"], parent["array_child_type"]):
+            raise _ParamPatchError(f"Param {parent_id} can not have children")
+        if id is not None and parent_id in self.subtree(id):
+            raise _ParamPatchError(f"Can not move param {id} into its own subtree")
+        return parent
+
+
+# 枚举字段转换，非法值直接报错（与整体保存不同，patch不做静默回退）
+def _patchFieldValue(field: str, value):
+    try:
+        if field == "location":
+            return ParamLocation(value)
+        if field == "type":
+            return ParamType(value)
+        if field == "array_child_type":
+            return ParamType(value) if value else None
+    except ValueError:
+        raise _ParamPatchError(f"Invalid {field}: {value}")
+    if field == "name" and not value:
+        raise _ParamPatchError("Param name is required")
+    return value
+
+
+# ops中kind类参数引用的已有参数id（id、parent_id，物化前的参数id转换为草稿中的参数id）
+def _opParamIds(ops: list, kind: str, id_mapping: dict) -> set:
+    ids = set()
+    for op in ops:
+        if op.get("kind") != kind:
+            continue
+        for key in ("id", "parent_id"):
+            id = op.get(key)
+            if isinstance(id, int) and not isinstance(id, bool):
+                ids.add(id_mapping.get(id, id))
+    return ids
+
+
+# 执行单个操作，返回 (新增 / 修改的参数id, 删除的参数id列表)
+def _applyParamOp(
+    db: Session, api_draft_id: int, op: dict, trees: dict, param_id_mapping: dict
+) -> tuple:
+    kind = op.get("kind")
+    if kind not in PARAM_PATCH_KINDS:
+        raise _ParamPatchError(f"Invalid kind: {kind}")
+    model = PARAM_PATCH_KINDS[kind]
+    tree = trees[kind]
+
+    # 物化前的参数id转换为草稿中的参数id
+    def resolve(id):
+        return param_id_mapping[kind].get(id, id)
+
+    action = op.get("op")
+    if action == "add":
+        param = op.get("param")
+        if not isinstance(param, dict):
+            raise _ParamPatchError("param is required")
+        parent_id = resolve(op.get("parent_id"))
+        parent = tree.checkParent(parent_id)
+        parent_location = parent["location"] if parent is not None else None
+        rows = _insertParams(
+            db=db,
+            params=[param],
+            api_draft_id=api_draft_id,
+            param_model_class=model,
+            parent_param_id=parent_id,
+            parent_location=getattr(parent_location, "value", None),
+            parent_path=parent["tree_path"] if parent is not None else "",
+        )
+        for row in rows:
+            tree.add(
+                row["id"],
+                row["parent_param_id"],
+                row["type"],
+                row["array_child_type"],
+                row.get("location"),
+                row["tree_path"],
+            )
+        return rows[0]["id"], []
+    id = resolve(op.get("id"))
+    node = tree.get(id)
+    if action == "remove":
+        ids = tree.remove(id)
+        # 子树通过路径前缀一次删除
+        db.execute(
+            delete(model)
+            .where(subtreeFilter(model, node["tree_path"]))
+            .execution_options(synchronize_session=False)
+        )
+        return None, ids
+    if action == "replace":
+        fields = op.get("fields")
+        if not isinstance(fields, dict) or not fields:
+            raise _ParamPatchError("fields is required")
+        values = {}
+        for field, value in fields.items():
+            if field not in PARAM_PATCH_FIELDS[kind]:
+                raise _ParamPatchError(f"Field {field} can not be modified")
+            values[field] = _patchFieldValue(field, value)
+        # 子参数的location继承自根参数
+        if "location" in values and node["parent_id"] is not None:
+            raise _ParamPatchError("Location of child param is inherited")
+        param_type = values.get("type", node["type"])
+        array_child_type = values.get("array_child_type", node["array_child_type"])
+        if tree.children.get(id) and not _canHaveChildren(
+            param_type, array_child_type
+        ):
+            raise _ParamPatchError(f"Param {id} has children")
+        db.execute(
+            update(model)
+            .where(model.id == id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        node.update(type=param_type, array_child_type=array_child_type)
+        if "location" in values and values["location"] != node["location"]:
+            _updateSubtreeLocation(db, model, tree, id, values["location"])
+        return id, []
+    if action == "move":
+        parent_id = resolve(op.get("parent_id"))
+        parent = tree.checkParent(parent_id, id)
+        db.execute(
+            update(model)
+            .where(model.id == id)
+            .values(parent_param_id=parent_id)
+            .execution_options(synchronize_session=False)
+        )
+        # 子树中全部参数的路径替换为新的前缀
+        old_path = node["tree_path"]
+        new_path = paramPath(parent["tree_path"] if parent is not None else "", id)
+        db.execute(movePathsStatement(model, old_path, new_path))
+        for curr in tree.subtree(id):
+            curr_node = tree.nodes[curr]
+            curr_node["tree_path"] = new_path + curr_node["tree_path"][len(old_path) :]
+        tree.detach(id)
+        node["parent_id"] = parent_id
+        tree.children.setdefault(parent_id, []).append(id)
+        tree.children[parent_id].sort()
+        # 移动到其他根参数下时继承其location
+        if parent is not None and parent["location"] != node["location"]:
+            _updateSubtreeLocation(db, model, tree, id, parent["location"])
+        return id, []
+    raise _ParamPatchError(f"Invalid op: {action}")
+
+
+def _updateSubtreeLocation(
+    db: Session, model, tree: _ParamTreeIndex, id: int, location
+) -> None:
+    db.execute(
+        update(model)
+        .where(subtreeFilter(model, tree.nodes[id]["tree_path"]))
+        .values(location=location)
+        .execution_options(synchronize_session=False)
+    )
+    for curr in tree.subtree(id):
+        tree.nodes[curr]["location"] = location
+
+
+# 加载以root_ids为根的子树（root_ids互不包含，每个子树为一个路径前缀范围），
+# 组织为与getApiById一致的嵌套结构（children_params）
+def _paramSubtreesJson(
+    db: Session, model, tree: _ParamTreeIndex, root_ids: list
+) -> list:
+    if not root_ids:
+        return []
+    param_tree = ParamTree.fromRows(
+        model,
+        db.execute(
+            select(model.__table__)
+            .where(
+                or_(
+                    *[
+                        subtreeFilter(model, tree.nodes[id]["tree_path"])
+                        for id in root_ids
+                    ]
+                )
+            )
+            .order_by(model.id)
+        ).mappings(),
+    )
+    return param_tree.toJson([param_tree.nodes[id] for id in root_ids])
+
+
+# 通过service_iteration_id、api_draft_id局部修改api的请求参数和响应参数
+def apiPatchApiParamsByApiDraftId(
+    db: Session,
+    service_iteration_id: int,
+    api_draft_id: int,
+    user_id: int,
+    ops: list,
+) -> dict:
+    # 版本迭代行为权限校验
+    check_res = checkServiceIterationPermission(
+        db=db, service_iteration_id=service_iteration_id, user_id=user_id
+    )
+    if not check_res["is_ok"]:
+        return check_res["error"]
+    if (
+        not isinstance(ops, list)
+        or not ops
+        or len(ops) > PARAM_PATCH_MAX_OPS
+        or not all(isinstance(op, dict) for op in ops)
+    ):
+        return {
+            "status": -2,
+            "message": f"ops must be a list of 1-{PARAM_PATCH_MAX_OPS} operations",
+        }
+    # 尚未物化的api连同参数一起物化
+    api_draft, param_id_mapping = materializeApiDraftWithParamIds(
+        db=db,
+        service_iteration=check_res["service_iteration"],
+        api_draft_id=api_draft_id,
+    )
+    if not api_draft:
+        return {
+            "status": -1,
+            "message": "Api draft not found",
+        }
+    api_draft_id = api_draft.id  # type: ignore
+    touched = {kind: [] for kind in PARAM_PATCH_KINDS}
+    removed = {kind: [] for kind in PARAM_PATCH_KINDS}
+    # 通过操作校验、但被数据库拒绝的写入（如超长的字段、超出范围的id）同样回滚并返回错误，
+    # 执行操作时出错的指明操作序号，加载参数树或提交时出错的不指明
+    op_index = None
+    try:
+        trees = {
+            kind: _ParamTreeIndex(
+                db, model, api_draft_id, _opParamIds(ops, kind, param_id_mapping[kind])
+            )
+            for kind, model in PARAM_PATCH_KINDS.items()
+            if any(op.get("kind") == kind for op in ops)
+        }
+        for op_index, op in enumerate(ops):
+            try:
+                id, removed_ids = _applyParamOp(
+                    db=db,
+                    api_draft_id=api_draft_id,
+                    op=op,
+                    trees=trees,
+                    param_id_mapping=param_id_mapping,
+                )
+            except (_ParamPatchError, KeyError, TypeError) as e:
+                db.rollback()
+                message = (
+                    str(e) if isinstance(e, _ParamPatchError) else f"Invalid param: {e}"
+                )
+                return {
+                    "status": -3,
+                    "message": f"Invalid op {op_index}: {message}",
+                }
+            if id is not None:
+                touched[op["kind"]].append(id)
+            removed[op.get("kind")] += removed_ids
+        op_index = None
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        message = str(getattr(e, "orig", None) or e).strip().splitlines()[0]
+        return {
+            "status": -3,
+            "message": (
+                f"Invalid ops: {message}"
+                if op_index is None
+                else f"Invalid op {op_index}: {message}"
+            ),
+        }
+    # 返回变更后的子树：只返回最外层的变更参数（其子树中包含其余变更）
+    params = {}
+    for kind, tree in trees.items():
+        ids = set(touched[kind]) & set(tree.nodes)
+        root_ids = []
+        for id in sorted(ids):
+            parent_id = tree.nodes[id]["parent_id"]
+            while parent_id is not None and parent_id not in ids:
+                parent_id = tree.nodes[parent_id]["parent_id"]
+            if parent_id is None:
+                root_ids.append(id)
+        params[kind] = _paramSubtreesJson(
+            db=db, model=PARAM_PATCH_KINDS[kind], tree=tree, root_ids=root_ids
+        )
+    return {
+        "status": 200,
+        "message": "Patch api params success",
+        "api_draft_id": api_draft_id,
+        "params": params,
+        "removed_ids": {kind: ids for kind, ids in removed.items() if ids},
+        "param_id_mapping": {
+            kind: {str(k): v for k, v in mapping.items()}
+            for kind, mapping in param_id_mapping.items()
+            if mapping
+        },
+    }
+
+
+# ---- 异步版本（db为AsyncSession），见 services/aio.py ----
+apiGetAllCategoriesByServiceIdAsync = asyncVariant(apiGetAllCategoriesByServiceId)
+apiGetAllApisByServiceIdAsync = asyncVariant(apiGetAllApisByServiceId)
+apiGetApiByIdAsync = asyncVariant(apiGetApiById)
+apiGetApiParamByPathAsync = asyncVariant(apiGetApiParamByPath)
+apiGetApiDetailsByServiceUuidAndVersionAsync = asyncVariant(apiGetApiDetailsByServiceUuidAndVersion)
+apiGetServiceVersionChangesAsync = asyncVariant(apiGetServiceVersionChanges)
+apiGetApiDetailsByIdsAsync = asyncVariant(apiGetApiDetailsByIds)
+apiAddCategoryByServiceIdAsync = asyncVariant(apiAddCategoryByServiceId)
+apiDeleteCategoryByIdAsync = asyncVariant(apiDeleteCategoryById)
+apiUpdateCategoryByIdAsync = asyncVariant(apiUpdateCategoryById)
+apiUpdateApiCategoryAsync = asyncVariant(apiUpdateApiCategory)
+apiAddApiAsync = asyncVariant(apiAddApi)
+apiCopyApiByApiDraftIdAsync = asyncVariant(apiCopyApiByApiDraftId)
+apiCopyApiToServiceIterationAsync = asyncVariant(apiCopyApiToServiceIteration)
+apiDeleteApiByApiDraftIdAsync = asyncVariant(apiDeleteApiByApiDraftId)
+apiUpdateApiByApiDraftIdAsync = asyncVariant(apiUpdateApiByApiDraftId)
+apiPatchApiParamsByApiDraftIdAsync = asyncVariant(apiPatchApiParamsByApiDraftId)
@@ -0,0 +1,556 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from database.models import (
+    Api,
+    RequestParam,
+    ResponseParam,
+    ApiDraft,
+    RequestParamDraft,
+    ResponseParamDraft,
+)
+from services.parampath import paramPath
+
+
+# ---- 批量拷贝引擎：以固定次数的数据库往返完成整棵 api 树（api + 请求参数 + 响应参数）的拷贝 ----
+# 原理：
+# 1. 每张表只 SELECT 一次源数据（仅选取需要拷贝的列）
+# 2. 通过 nextval 一次性预取目标表所需的全部 id，在内存中建立 旧id -> 新id 的映射
+# 3. 在内存中完成 api_id / parent_param_id 的重映射（并由新id生成物化路径tree_path）后，每张表一次批量 INSERT
+#    （父参数排在子参数之前，满足自引用外键）
+# 因此耗时只与数据量有关，而与行数 × RTT 无关
+
+# 正式表 / 草稿表结构描述：api表、api归属外键、请求参数表、响应参数表、参数所属api外键
+LIVE_TABLES = {
+    "api": Api,
+    "owner_key": "service_id",
+    "req": RequestParam,
+    "resp": ResponseParam,
+    "api_key": "api_id",
+}
+DRAFT_TABLES = {
+    "api": ApiDraft,
+    "owner_key": "service_iteration_id",
+    "req": RequestParamDraft,
+    "resp": ResponseParamDraft,
+    "api_key": "api_draft_id",
+}
+
+# 需要拷贝的字段（id、外键、时间戳不拷贝）
+API_FIELDS = [
+    "owner_id",
+    "category_id",
+    "name",
+    "method",
+    "path",
+    "description",
+    "level",
+    "is_enabled",
+]
+REQ_PARAM_FIELDS = [
+    "name",
+    "location",
+    "type",
+    "required",
+    "default_value",
+    "description",
+    "example",
+    "array_child_type",
+]
+RESP_PARAM_FIELDS = [
+    "status_code",
+    "name",
+    "type",
+    "required",
+    "description",
+    "example",
+    "array_child_type",
+]
+
+
+# 一次往返预取count个自增id（PostgreSQL serial序列）
+def reserveIds(db: Session, model, count: int) -> List[int]:
+    if count <= 0:
+        return []
+    return list(
+        db.scalars(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"table_name": model.__tablename__, "count": count},
+        )
+    )
+
+
+# 按层级排序参数，保证父参数排在子参数之前（批量插入时满足自引用外键）
+def sortParamsByLevel(params: List[Dict]) -> List[Dict]:
+    ids = {p["id"] for p in params}
+    children_by_parent = {}
+    level = []
+    for p in params:
+        parent_id = p["parent_param_id"]
+        # 父参数不在当前集合中的参数视为根参数
+        if parent_id is None or parent_id not in ids:
+            level.append(p)
+        else:
+            children_by_parent.setdefault(parent_id, []).append(p)
+    ordered = []
+    while level:
+        ordered.extend(level)
+        level = [
+            child for p in level for child in children_by_parent.get(p["id"], [])
+        ]
+    return ordered
+
+
+# 批量拷贝参数：api_id_mapping为{源api_id: 目标api_id}，返回{源参数id: 目标参数id}
+def _copyParams(
+    db: Session,
+    src_model,
+    dst_model,
+    src_api_key: str,
+    dst_api_key: str,
+    fields: List[str],
+    api_id_mapping: Dict[int, int],
+) -> Dict[int, int]:
+    columns = [getattr(src_model, f) for f in ["id", src_api_key, "parent_param_id"]]
+    columns += [getattr(src_model, f) for f in fields]
+    params = (
+        db.execute(
+            select(*columns)
+            .where(getattr(src_model, src_api_key).in_(list(api_id_mapping)))
+            .order_by(src_model.id)
+        )
+        .mappings()
+        .all()
+    )
+    if not params:
+        return {}
+    params = sortParamsByLevel(params)
+    new_ids = reserveIds(db, dst_model, len(params))
+    param_id_mapping = {p["id"]: new_id for p, new_id in zip(params, new_ids)}
+    # 父参数在子参数之前，按顺序由父参数的路径得到子参数的路径
+    paths = {}
+    for p, new_id in zip(params, new_ids):
+        parent_id = param_id_mapping.get(p["parent_param_id"])
+        paths[new_id] = paramPath(paths[parent_id] if parent_id else "", new_id)
+    # render_nulls：值为None的列也显式写入NULL，全部行合并为一条批量INSERT（否则按非空列分组拆成多条）
+    db.execute(
+        insert(dst_model).execution_options(render_nulls=True),
+        [
+            {
+                **{f: p[f] for f in fields},
+                "id": param_id_mapping[p["id"]],
+                dst_api_key: api_id_mapping[p[src_api_key]],
+                "parent_param_id": param_id_mapping.get(p["parent_param_id"]),
+                "tree_path": paths[param_id_mapping[p["id"]]],
+            }
+            for p in params
+        ],
+    )
+    return param_id_mapping
+
+
+# 批量拷贝api树：将src中归属于src_owner_id的api（可通过api_ids限定范围）连同全部参数拷贝到dst中，归属于dst_owner_id
+# overrides用于覆盖拷贝后api的字段（如复制api时的新名称、新路径）
+# 返回 {源api_id: 目标api_id}
+def copyApiTrees(
+    db: Session,
+    src: dict,
+    dst: dict,
+    src_owner_id: int,
+    dst_owner_id: int,
+    api_ids: List[int] | None = None,
+    overrides: dict | None = None,
+) -> Dict[int, int]:
+    return copyApiTreesWithParamIds(
+        db=db,
+        src=src,
+        dst=dst,
+        src_owner_id=src_owner_id,
+        dst_owner_id=dst_owner_id,
+        api_ids=api_ids,
+        overrides=overrides,
+    )[0]
+
+
+# 同copyApiTrees，额外返回参数id映射：(api id映射, 请求参数id映射, 响应参数id映射)，均为{源id: 目标id}
+def copyApiTreesWithParamIds(
+    db: Session,
+    src: dict,
+    dst: dict,
+    src_owner_id: int,
+    dst_owner_id: int,
+    api_ids: List[int] | None = None,
+    overrides: dict | None = None,
+) -> Tuple[Dict[int, int], Dict[int, int], Dict[int, int]]:
+    src_api = src["api"]
+    query = select(src_api.id, *[getattr(src_api, f) for f in API_FIELDS]).where(
+        getattr(src_api, src["owner_key"]) == src_owner_id
+    )
+    if api_ids is not None:
+        if not api_ids:
+            return {}, {}, {}
+        query = query.where(src_api.id.in_(api_ids))
+    apis = db.execute(query.order_by(src_api.id)).mappings().all()
+    if not apis:
+        return {}, {}, {}
+    new_api_ids = reserveIds(db, dst["api"], len(apis))
+    api_id_mapping = {api["id"]: new_id for api, new_id in zip(apis, new_api_ids)}
+    db.execute(
+        insert(dst["api"]).execution_options(render_nulls=True),
+        [
+            {
+                **{f: api[f] for f in API_FIELDS},
+                **(overrides or {}),
+                "id": api_id_mapping[api["id"]],
+                dst["owner_key"]: dst_owner_id,
+            }
+            for api in apis
+        ],
+    )
+    req_param_id_mapping = _copyParams(
+        db=db,
+        src_model=src["req"],
+        dst_model=dst["req"],
+        src_api_key=src["api_key"],
+        dst_api_key=dst["api_key"],
+        fields=REQ_PARAM_FIELDS,
+        api_id_mapping=api_id_mapping,
+    )
+    resp_param_id_mapping = _copyParams(
+        db=db,
+        src_model=src["resp"],
+        dst_model=dst["resp"],
+        src_api_key=src["api_key"],
+        dst_api_key=dst["api_key"],
+        fields=RESP_PARAM_FIELDS,
+        api_id_mapping=api_id_mapping,
+    )
+    return api_id_mapping, req_param_id_mapping, resp_param_id_mapping
+
+
+# ---- 增量同步：比较src与dst两侧的api树，仅对dst执行必要的插入、更新与删除 ----
+# api通过 method + path 匹配；参数通过 父参数 + location/status_code + name 匹配（同名兄弟参数按出现顺序区分）
+# 匹配上的api与参数保留dst中原有id，写入量与变更量成正比
+
+
+# 为参数树中每个参数生成结构化的匹配键
+def _paramKeys(params: List[Dict], discriminator: str) -> Dict[int, tuple]:
+    keys = {}
+    occurrences = {}
+    for p in sortParamsByLevel(params):
+        parent_key = keys.get(p["parent_param_id"])
+        base_key = (parent_key, p[discriminator], p["name"])
+        index = occurrences.get(base_key, 0)
+        occurrences[base_key] = index + 1
+        keys[p["id"]] = base_key + (index,)
+    return keys
+
+
+# 加载一组api下的全部参数，按api分组
+def _loadParamsByApi(
+    db: Session, model, api_key: str, fields: List[str], api_ids: List[int]
+) -> Dict[int, List[Dict]]:
+    params_by_api = {api_id: [] for api_id in api_ids}
+    if not api_ids:
+        return params_by_api
+    columns = [
+        getattr(model, f) for f in ["id", api_key, "parent_param_id", "tree_path"]
+    ]
+    columns += [getattr(model, f) for f in fields]
+    rows = (
+        db.execute(
+            select(*columns)
+            .where(getattr(model, api_key).in_(api_ids))
+            .order_by(model.id)
+        )
+        .mappings()
+        .all()
+    )
+    for row in rows:
+        params_by_api[row[api_key]].append(row)
+    return params_by_api
+
+
+# 增量同步匹配api的参数树：api_pairs为[(src_api_id, dst_api_id)]，返回变更行数
+def _syncParams(
+    db: Session,
+    src_model,
+    dst_model,
+    src_api_key: str,
+    dst_api_key: str,
+    fields: List[str],
+    discriminator: str,
+    api_pairs: List[tuple],
+) -> int:
+    src_params_by_api = _loadParamsByApi(
+        db, src_model, src_api_key, fields, [src for src, _ in api_pairs]
+    )
+    dst_params_by_api = _loadParamsByApi(
+        db, dst_model, dst_api_key, fields, [dst for _, dst in api_pairs]
+    )
+    to_delete = []
+    to_update = []
+    to_insert = []  # (src参数, dst_api_id)
+    matched = {}  # {src参数id: dst参数id}
+    for src_api_id, dst_api_id in api_pairs:
+        src_params = src_params_by_api[src_api_id]
+        dst_params = dst_params_by_api[dst_api_id]
+        src_keys = _paramKeys(src_params, discriminator)
+        dst_by_key = {
+            key: param_id
+            for param_id, key in _paramKeys(dst_params, discriminator).items()
+        }
+        dst_index = {p["id"]: p for p in dst_params}
+        for p in src_params:
+            dst_id = dst_by_key.pop(src_keys[p["id"]], None)
+            if dst_id is None:
+                to_insert.append((p, dst_api_id))
+                continue
+            matched[p["id"]] = dst_id
+            if any(p[f] != dst_index[dst_id][f] for f in fields):
+                to_update.append({"id": dst_id, **{f: p[f] for f in fields}})
+        # 剩余未匹配的dst参数即为被删除的参数
+        to_delete.extend(dst_by_key.values())
+
+    if to_delete:
+        db.execute(
+            delete(dst_model)
+            .where(dst_model.id.in_(to_delete))
+            .execution_options(synchronize_session=False)
+        )
+    if to_update:
+        db.execute(update(dst_model), to_update)
+    if to_insert:
+        dst_api_by_src_param = {p["id"]: dst_api_id for p, dst_api_id in to_insert}
+        new_params = sortParamsByLevel([p for p, _ in to_insert])
+        new_ids = reserveIds(db, dst_model, len(new_params))
+        param_id_mapping = {p["id"]: new_id for p, new_id in zip(new_params, new_ids)}
+        # 新参数的父参数可能是已匹配的dst参数，也可能是同批新增的参数
+        param_id_mapping.update(matched)
+        paths = {
+            p["id"]: p["tree_path"]
+            for params in dst_params_by_api.values()
+            for p in params
+        }
+        for p, new_id in zip(new_params, new_ids):
+            parent_id = param_id_mapping.get(p["parent_param_id"])
+            paths[new_id] = paramPath(paths[parent_id] if parent_id else "", new_id)
+        db.execute(
+            insert(dst_model).execution_options(render_nulls=True),
+            [
+                {
+                    **{f: p[f] for f in fields},
+                    "id": param_id_mapping[p["id"]],
+                    dst_api_key: dst_api_by_src_param[p["id"]],
+                    "parent_param_id": param_id_mapping.get(p["parent_param_id"]),
+                    "tree_path": paths[param_id_mapping[p["id"]]],
+                }
+                for p in new_params
+            ],
+        )
+    return len(to_delete) + len(to_update) + len(to_insert)
+
+
+# 改名过程中的临时名称（api名称不会以 \x01 开头，不会与已有名称冲突）
+def _renamingName(api_id: int) -> str:
+    return f"\x01renaming:{api_id}"
+
+
+# 按计算好的变更集写入dst：删除（通过CASCADE删除其参数） -> 更新（含参数树增量同步） -> 新增
+# renamed_api_ids为api_updates中改名的dst api：先统一改为临时名称再写入最终名称，
+# 避免同方法的两个api互换名称时，逐行UPDATE的中间状态违反 (service_id, method, name) 唯一约束
+def _applyApiChanges(
+    db: Session,
+    src: dict,
+    dst: dict,
+    src_owner_id: int,
+    dst_owner_id: int,
+    api_pairs: List[tuple],
+    api_updates: List[Dict],
+    new_api_ids: List[int],
+    deleted_api_ids: List[int],
+    renamed_api_ids: List[int],
+) -> dict:
+    dst_api = dst["api"]
+    if deleted_api_ids:
+        db.execute(
+            delete(dst_api)
+            .where(dst_api.id.in_(deleted_api_ids))
+            .execution_options(synchronize_session=False)
+        )
+    if renamed_api_ids:
+        db.execute(
+            update(dst_api),
+            [{"id": id, "name": _renamingName(id)} for id in renamed_api_ids],
+        )
+    if api_updates:
+        db.execute(update(dst_api), api_updates)
+    changed_params = _syncParams(
+        db=db,
+        src_model=src["req"],
+        dst_model=dst["req"],
+        src_api_key=src["api_key"],
+        dst_api_key=dst["api_key"],
+        fields=REQ_PARAM_FIELDS,
+        discriminator="location",
+        api_pairs=api_pairs,
+    )
+    changed_params += _syncParams(
+        db=db,
+        src_model=src["resp"],
+        dst_model=dst["resp"],
+        src_api_key=src["api_key"],
+        dst_api_key=dst["api_key"],
+        fields=RESP_PARAM_FIELDS,
+        discriminator="status_code",
+        api_pairs=api_pairs,
+    )
+    api_id_mapping = dict(api_pairs)
+    api_id_mapping.update(
+        copyApiTrees(
+            db=db,
+            src=src,
+            dst=dst,
+            src_owner_id=src_owner_id,
+            dst_owner_id=dst_owner_id,
+            api_ids=new_api_ids,
+        )
+    )
+    return {
+        "api_id_mapping": api_id_mapping,
+        "inserted": len(new_api_ids),
+        "updated": len(api_updates),
+        "deleted": len(deleted_api_ids),
+        "changed_params": changed_params,
+    }
+
+
+# 增量同步api树：使dst中归属于dst_owner_id的api与src中归属于src_owner_id的api一致
+# 返回 {"api_id_mapping": {源api_id: 目标api_id}, "inserted"/"updated"/"deleted": api变更数, "changed_params": 参数变更数}
+def syncApiTrees(
+    db: Session,
+    src: dict,
+    dst: dict,
+    src_owner_id: int,
+    dst_owner_id: int,
+) -> dict:
+    src_api, dst_api = src["api"], dst["api"]
+    columns = ["id"] + API_FIELDS
+    src_apis = (
+        db.execute(
+            select(*[getattr(src_api, f) for f in columns])
+            .where(getattr(src_api, src["owner_key"]) == src_owner_id)
+            .order_by(src_api.id)
+        )
+        .mappings()
+        .all()
+    )
+    dst_apis = (
+        db.execute(
+            select(*[getattr(dst_api, f) for f in columns])
+            .where(getattr(dst_api, dst["owner_key"]) == dst_owner_id)
+            .order_by(dst_api.id)
+        )
+        .mappings()
+        .all()
+    )
+    dst_by_key = {}
+    deleted_api_ids = []
+    renamed_api_ids = []
+    for api in dst_apis:
+        key = (api["method"], api["path"])
+        if key in dst_by_key:
+            deleted_api_ids.append(api["id"])
+        else:
+            dst_by_key[key] = api
+
+    api_pairs = []
+    new_api_ids = []
+    api_updates = []
+    for api in src_apis:
+        dst_row = dst_by_key.pop((api["method"], api["path"]), None)
+        if dst_row is None:
+            new_api_ids.append(api["id"])
+            continue
+        api_pairs.append((api["id"], dst_row["id"]))
+        if any(api[f] != dst_row[f] for f in API_FIELDS):
+            api_updates.append({"id": dst_row["id"], **{f: api[f] for f in API_FIELDS}})
+        if api["name"] != dst_row["name"]:
+            renamed_api_ids.append(dst_row["id"])
+    deleted_api_ids.extend(api["id"] for api in dst_by_key.values())
+    return _applyApiChanges(
+        db=db,
+        src=src,
+        dst=dst,
+        src_owner_id=src_owner_id,
+        dst_owner_id=dst_owner_id,
+        api_pairs=api_pairs,
+        api_updates=api_updates,
+        new_api_ids=new_api_ids,
+        deleted_api_ids=deleted_api_ids,
+        renamed_api_ids=renamed_api_ids,
+    )
+
+
+# 写时复制迭代的发布：迭代中只物化了被编辑 / 复制 / 删除（墓碑）的api，其余api直接沿用正式表
+# 草稿通过base_api_id与正式表api一一对应：墓碑 -> 删除；有base_api_id -> 增量同步；无base_api_id -> 新增
+# 返回值同syncApiTrees
+def applyApiOverlay(db: Session, service_iteration_id: int, service_id: int) -> dict:
+    columns = ["id", "base_api_id", "is_tombstone"] + API_FIELDS
+    drafts = (
+        db.execute(
+            select(*[getattr(ApiDraft, f) for f in columns])
+            .where(ApiDraft.service_iteration_id == service_iteration_id)
+            .order_by(ApiDraft.id)
+        )
+        .mappings()
+        .all()
+    )
+    base_api_ids = [d["base_api_id"] for d in drafts if d["base_api_id"] is not None]
+    live_apis = {}
+    if base_api_ids:
+        live_apis = {
+            api["id"]: api
+            for api in db.execute(
+                select(*[getattr(Api, f) for f in ["id"] + API_FIELDS]).where(
+                    Api.service_id == service_id, Api.id.in_(base_api_ids)
+                )
+            ).mappings()
+        }
+
+    api_pairs = []
+    new_api_ids = []
+    api_updates = []
+    deleted_api_ids = []
+    renamed_api_ids = []
+    for draft in drafts:
+        live = live_apis.get(draft["base_api_id"])
+        if draft["is_tombstone"]:
+            if live is not None:
+                deleted_api_ids.append(live["id"])
+            continue
+        # 对应的正式api已不存在（例如被其他迭代删除），按新增处理
+        if live is None:
+            new_api_ids.append(draft["id"])
+            continue
+        api_pairs.append((draft["id"], live["id"]))
+        if any(draft[f] != live[f] for f in API_FIELDS):
+            api_updates.append({"id": live["id"], **{f: draft[f] for f in API_FIELDS}})
+        if draft["name"] != live["name"]:
+            renamed_api_ids.append(live["id"])
+    return _applyApiChanges(
+        db=db,
+        src=DRAFT_TABLES,
+        dst=LIVE_TABLES,
+        src_owner_id=service_iteration_id,
+        dst_owner_id=service_id,
+        api_pairs=api_pairs,
+        api_updates=api_updates,
+        new_api_ids=new_api_ids,
+        deleted_api_ids=deleted_api_ids,
+        renamed_api_ids=renamed_api_ids,
+    )
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import os
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Dict, List
+from dotenv import load_dotenv
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from database.enums import OutboxStatus
+from database.models import OutboxEvent
+from mailer import send_email
+
+
+# ---- 事件发件箱（transactional outbox）----
+# 业务操作通过recordEvent在同一事务中写入outbox_event，事务提交即保证事件不会丢失，事件投递不占用接口耗时
+# 分发器（OutboxDispatcher）批量取出待投递的事件，投递到各个sink并记录投递状态：
+# - 多个分发器（多个worker / 独立进程）通过 FOR UPDATE SKIP LOCKED 与租约各自领取不同的事件，投递期间不持有事务
+# - 每个事件记录已投递成功的sink，失败时按指数退避重试，只重投失败的sink；超过最大尝试次数后标记为failed
+# - 重试只由发件箱负责：sink内部不再重试（如邮件直接通过send_email发送，不经过mailer.py的邮件队列）
+# - 投递语义为至少一次（at-least-once），sink可按事件id去重
+# 分发器默认在应用进程内运行（提交后立即唤醒），也可以独立运行：
+#   uv run python -m services.outbox（此时在 .env 中配置 OUTBOX_DISPATCH=external，应用进程内不再启动分发器）
+
+# 事件类型：service版本发布
+SERVICE_VERSION_COMMITTED = "service.version_committed"
+# 每批领取的事件数
+OUTBOX_BATCH_SIZE = 100
+# 最大尝试次数
+OUTBOX_MAX_ATTEMPTS = 8
+# 第n次失败后等待 OUTBOX_RETRY_DELAY * 2^(n-1) 秒再重试
+OUTBOX_RETRY_DELAY = 30
+# 未被唤醒时轮询的间隔（秒），用于领取重试到期的事件和其他进程写入的事件
+OUTBOX_POLL_INTERVAL = 5
+# 单次投递（一个事件到一个sink）的超时时间（秒）
+OUTBOX_DELIVERY_TIMEOUT = 60
+# 领取事件的租约（秒）：领取后该时间内不会被其他分发器再次领取，需大于投递超时
+OUTBOX_LEASE = 2 * OUTBOX_DELIVERY_TIMEOUT
+
+
+# 在db的当前事务中写入一个待投递的事件（随业务数据一起提交）
+def recordEvent(db: Session, event_type: str, payload: dict) -> OutboxEvent:
+    event = OutboxEvent(
+        event_type=event_type,
+        payload=payload,
+        status=OutboxStatus.PENDING,
+        delivered_sinks=[],
+        attempts=0,
+    )
+    db.add(event)
+    return event
+
+
+# ---- sink：name记录在事件的投递状态中，deliver投递单个事件（json），失败时抛出异常 ----
+
+
+# 通过 mailer.py 的send_email发送事件中的邮件（payload.mail），没有邮件的事件直接视为成功
+class EmailSink:
+    name = "email"
+
+    async def deliver(self, event: dict) -> None:
+        mail = event["payload"].get("mail")
+        if not mail:
+            return
+        res = await send_email(**mail)
+        if res["status"] != 200:
+            raise RuntimeError(res["message"])
+
+
+# 将事件以JSON POST到url，非2xx响应视为失败
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, body: bytes) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f"webhook responded {response.status}")
+
+    async def deliver(self, event: dict) -> None:
+        body = json.dumps(event, ensure_ascii=False).encode()
+        await asyncio.to_thread(self._post, body)
+
+
+# 将事件以JSON Lines追加到本地文件
+class FileSink:
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def deliver(self, event: dict) -> None:
+        await asyncio.to_thread(self._append, json.dumps(event, ensure_ascii=False))
+
+
+# 根据 .env 配置创建sink：OUTBOX_SINKS为逗号分隔的sink名称（默认email）
+def createSinksFromEnv() -> list:
+    load_dotenv()
+    sinks = []
+    for name in (os.getenv("OUTBOX_SINKS") or "email").split(","):
+        name = name.strip()
+        if name == "email":
+            sinks.append(EmailSink())
+        elif name == "webhook":
+            url = os.getenv("OUTBOX_WEBHOOK_URL")
+            if not url:
+                raise ValueError("OUTBOX_WEBHOOK_URL is not set in .env file")
+            sinks.append(WebhookSink(url))
+        elif name == "file":
+            sinks.append(FileSink(os.getenv("OUTBOX_FILE") or "outbox-events.jsonl"))
+        elif name:
+            raise ValueError(f"Unknown outbox sink: {name}")
+    return sinks
+
+
+def _eventJson(event: OutboxEvent) -> dict:
+    return {
+        "id": event.id,
+        "event_type": event.event_type,
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+    }
+
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        sinks: list,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        retry_delay: float = OUTBOX_RETRY_DELAY,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        delivery_timeout: float = OUTBOX_DELIVERY_TIMEOUT,
+        lease: float = OUTBOX_LEASE,
+    ):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.delivery_timeout = delivery_timeout
+        self.lease = lease
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    # 在当前事件循环上启动分发任务，session_factory为 async_sessionmaker
+    def start(self, session_factory) -> None:
+        if self._task is None or self._task.done():
+            loop = asyncio.get_running_loop()
+            self._task = loop.create_task(self.run(session_factory))
+
+    # 唤醒分发任务立即领取事件（写入事件的事务提交后调用）；分发器未在本进程运行时无操作
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self, session_factory) -> None:
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                # 领满一批说明可能还有积压，继续领取
+                while await self.dispatchBatch(session_factory) >= self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Outbox dispatch failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # 领取并投递一批到期的事件，返回领取的事件数
+    # 分三步，投递期间不持有行锁和事务：
+    # 1. 领取（短事务）：FOR UPDATE SKIP LOCKED 选出到期的事件，将next_attempt_at设为 当前时间 + 租约 后提交，
+    #    租约期间其他分发器不会领取这些事件；进程在投递中途退出时，租约到期后事件会被重新领取
+    # 2. 投递（事务外）：全部sink并发投递，每次投递最多等待delivery_timeout秒
+    # 3. 记录（短事务）：写入投递结果，已投递的sink与库中记录合并（租约到期被重新领取时不会丢失投递记录）
+    async def dispatchBatch(self, session_factory) -> int:
+        async with session_factory() as db:
+            events = (
+                await db.scalars(
+                    select(OutboxEvent)
+                    .where(
+                        OutboxEvent.status == OutboxStatus.PENDING,
+                        or_(
+                            OutboxEvent.next_attempt_at.is_(None),
+                            OutboxEvent.next_attempt_at <= datetime.now(),
+                        ),
+                    )
+                    .order_by(OutboxEvent.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            if not events:
+                return 0
+            lease_until = datetime.now() + timedelta(seconds=self.lease)
+            for event in events:
+                event.next_attempt_at = lease_until
+            delivered: Dict[int, set] = {
+                e.id: set(e.delivered_sinks or []) for e in events
+            }
+            data = {e.id: _eventJson(e) for e in events}
+            await db.commit()
+
+        errors: Dict[int, List[str]] = {event_id: [] for event_id in data}
+        jobs = [
+            (sink, event_id)
+            for sink in self.sinks
+            for event_id in data
+            if sink.name not in delivered[event_id]
+        ]
+        results = await asyncio.gather(
+            *[
+                asyncio.wait_for(sink.deliver(data[event_id]), self.delivery_timeout)
+                for sink, event_id in jobs
+            ],
+            return_exceptions=True,
+        )
+        for (sink, event_id), result in zip(jobs, results):
+            if isinstance(result, asyncio.TimeoutError):
+                errors[event_id].append(f"{sink.name}: timed out")
+            elif isinstance(result, Exception):
+                errors[event_id].append(f"{sink.name}: {result}")
+            else:
+                delivered[event_id].add(sink.name)
+
+        async with session_factory() as db:
+            events = (
+                await db.scalars(
+                    select(OutboxEvent)
+                    .where(OutboxEvent.id.in_(list(data)))
+                    .with_for_update()
+                )
+            ).all()
+            now = datetime.now()
+            for event in events:
+                event.attempts += 1
+                event.delivered_sinks = sorted(
+                    delivered[event.id] | set(event.delivered_sinks or [])
+                )
+                if not errors[event.id]:
+                    event.status = OutboxStatus.DELIVERED
+                    event.delivered_at = now
+                    event.next_attempt_at = None
+                    event.last_error = None
+                    continue
+                event.last_error = "; ".join(errors[event.id])
+                if event.attempts >= self.max_attempts:
+                    event.status = OutboxStatus.FAILED
+                    print(f"Outbox event {event.id} failed: {event.last_error}")
+                else:
+                    event.next_attempt_at = now + timedelta(
+                        seconds=self.retry_delay * 2 ** (event.attempts - 1)
+                    )
+            await db.commit()
+        return len(data)
+
+
+outbox_dispatcher = OutboxDispatcher(sinks=createSinksFromEnv())
+
+
+# 独立运行分发器
+# 用法（在 BE-CAM 目录下）：uv run python -m services.outbox
+if __name__ == "__main__":
+    from database.database import async_session
+
+    asyncio.run(outbox_dispatcher.run(async_session))
@@ -0,0 +1,277 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from database.models import Api, ApiDraft, ServiceIteration
+from services.bulk import (
+    API_FIELDS,
+    LIVE_TABLES,
+    DRAFT_TABLES,
+    copyApiTreesWithParamIds,
+)
+
+
+# ---- 写时复制迭代：迭代只物化被编辑 / 复制 / 删除（墓碑）的api，读取时在基线之上叠加草稿还原完整api列表 ----
+# - 进行中的迭代：基线为正式表（Api），尚未物化的正式api以虚拟草稿返回，其id为 -api_id（负数，不会与真实草稿id冲突）
+# - 已发布的迭代：基线为base_iteration_id指向的迭代，沿基线逐级回溯，直到完整快照（历史数据）或无基线
+# 草稿与正式api之间通过base_api_id标识同一个api
+
+
+def toVirtualDraftId(api_id: int) -> int:
+    return -api_id
+
+
+def isVirtualDraftId(api_draft_id: int) -> bool:
+    return api_draft_id < 0
+
+
+# 获取已发布迭代的叠加链（从当前迭代到最早的基线迭代）
+def getIterationChain(db: Session, service_iteration: ServiceIteration) -> List[int]:
+    iterations = {
+        row.id: row
+        for row in db.execute(
+            select(
+                ServiceIteration.id,
+                ServiceIteration.base_iteration_id,
+                ServiceIteration.is_copy_on_write,
+            ).where(ServiceIteration.service_id == service_iteration.service_id)
+        )
+    }
+    chain = []
+    curr = iterations.get(service_iteration.id)
+    while curr is not None and curr.id not in chain:
+        chain.append(curr.id)
+        # 完整快照即为叠加链终点
+        if not curr.is_copy_on_write:
+            break
+        curr = iterations.get(curr.base_iteration_id)
+    return chain
+
+
+# 还原已发布迭代（历史版本）的完整api草稿列表
+def resolveCommittedApiDrafts(
+    db: Session, service_iteration: ServiceIteration
+) -> List[ApiDraft]:
+    chain = getIterationChain(db, service_iteration)
+    position = {service_iteration_id: i for i, service_iteration_id in enumerate(chain)}
+    drafts = (
+        db.query(ApiDraft)
+        .filter(ApiDraft.service_iteration_id.in_(chain))
+        .order_by(ApiDraft.id)
+        .all()
+    )
+    # 越新的迭代越靠前，同一个api以最新迭代中的草稿为准
+    drafts.sort(key=lambda d: position[d.service_iteration_id])
+    seen_api_ids = set()
+    resolved = []
+    for draft in drafts:
+        if draft.base_api_id is not None:
+            if draft.base_api_id in seen_api_ids:
+                continue
+            seen_api_ids.add(draft.base_api_id)
+        if not draft.is_tombstone:
+            resolved.append(draft)
+    resolved.sort(key=lambda d: d.id)
+    return resolved
+
+
+# 正式api转为进行中迭代的虚拟草稿
+def _toVirtualDraftJson(api: Api, service_iteration_id: int) -> dict:
+    data = api.toJson()
+    data.pop("service_id", None)
+    data.update(
+        {
+            "id": toVirtualDraftId(api.id),  # type: ignore
+            "service_iteration_id": service_iteration_id,
+            "base_api_id": api.id,
+            "is_tombstone": False,
+        }
+    )
+    return data
+
+
+# 还原迭代的完整api列表（json）
+def resolveIterationApiDraftsJson(
+    db: Session, service_iteration: ServiceIteration
+) -> List[dict]:
+    if service_iteration.is_committed:
+        return [d.toJson() for d in resolveCommittedApiDrafts(db, service_iteration)]
+    drafts = (
+        db.query(ApiDraft)
+        .filter(ApiDraft.service_iteration_id == service_iteration.id)
+        .order_by(ApiDraft.id)
+        .all()
+    )
+    resolved = [d.toJson() for d in drafts if not d.is_tombstone]
+    # 完整快照的迭代（历史数据）无需叠加正式表
+    if not service_iteration.is_copy_on_write:
+        return resolved
+    overridden_api_ids = {d.base_api_id for d in drafts if d.base_api_id is not None}
+    live_apis = (
+        db.query(Api)
+        .filter(Api.service_id == service_iteration.service_id)
+        .order_by(Api.id)
+        .all()
+    )
+    resolved += [
+        _toVirtualDraftJson(api, service_iteration.id)  # type: ignore
+        for api in live_apis
+        if api.id not in overridden_api_ids
+    ]
+    return resolved
+
+
+# 写操作前解析api_draft_id：负数id为尚未物化的正式api，将其物化为本迭代的草稿
+# with_params为True时连同请求参数和响应参数一起物化（如编辑只需要api自有属性，参数会被整体替换）
+# 返回None表示草稿不存在或不属于该迭代
+def materializeApiDraft(
+    db: Session,
+    service_iteration: ServiceIteration,
+    api_draft_id: int,
+    with_params: bool = True,
+) -> ApiDraft | None:
+    if not isVirtualDraftId(api_draft_id):
+        api_draft = db.get(ApiDraft, api_draft_id)
+        if (
+            not api_draft
+            or api_draft.service_iteration_id != service_iteration.id
+            or api_draft.is_tombstone
+        ):
+            return None
+        return api_draft
+    api_id = -api_draft_id
+    # 已在本迭代物化过，直接返回已有草稿
+    existing_draft = (
+        db.query(ApiDraft)
+        .filter(
+            ApiDraft.service_iteration_id == service_iteration.id,
+            ApiDraft.base_api_id == api_id,
+        )
+        .first()
+    )
+    if existing_draft:
+        return None if existing_draft.is_tombstone else existing_draft
+    api = db.get(Api, api_id)
+    if not api or api.service_id != service_iteration.service_id:
+        return None
+    if with_params:
+        return materializeApiDraftWithParamIds(
+            db=db, service_iteration=service_iteration, api_draft_id=api_draft_id
+        )[0]
+    api_draft = ApiDraft(
+        service_iteration_id=service_iteration.id,
+        base_api_id=api_id,
+        **{f: getattr(api, f) for f in API_FIELDS},
+    )
+    db.add(api_draft)
+    db.flush()
+    return api_draft
+
+
+# 同materializeApiDraft（连同参数物化），额外返回本次物化的参数id映射：
+# (草稿, {"req": {正式参数id: 草稿参数id}, "resp": {...}})，草稿无需物化（或已物化过）时映射为空
+def materializeApiDraftWithParamIds(
+    db: Session, service_iteration: ServiceIteration, api_draft_id: int
+) -> Tuple[ApiDraft | None, Dict[str, Dict[int, int]]]:
+    no_mapping = {"req": {}, "resp": {}}
+    if not isVirtualDraftId(api_draft_id):
+        return materializeApiDraft(db, service_iteration, api_draft_id), no_mapping
+    api_id = -api_draft_id
+    existing_draft = (
+        db.query(ApiDraft)
+        .filter(
+            ApiDraft.service_iteration_id == service_iteration.id,
+            ApiDraft.base_api_id == api_id,
+        )
+        .first()
+    )
+    if existing_draft:
+        return (None if existing_draft.is_tombstone else existing_draft), no_mapping
+    api = db.get(Api, api_id)
+    if not api or api.service_id != service_iteration.service_id:
+        return None, no_mapping
+    api_id_mapping, req_param_id_mapping, resp_param_id_mapping = (
+        copyApiTreesWithParamIds(
+            db=db,
+            src=LIVE_TABLES,
+            dst=DRAFT_TABLES,
+            src_owner_id=api.service_id,  # type: ignore
+            dst_owner_id=service_iteration.id,  # type: ignore
+            api_ids=[api_id],
+            overrides={"base_api_id": api_id},
+        )
+    )
+    return db.get(ApiDraft, api_id_mapping[api_id]), {
+        "req": req_param_id_mapping,
+        "resp": resp_param_id_mapping,
+    }
+
+
+# 回填草稿对应的正式api id：draft_to_api为{草稿id: 正式api id}
+def recordBaseApiIds(
+    db: Session, service_iteration_id: int, draft_to_api: Dict[int, int]
+) -> None:
+    if not draft_to_api:
+        return
+    current = dict(
+        db.execute(
+            select(ApiDraft.id, ApiDraft.base_api_id).where(
+                ApiDraft.service_iteration_id == service_iteration_id
+            )
+        ).all()
+    )
+    changes = [
+        {"id": draft_id, "base_api_id": api_id}
+        for draft_id, api_id in draft_to_api.items()
+        if draft_id in current and current[draft_id] != api_id
+    ]
+    if changes:
+        db.execute(update(ApiDraft), changes)
+
+
+# 为完整快照迭代（历史数据）的草稿按 method + path 补齐base_api_id，使其可以作为写时复制迭代的基线
+def backfillBaseApiIds(
+    db: Session, service_iteration_id: int, service_id: int
+) -> None:
+    db.execute(
+        update(ApiDraft)
+        .where(
+            ApiDraft.service_iteration_id == service_iteration_id,
+            ApiDraft.base_api_id.is_(None),
+            Api.service_id == service_id,
+            Api.method == ApiDraft.method,
+            Api.path == ApiDraft.path,
+        )
+        .values(base_api_id=Api.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# 删除已发布迭代前，将其中仍被后续版本沿用的草稿并入以其为基线的迭代，保证后续历史版本可还原
+# 返回并入的迭代（不存在时返回None）
+def foldIterationIntoChild(
+    db: Session, service_iteration: ServiceIteration
+) -> ServiceIteration | None:
+    child = (
+        db.query(ServiceIteration)
+        .filter(ServiceIteration.base_iteration_id == service_iteration.id)
+        .first()
+    )
+    if not child:
+        return None
+    overridden_api_ids = select(ApiDraft.base_api_id).where(
+        ApiDraft.service_iteration_id == child.id,
+        ApiDraft.base_api_id.isnot(None),
+    )
+    db.query(ApiDraft).filter(
+        ApiDraft.service_iteration_id == service_iteration.id,
+        or_(
+            ApiDraft.base_api_id.is_(None),
+            ApiDraft.base_api_id.not_in(overridden_api_ids),
+        ),
+    ).update(
+        {ApiDraft.service_iteration_id: child.id}, synchronize_session=False
+    )
+    child.base_iteration_id = service_iteration.base_iteration_id
+    child.is_copy_on_write = service_iteration.is_copy_on_write
+    return child
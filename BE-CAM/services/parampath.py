@@ -0,0 +1,142 @@
+from typing import Dict, Iterable, List, Mapping
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.orm import Session
+
+from database.models import (
+    RequestParam,
+    ResponseParam,
+    RequestParamDraft,
+    ResponseParamDraft,
+)
+from services.paramtree import enumValue
+
+
+# ---- 参数的物化路径（tree_path）----
+# 每个参数记录从根参数到自身的id序列，如根参数12下的34下的56为 "12/34/56/"（以 / 结尾，"12/" 不会匹配 "123/"）
+# - 子树（含自身）：tree_path LIKE '12/34/%'，一次索引范围查询，用于读取 / 删除子树、统计子孙数量
+# - 深度：tree_path 中 / 的个数
+# - 写入时由父参数的路径与自身id得到（id均在写入前通过reserveIds预取）；移动子树时一条UPDATE替换前缀
+# 旧数据迁移后通过 uv run python -m services.parampath 一次性回填
+
+PARAM_MODELS = [RequestParam, ResponseParam, RequestParamDraft, ResponseParamDraft]
+# 回填时每批处理的api数
+_BACKFILL_CHUNK_SIZE = 500
+
+
+# 参数的路径：parent_path为父参数的路径（根参数为空字符串；父参数的路径尚未回填时为None，直接报错）
+def paramPath(parent_path: str, id: int) -> str:
+    return parent_path + f"{id}/"
+
+
+# 以path为根的子树（含自身）的查询条件
+def subtreeFilter(model, path: str):
+    return model.tree_path.startswith(path)
+
+
+# 将以old_path为根的子树移动到new_path（一条UPDATE替换全部子孙的路径前缀）
+def movePathsStatement(model, old_path: str, new_path: str):
+    return (
+        update(model)
+        .where(subtreeFilter(model, old_path))
+        .values(
+            tree_path=literal(new_path)
+            + func.substr(model.tree_path, len(old_path) + 1)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# 计算参数行的路径：rows需包含 id、parent_param_id，返回{id: 路径}
+# 父参数不在rows中时，从parent_paths中取父参数的路径（都不在时视为根参数）
+def buildPaths(
+    rows: Iterable[Mapping], parent_paths: Mapping[int, str] | None = None
+) -> Dict[int, str]:
+    parent_paths = parent_paths or {}
+    rows = list(rows)
+    ids = {row["id"] for row in rows}
+    children_by_parent = {}
+    level = []
+    for row in rows:
+        parent_id = row["parent_param_id"]
+        if parent_id is None or parent_id not in ids:
+            level.append((row["id"], parent_paths.get(parent_id, "")))
+        else:
+            children_by_parent.setdefault(parent_id, []).append(row["id"])
+    paths = {}
+    while level:
+        next_level = []
+        for id, parent_path in level:
+            path = paths[id] = paramPath(parent_path, id)
+            next_level += [(child, path) for child in children_by_parent.get(id, [])]
+        level = next_level
+    return paths
+
+
+# 通过点分路径（如 data.items.name）查找参数，返回参数行（未找到时为None）
+# rows为候选参数行（需包含 id、name、tree_path 及 scope 中的列），即名称为路径中某一段的全部参数，
+# 从数据库中取候选行只需一次 (api, name) 查询；scope用于限定根参数，如 {"location": "body"}、{"status_code": 200}
+# 路径相同的参数有多个时返回id最小的
+def findParamByPath(
+    rows: Iterable[Mapping], names: List[str], scope: Mapping | None = None
+) -> Mapping | None:
+    rows_by_id = {row["id"]: row for row in rows}
+    for id in sorted(rows_by_id):
+        row = rows_by_id[id]
+        if row["name"] != names[-1] or not row["tree_path"]:
+            continue
+        path_ids = [int(i) for i in row["tree_path"].split("/")[:-1]]
+        if len(path_ids) != len(names):
+            continue
+        ancestors = [rows_by_id.get(i) for i in path_ids]
+        if any(a is None or a["name"] != n for a, n in zip(ancestors, names)):
+            continue
+        root = ancestors[0]
+        if scope and any(enumValue(root[k]) != enumValue(v) for k, v in scope.items()):
+            continue
+        return row
+    return None
+
+
+# 回填model中路径为空的参数的路径（按api分批，重新计算这些api的全部参数路径），返回更新的行数
+def rebuildParamPaths(db: Session, model) -> int:
+    api_key = "api_id" if hasattr(model, "api_id") else "api_draft_id"
+    api_column = getattr(model, api_key)
+    api_ids = list(
+        db.scalars(
+            select(api_column)
+            .where(model.tree_path.is_(None))
+            .distinct()
+            .order_by(api_column)
+        )
+    )
+    updated = 0
+    for i in range(0, len(api_ids), _BACKFILL_CHUNK_SIZE):
+        current = {
+            row["id"]: row
+            for row in db.execute(
+                select(model.id, model.parent_param_id, model.tree_path).where(
+                    api_column.in_(api_ids[i : i + _BACKFILL_CHUNK_SIZE])
+                )
+            ).mappings()
+        }
+        values = [
+            {"id": id, "tree_path": path}
+            for id, path in buildPaths(current.values()).items()
+            if current[id]["tree_path"] != path
+        ]
+        if values:
+            db.execute(update(model), values)
+        updated += len(values)
+    return updated
+
+
+# 回填全部参数表的路径
+# 用法（在 BE-CAM 目录下）：uv run python -m services.parampath
+if __name__ == "__main__":
+    from database.database import session
+
+    with session() as db:
+        for model in PARAM_MODELS:
+            updated = rebuildParamPaths(db, model)
+            db.commit()
+            print(f"{model.__tablename__}: {updated} params updated")
@@ -0,0 +1,239 @@
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Iterable, List, Mapping, Sequence
+from sqlalchemy import DateTime, inspect
+
+from database.enums import ParamLocation, ParamType
+
+
+# ---- 参数树引擎 ----
+# 参数行（ORM参数对象或查询结果行）一次遍历构建为紧凑的节点树，api详情、OpenAPI导出、参数局部修改等共用：
+# - 节点使用 __slots__，只引用参数行（ORM对象已加载的 __dict__ 或查询结果的 RowMapping，不复制）与子节点列表
+#   （叶子节点不分配列表），构建时不为每个参数创建中间字典
+# - 父参数出现在子参数之后（如移动过的参数）时，子参数先暂存，父参数出现时再挂载，兄弟参数保持输入顺序
+# - 父参数不在本次数据中的孤儿参数不挂载（与根参数区分）
+# - 遍历全部为迭代实现（显式栈），深层嵌套不受Python递归深度限制
+# 输出由emitter决定：toJson（api详情的 children_params 结构），fold（自底向上折叠，如OpenAPI Schema）
+# api详情只需嵌套字典，由paramsToJson一次遍历直接生成，不构建节点树
+
+# 参数节点的枚举列：输出时转换为value（查表转换，非枚举值原样输出）
+_ENUM_FIELDS = {"location", "type", "array_child_type"}
+_ENUM_VALUES = {
+    member: member.value for enum in (ParamLocation, ParamType) for member in enum
+}
+
+
+# 枚举值转换为value，其他值原样返回（参数列的值均可哈希，查表转换）
+def enumValue(value):
+    return _ENUM_VALUES.get(value, value)
+
+
+class ParamTreeNode:
+    __slots__ = ("row", "children")
+
+    def __init__(self, row: Mapping):
+        self.row = row
+        self.children = None
+
+    # 列值（枚举转换为value），不存在的列返回None
+    def get(self, column: str):
+        value = self.row.get(column)
+        return value.value if isinstance(value, Enum) else value
+
+
+# 参数行 -> 字典的函数（按 列名 + 日期列 缓存）：与 toJson 的序列化函数相同，编译为一个字典字面量
+# 枚举列转换为value，日期列转换为isoformat字符串
+_ROW_JSON = {}
+
+
+def _rowJsonFunction(columns: tuple, datetime_columns: frozenset):
+    key = (columns, datetime_columns)
+    function = _ROW_JSON.get(key)
+    if function is None:
+        items = []
+        for c in columns:
+            expr = f"row[{c!r}]"
+            if c in _ENUM_FIELDS:
+                expr = f"_enumValue(v := {expr}, v)"
+            elif c in datetime_columns:
+                expr = f"(v.isoformat() if isinstance(v := {expr}, datetime) else v)"
+            items.append(f"        {c!r}: {expr},")
+        source = "def rowJson(row):\n    return {\n%s\n    }\n" % "\n".join(items)
+        namespace = {"_enumValue": _ENUM_VALUES.get, "datetime": datetime}
+        exec(compile(source, "<param tree row json>", "exec"), namespace)
+        function = _ROW_JSON[key] = namespace["rowJson"]
+    return function
+
+
+# ORM参数对象 -> 字典的函数（按模型缓存）：已加载的列直接从实例 __dict__ 读取，未加载 / 已过期的列通过属性读取
+_PARAM_JSON = {}
+
+
+def _paramJsonFunction(model):
+    function = _PARAM_JSON.get(model)
+    if function is None:
+        keys, _, datetime_keys = _modelColumns(model)
+        items = []
+        for c in keys:
+            expr = f"(d[{c!r}] if {c!r} in d else obj.{c})"
+            if c in _ENUM_FIELDS:
+                expr = f"_enumValue(v := {expr}, v)"
+            elif c in datetime_keys:
+                expr = f"(v.isoformat() if isinstance(v := {expr}, datetime) else v)"
+            items.append(f"        {c!r}: {expr},")
+        source = (
+            "def paramJson(obj):\n    d = obj.__dict__\n    return {\n%s\n    }\n"
+            % "\n".join(items)
+        )
+        namespace = {"_enumValue": _ENUM_VALUES.get, "datetime": datetime}
+        exec(compile(source, f"<param json {model.__name__}>", "exec"), namespace)
+        function = _PARAM_JSON[model] = namespace["paramJson"]
+    return function
+
+
+# 模型的列名、列名集合与日期列（按模型缓存），列顺序与toJson一致
+_MODEL_COLUMNS = {}
+
+
+def _modelColumns(model) -> tuple:
+    columns = _MODEL_COLUMNS.get(model)
+    if columns is None:
+        mapper_columns = inspect(model).columns
+        keys = tuple(c.key for c in mapper_columns)
+        datetime_keys = frozenset(
+            c.key for c in mapper_columns if isinstance(c.type, DateTime)
+        )
+        columns = _MODEL_COLUMNS[model] = (keys, frozenset(keys), datetime_keys)
+    return columns
+
+
+# ORM参数对象直接输出嵌套的参数字典列表（api详情格式，与 ParamTree.fromParams(params).toJson() 输出一致）
+# api详情的快速路径：不构建节点树，一次遍历序列化每个参数并挂载到父参数字典的 children_params 中
+def paramsToJson(params: list) -> List[Dict]:
+    if not params:
+        return []
+    param_json = _paramJsonFunction(type(params[0]))
+    items = {}
+    roots = []
+    waiting = {}  # 父参数尚未出现的子参数：{parent_id: [子参数字典]}
+    for param in params:
+        item = param_json(param)
+        id = item["id"]
+        items[id] = item
+        if id in waiting:
+            item["children_params"] = waiting.pop(id)
+        parent_id = item["parent_param_id"]
+        if not parent_id:
+            roots.append(item)
+            continue
+        parent = items.get(parent_id)
+        if parent is None:
+            waiting.setdefault(parent_id, []).append(item)
+        elif "children_params" in parent:
+            parent["children_params"].append(item)
+        else:
+            parent["children_params"] = [item]
+    return roots
+
+
+class ParamTree:
+    __slots__ = ("columns", "roots", "nodes", "_row_json")
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        rows: Iterable[Mapping],
+        datetime_columns: Iterable[str] = (),
+    ):
+        """
+        rows 为参数行（按列名取值，需包含 id、parent_param_id），按输出顺序排列
+        columns 为 toJson 输出的列，datetime_columns 中的列输出为isoformat字符串
+        """
+        self.columns = tuple(columns)
+        self._row_json = _rowJsonFunction(self.columns, frozenset(datetime_columns))
+        nodes = self.nodes = {}
+        roots = self.roots = []
+        waiting = {}  # 父参数尚未出现的子参数：{parent_id: [子节点]}
+        for row in rows:
+            node = ParamTreeNode(row)
+            id = row["id"]
+            nodes[id] = node
+            if id in waiting:
+                node.children = waiting.pop(id)
+            parent_id = row["parent_param_id"]
+            if not parent_id:
+                roots.append(node)
+                continue
+            parent = nodes.get(parent_id)
+            if parent is None:
+                waiting.setdefault(parent_id, []).append(node)
+            elif parent.children is None:
+                parent.children = [node]
+            else:
+                parent.children.append(node)
+
+    # 从ORM参数对象（或同结构的未入库对象）构建，列为模型的全部列
+    # 各列均已加载时直接引用实例的 __dict__，有未加载 / 已过期（或未赋值）的列时通过属性读取
+    @classmethod
+    def fromParams(cls, params: list) -> "ParamTree":
+        if not params:
+            return cls(("id", "parent_param_id"), ())
+        keys, key_set, datetime_keys = _modelColumns(type(params[0]))
+        rows = []
+        for param in params:
+            d = param.__dict__
+            rows.append(
+                d if d.keys() >= key_set else {k: getattr(param, k) for k in keys}
+            )
+        return cls(keys, rows, datetime_keys)
+
+    # 从查询结果行（如 select(model.__table__) 的 RowMapping，包含模型的全部列）构建
+    @classmethod
+    def fromRows(cls, model, rows: Iterable[Mapping]) -> "ParamTree":
+        keys, _, datetime_keys = _modelColumns(model)
+        return cls(keys, rows, datetime_keys)
+
+    # 以roots（默认为全部根参数）为根输出嵌套的参数字典列表（api详情格式），先序遍历
+    # 节点字典的键与toJson一致，有子参数时附加 children_params
+    def toJson(self, roots: List[ParamTreeNode] | None = None) -> List[Dict]:
+        row_json = self._row_json
+        roots = self.roots if roots is None else roots
+        result = [row_json(node.row) for node in roots]
+        # 栈中为 (兄弟节点列表, 对应的字典列表)
+        stack = [(roots, result)]
+        while stack:
+            siblings, items = stack.pop()
+            for node, item in zip(siblings, items):
+                children = node.children
+                if children:
+                    child_items = item["children_params"] = [
+                        row_json(child.row) for child in children
+                    ]
+                    stack.append((children, child_items))
+        return result
+
+    # 自底向上折叠：emit(node, 子节点结果列表) 返回节点的结果，返回以root为根的结果（后序遍历）
+    # expand(node) 为False时不处理其子参数（emit收到空列表）
+    @staticmethod
+    def fold(root: ParamTreeNode, emit, expand=None):
+        # 栈中为待处理的节点，子节点全部处理完后再次处理父节点（以None标记）
+        # 子节点的结果按顺序压入results，处理父节点时取出末尾的len(children)个
+        results = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                node = stack.pop()
+                count = len(node.children)
+                child_results = results[-count:]
+                del results[-count:]
+                results.append(emit(node, child_results))
+                continue
+            children = node.children
+            if children and (expand is None or expand(node)):
+                stack.append(node)
+                stack.append(None)
+                stack.extend(reversed(children))
+            else:
+                results.append(emit(node, []))
+        return results[0]
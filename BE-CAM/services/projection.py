@@ -0,0 +1,230 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import and_, func, inspect, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from database.models import User
+from cache import shared_cache
+
+
+# ---- 列投影查询（列表接口）----
+# 只查询需要的列，关联对象（如owner）在同一条语句中JOIN，总数通过窗口函数 count(*) OVER () 一并返回，
+# 结果直接组装为字典，不创建ORM实例（无identity map开销，也不会触发逐行懒加载）
+# 输出与 toJson(include=[...]) 一致：关联对象在前，列按模型定义顺序
+
+# 关联对象输出的列：与 toJson() 默认输出一致（排除password）
+RELATION_FIELDS = {
+    User: [c.key for c in inspect(User).columns if c.key != "password"],
+}
+# 游标分页的总数缓存时间（秒）：总数为近似值，新增 / 删除后最多延迟该时间反映
+COUNT_CACHE_TTL = 60
+
+
+def _jsonValue(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# 按模型列定义顺序排列字段
+def _orderedFields(model, fields: List[str]) -> List[str]:
+    return [c.key for c in inspect(model).columns if c.key in fields]
+
+
+# 构建投影查询语句：relations为{输出键: (关联模型, 外键列)}，关联对象通过LEFT JOIN在同一条语句中查询
+def _selectProjection(
+    model, fields: List[str], relations: Dict[str, Tuple[type, object]] | None
+):
+    columns = [getattr(model, f).label(f) for f in fields]
+    joins = []
+    for key, (related_model, foreign_key) in (relations or {}).items():
+        # 使用别名，避免与where条件中同一模型的子查询互相关联
+        related = aliased(related_model)
+        joins.append((related, related.id == foreign_key))
+        columns += [
+            getattr(related, f).label(f"{key}__{f}")
+            for f in RELATION_FIELDS[related_model]
+        ]
+    stmt = select(*columns).select_from(model)
+    for related, on in joins:
+        stmt = stmt.outerjoin(related, on)
+    return stmt
+
+
+def _rowsToJson(
+    rows, fields: List[str], relations: Dict[str, Tuple[type, object]] | None
+) -> List[Dict]:
+    items = []
+    for row in rows:
+        mapping = row._mapping
+        item = {}
+        for key, (related_model, _) in (relations or {}).items():
+            related_fields = RELATION_FIELDS[related_model]
+            item[key] = (
+                {f: _jsonValue(mapping[f"{key}__{f}"]) for f in related_fields}
+                if mapping[f"{key}__id"] is not None
+                else None
+            )
+        for f in fields:
+            item[f] = _jsonValue(mapping[f])
+        items.append(item)
+    return items
+
+
+# 分页查询model的指定列
+# 返回 (字典列表, 总数)；页码超出范围时额外执行一次count查询
+def selectPage(
+    db: Session,
+    model,
+    fields: List[str],
+    where: list,
+    order_by: list,
+    page_size: int,
+    current_page: int,
+    relations: Dict[str, Tuple[type, object]] | None = None,
+) -> Tuple[List[Dict], int]:
+    fields = _orderedFields(model, fields)
+    rows = db.execute(
+        _selectProjection(model, fields, relations)
+        .add_columns(func.count().over().label("_total"))
+        .where(*where)
+        .order_by(*order_by)
+        .limit(page_size)
+        .offset((current_page - 1) * page_size)
+    ).all()
+    if rows:
+        total = rows[0]._total
+    elif current_page > 1:
+        total = db.scalar(select(func.count()).select_from(model).where(*where))
+    else:
+        total = 0
+    return _rowsToJson(rows, fields, relations), total
+
+
+# ---- 游标（keyset）分页 ----
+# 游标为不透明字符串，编码翻页方向与当前页边界行的id：
+# - next：取排序在该行之后的一页；prev：取排序在该行之前的一页
+# 按 (排序键, id) 降序，翻页条件为 (排序键, id) 与边界行比较（边界行的排序键按id查出），无需OFFSET，深分页不变慢
+
+
+def encodeCursor(direction: str, id: int) -> str:
+    raw = json.dumps({"d": direction, "id": id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# 解析游标，返回 (方向, id)；格式错误时抛出ValueError
+def decodeCursor(cursor: str) -> Tuple[str, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        direction, id = data["d"], data["id"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("invalid cursor") from e
+    if direction not in ("next", "prev") or not isinstance(id, int):
+        raise ValueError("invalid cursor")
+    return direction, id
+
+
+# 降序排列时位于边界行之后（after为True）或之前的行
+def _keysetCondition(model, sort_key, boundary_id: int, after: bool):
+    def compare(a, b):
+        return a < b if after else a > b
+
+    if sort_key is None:
+        return compare(model.id, boundary_id)
+    boundary_key = select(sort_key).where(model.id == boundary_id).scalar_subquery()
+    return or_(
+        compare(sort_key, boundary_key),
+        and_(sort_key == boundary_key, compare(model.id, boundary_id)),
+    )
+
+
+# 带缓存的总数：count_key标识查询条件，同一条件的总数在COUNT_CACHE_TTL内复用，翻页时不再每次COUNT
+def cachedCount(db: Session, model, where: list, count_key: str) -> int:
+    return shared_cache.getOrLoad(
+        key=f"count:{count_key}",
+        loader=lambda: db.scalar(select(func.count()).select_from(model).where(*where)),
+        ttl=COUNT_CACHE_TTL,
+    )
+
+
+# 游标分页查询model的指定列，按 (sort_key, id) 降序（sort_key为空时只按id降序），sort_key不能为NULL
+# cursor为空时返回第一页；返回 {items, next_cursor, prev_cursor, total}，没有下一页 / 上一页时游标为None
+def selectKeysetPage(
+    db: Session,
+    model,
+    fields: List[str],
+    where: list,
+    page_size: int,
+    cursor: str | None,
+    count_key: str,
+    sort_key=None,
+    relations: Dict[str, Tuple[type, object]] | None = None,
+) -> Dict:
+    direction, boundary_id = decodeCursor(cursor) if cursor else ("next", None)
+    fields = _orderedFields(model, fields)
+    # 多取一行，判断翻页方向上是否还有更多数据
+    stmt = _selectProjection(model, fields, relations).where(*where).limit(page_size + 1)
+    if boundary_id is not None:
+        stmt = stmt.where(
+            _keysetCondition(model, sort_key, boundary_id, after=direction == "next")
+        )
+    sort_columns = ([sort_key] if sort_key is not None else []) + [model.id]
+    if direction == "next":
+        stmt = stmt.order_by(*[c.desc() for c in sort_columns])
+    else:
+        stmt = stmt.order_by(*[c.asc() for c in sort_columns])
+    rows = db.execute(stmt).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "prev":
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, boundary_id is not None
+    ids = [row._mapping["id"] for row in rows]
+    return {
+        "items": _rowsToJson(rows, fields, relations),
+        "next_cursor": encodeCursor("next", ids[-1]) if ids and has_next else None,
+        "prev_cursor": encodeCursor("prev", ids[0]) if ids and has_prev else None,
+        "total": cachedCount(db, model, where, count_key),
+    }
+
+
+# 列表接口分页：cursor为None时按页码分页，否则为游标分页（空字符串表示第一页）
+# 两种方式均按 (sort_key, id) 降序；返回 {items, total}，游标分页另含next_cursor、prev_cursor
+def selectListPage(
+    db: Session,
+    model,
+    fields: List[str],
+    where: list,
+    page_size: int,
+    current_page: int,
+    cursor: str | None,
+    count_key: str,
+    sort_key=None,
+    relations: Dict[str, Tuple[type, object]] | None = None,
+) -> Dict:
+    if cursor is not None:
+        return selectKeysetPage(
+            db=db,
+            model=model,
+            fields=fields,
+            where=where,
+            page_size=page_size,
+            cursor=cursor,
+            count_key=count_key,
+            sort_key=sort_key,
+            relations=relations,
+        )
+    order_by = ([sort_key.desc()] if sort_key is not None else []) + [model.id.desc()]
+    items, total = selectPage(
+        db=db,
+        model=model,
+        fields=fields,
+        where=where,
+        order_by=order_by,
+        page_size=page_size,
+        current_page=current_page,
+        relations=relations,
+    )
+    return {"items": items, "total": total}
@@ -1,5 +1,7 @@
+import asyncio
 from datetime import datetime, timezone
-from mailer import send_email
+from sqlalchemy import exists, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from urllib.parse import unquote
 
@@ -8,54 +10,89 @@ from database.models import (
     Service,
     ServiceIteration,
     Api,
-    RequestParam,
-    ResponseParam,
     ApiDraft,
-    RequestParamDraft,
-    ResponseParamDraft,
+    OpenapiDocument,
+    user_service_link,
+)
+from cache import shared_cache
+from services.utils import (
+    FROZEN_CACHE_TTL,
+    checkServiceIterationPermission,
+    frozenCacheKey,
+    invalidateFrozenCache,
+    invalidateServiceCache,
+    isServiceMaintainer,
+    openapiTemplate,
+    serviceCacheScope,
+    storeOpenapiDocument,
+)
+from services.user import userGetCurrentUser
+from services.bulk import (
+    LIVE_TABLES,
+    DRAFT_TABLES,
+    copyApiTrees,
+    syncApiTrees,
+    applyApiOverlay,
+)
+from services.aio import asyncVariant
+from services.store import compactIterationParams, loadApiDraftParams
+from services.outbox import (
+    SERVICE_VERSION_COMMITTED,
+    outbox_dispatcher,
+    recordEvent,
+)
+from services.projection import selectListPage
+from services.overlay import (
+    backfillBaseApiIds,
+    foldIterationIntoChild,
+    recordBaseApiIds,
+    resolveCommittedApiDrafts,
+    resolveIterationApiDraftsJson,
 )
-from services.utils import checkServiceIterationPermission, openapiTemplate
 
 
 # 获取全部服务
+# cursor不为None时使用游标分页（空字符串为第一页），返回结果额外包含next_cursor、prev_cursor
 def serviceGetAllServices(
-    db: Session, user_id: int, page_size: int, current_page: int
+    db: Session,
+    user_id: int,
+    page_size: int,
+    current_page: int,
+    cursor: str | None = None,
 ) -> dict:
     # 非L0用户没有权限查看所有服务
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if user.level.value != 0:  # type: ignore
         return {
             "status": -1,
             "message": "You don't have permission to view all services",
         }
-    services = (
-        db.query(Service)
-        .order_by(Service.id.desc())
-        .limit(page_size)
-        .offset((current_page - 1) * page_size)
-        .all()
+    page = selectListPage(
+        db=db,
+        model=Service,
+        fields=[
+            "id",
+            "service_uuid",
+            "version",
+            "description",
+            "owner_id",
+            "created_at",
+            "is_deleted",
+            "deleted_at",
+        ],
+        where=[],
+        page_size=page_size,
+        current_page=current_page,
+        cursor=cursor,
+        count_key="services:all",
+        relations={"owner": (User, Service.owner_id)},
     )
-    total = db.query(Service).count()
+    services = page.pop("items")
     return {
         "status": 200,
         "message": "Get services success",
-        "services": [
-            service.toJson(
-                include=[
-                    "id",
-                    "service_uuid",
-                    "version",
-                    "description",
-                    "owner_id",
-                    "owner",
-                    "created_at",
-                    "is_deleted",
-                    "deleted_at",
-                ]
-            )
-            for service in services
-        ],
-        "total": total,
+        "services": services,
+        **page,
     }
 
 
@@ -67,7 +104,7 @@ def serviceGetServiceById(db: Session, id: int, user_id: int) -> dict:
             "status": -1,
             "message": "Service not found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户只能查看自己的服务
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
@@ -83,113 +120,97 @@ def serviceGetServiceById(db: Session, id: int, user_id: int) -> dict:
 
 # 通过用户id获取用户的所有最新版本服务（Service表中）的列表
 def serviceGetHisNewestServicesByOwnerId(
-    db: Session, owner_id: int, my_id: int, page_size: int, current_page: int
+    db: Session,
+    owner_id: int,
+    my_id: int,
+    page_size: int,
+    current_page: int,
+    cursor: str | None = None,
 ) -> dict:
     # 非L0用户只能查看自己的服务
-    user = db.get(User, my_id)
+    user = userGetCurrentUser(db, my_id)
     if user.level.value != 0 and owner_id != my_id:  # type: ignore
         return {
             "status": -1,
             "message": "You are not the owner of these services",
         }
-    services = (
-        db.query(Service)
-        .filter(~Service.is_deleted, Service.owner_id == owner_id)
-        .order_by(Service.id.desc())
-        .limit(page_size)
-        .offset((current_page - 1) * page_size)
-        .all()
-    )
-    total = (
-        db.query(Service)
-        .filter(~Service.is_deleted, Service.owner_id == owner_id)
-        .count()
+    page = selectListPage(
+        db=db,
+        model=Service,
+        fields=[
+            "id",
+            "service_uuid",
+            "version",
+            "description",
+            "owner_id",
+            "created_at",
+            "is_deleted",
+        ],
+        where=[~Service.is_deleted, Service.owner_id == owner_id],
+        page_size=page_size,
+        current_page=current_page,
+        cursor=cursor,
+        count_key=f"services:owner:{owner_id}",
+        # 查询自己的服务时无需包含owner
+        relations=None if owner_id == my_id else {"owner": (User, Service.owner_id)},
     )
-    # 查询自己的服务想：无需包含owner
-    if owner_id == my_id:
-        services = [
-            service.toJson(
-                include=[
-                    "id",
-                    "service_uuid",
-                    "version",
-                    "description",
-                    "owner_id",
-                    "created_at",
-                    "is_deleted",
-                ]
-            )
-            for service in services
-        ]
-    else:
-        services = [
-            service.toJson(
-                include=[
-                    "id",
-                    "service_uuid",
-                    "version",
-                    "description",
-                    "owner_id",
-                    "owner",
-                    "created_at",
-                    "is_deleted",
-                ]
-            )
-            for service in services
-        ]
+    services = page.pop("items")
     return {
         "status": 200,
         "message": "Get services success",
         "services": services,
-        "total": total,
+        **page,
     }
 
 
 # 通过用户id获取用户的所有维护服务（Service表中）的列表
 def serviceGetHisMaintainedServicesByUserId(
-    db: Session, user_id: int, my_id: int, page_size: int, current_page: int
+    db: Session,
+    user_id: int,
+    my_id: int,
+    page_size: int,
+    current_page: int,
+    cursor: str | None = None,
 ) -> dict:
     # 非L0用户只能查看自己的服务
-    user = db.get(User, my_id)
+    user = userGetCurrentUser(db, my_id)
     if user.level.value != 0 and user_id != my_id:  # type: ignore
         return {
             "status": -1,
             "message": "You don't have authorization to view other users' maintained services",
         }
-    services = (
-        db.query(Service)
-        .filter(~Service.is_deleted, Service.maintainers.any(User.id == user_id))
-        .order_by(Service.id.desc())
-        .limit(page_size)
-        .offset((current_page - 1) * page_size)
-        .all()
-    )
-    total = (
-        db.query(Service)
-        .filter(~Service.is_deleted, Service.maintainers.any(User.id == user_id))
-        .count()
-    )
     # 因为是维护的服务，所以owner肯定不是自己，因此总是返回owner信息
-    services = [
-        service.toJson(
-            include=[
-                "id",
-                "service_uuid",
-                "version",
-                "description",
-                "owner_id",
-                "owner",
-                "created_at",
-                "is_deleted",
-            ]
-        )
-        for service in services
-    ]
+    page = selectListPage(
+        db=db,
+        model=Service,
+        fields=[
+            "id",
+            "service_uuid",
+            "version",
+            "description",
+            "owner_id",
+            "created_at",
+            "is_deleted",
+        ],
+        where=[
+            ~Service.is_deleted,
+            exists().where(
+                user_service_link.c.service_id == Service.id,
+                user_service_link.c.user_id == user_id,
+            ),
+        ],
+        page_size=page_size,
+        current_page=current_page,
+        cursor=cursor,
+        count_key=f"services:maintainer:{user_id}",
+        relations={"owner": (User, Service.owner_id)},
+    )
+    services = page.pop("items")
     return {
         "status": 200,
         "message": "Get services success",
         "services": services,
-        "total": total,
+        **page,
     }
 
 
@@ -232,9 +253,9 @@ def serviceGetServiceByUuidAndVersion(
                 "message": "Service version not found",
             }
 
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户，为当前service owner或maintainer或当前迭代creator，才有权限查看
-    if curr_service.owner_id != user_id and user not in curr_service.maintainers and user.level.value != 0:  # type: ignore
+    if curr_service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, curr_service.id, user_id):  # type: ignore
         if is_latest:  # 最新版
             return {
                 "status": -3,
@@ -245,12 +266,35 @@ def serviceGetServiceByUuidAndVersion(
                 "status": -4,
                 "message": "You are not the creator of this service iteration",
             }
+    # 需要包含service下全部API，但不包含API下的params
+    def loadServiceInfo() -> dict:
+        if is_latest:
+            return service.toJson(include_relations=True)
+        # 历史版本：在基线版本之上叠加各迭代草稿，还原该版本的完整api列表
+        service_info = service.toJson(
+            include_relations=True, exclude=["api_drafts", "service"]
+        )
+        service_info["api_drafts"] = resolveIterationApiDraftsJson(db, service)  # type: ignore
+        return service_info
+
+    if is_latest:
+        service_info = shared_cache.getOrLoad(
+            key="detail:latest",
+            loader=loadServiceInfo,
+            scope=serviceCacheScope(curr_service.id),  # type: ignore
+        )
+    else:
+        # 历史版本不可变，按迭代id缓存；所属service的最新信息实时附加
+        service_info = shared_cache.getOrLoad(
+            key=frozenCacheKey("detail", service.id),  # type: ignore
+            loader=loadServiceInfo,
+            ttl=FROZEN_CACHE_TTL,
+        )
+        service_info["service"] = curr_service.toJson()
     return {
         "status": 200,
         "message": "Get service success",
-        "service": service.toJson(
-            include_relations=True
-        ),  # 需要包含service下全部API，但不包含API下的params
+        "service": service_info,
         "is_latest": is_latest,
     }
 
@@ -280,9 +324,9 @@ def serviceGetAllVersionsByUuid(db: Session, service_uuid: str, user_id: int) ->
         .all()
     )
 
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户只能查看自己的服务，或自己维护的服务
-    if curr_service.owner_id != user_id and user not in curr_service.maintainers and user.level.value != 0:  # type: ignore
+    if curr_service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, curr_service.id, user_id):  # type: ignore
         return {
             "status": -2,
             "message": "You are neither the owner nor the maintainer of this service",
@@ -340,40 +384,39 @@ def serviceCreateNewService(
 
 # 通过user_id获取全部删除的服务
 def serviceGetAllDeletedServicesByUserId(
-    db: Session, user_id: int, page_size: int, current_page: int
+    db: Session,
+    user_id: int,
+    page_size: int,
+    current_page: int,
+    cursor: str | None = None,
 ) -> dict:
-    services = (
-        db.query(Service)
-        .filter(Service.is_deleted, Service.owner_id == user_id)
-        .order_by(Service.deleted_at.desc())
-        .limit(page_size)
-        .offset((current_page - 1) * page_size)
-        .all()
-    )
-    total = (
-        db.query(Service)
-        .filter(Service.is_deleted, Service.owner_id == user_id)
-        .count()
+    page = selectListPage(
+        db=db,
+        model=Service,
+        fields=[
+            "id",
+            "service_uuid",
+            "description",
+            "version",
+            "owner_id",
+            "created_at",
+            "is_deleted",
+            "deleted_at",
+        ],
+        where=[Service.is_deleted, Service.owner_id == user_id],
+        page_size=page_size,
+        current_page=current_page,
+        cursor=cursor,
+        count_key=f"services:deleted:{user_id}",
+        # 按删除时间排序（历史数据可能缺少删除时间，以创建时间代替）
+        sort_key=func.coalesce(Service.deleted_at, Service.created_at),
     )
+    services = page.pop("items")
     return {
         "status": 200,
         "message": "Get deleted services success",
-        "deleted_services": [
-            service.toJson(
-                include=[
-                    "id",
-                    "service_uuid",
-                    "description",
-                    "version",
-                    "owner_id",
-                    "created_at",
-                    "is_deleted",
-                    "deleted_at",
-                ]
-            )
-            for service in services
-        ],
-        "total": total,
+        "deleted_services": services,
+        **page,
     }
 
 
@@ -387,7 +430,7 @@ def serviceIsMaintainer(
             "status": -1,
             "message": "Service not found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户只能查看自己的服务maintainer信息
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
@@ -417,7 +460,7 @@ def serviceAddOrRemoveServiceMaintainerById(
             "status": -1,
             "message": "Service not found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户只能为自己的服务添加maintainer
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
@@ -443,6 +486,7 @@ def serviceAddOrRemoveServiceMaintainerById(
         service.maintainers.append(candidate)  # type: ignore
         message = "Add service maintainer success"
     db.commit()
+    invalidateServiceCache(service.id)  # type: ignore
     return {
         "status": 200,
         "message": message,
@@ -458,7 +502,7 @@ def serviceDeleteServiceById(db: Session, id: int, user_id: int) -> dict:
             "status": -1,
             "message": "Service not found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户只能删除自己的服务
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
@@ -468,6 +512,7 @@ def serviceDeleteServiceById(db: Session, id: int, user_id: int) -> dict:
     service.is_deleted = True  # type: ignore
     service.deleted_at = datetime.now(timezone.utc)  # type: ignore
     db.commit()
+    invalidateServiceCache(service.id)  # type: ignore
     return {
         "status": 200,
         "message": "Delete service success",
@@ -482,7 +527,7 @@ def serviceRestoreServiceById(db: Session, id: int, user_id: int) -> dict:
             "status": -1,
             "message": "Service not found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户只能还原自己的服务
     if service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
@@ -497,6 +542,7 @@ def serviceRestoreServiceById(db: Session, id: int, user_id: int) -> dict:
     service.is_deleted = False  # type: ignore
     service.deleted_at = None  # type: ignore
     db.commit()
+    invalidateServiceCache(service.id)  # type: ignore
     return {
         "status": 200,
         "message": "Restore service success",
@@ -517,7 +563,7 @@ def serviceDeleteIterationById(
             "status": -1,
             "message": "No service iteration found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户，为当前service owner或当前迭代creator，才有权限删除
     if (
         service_iteration.service.owner_id != user_id
@@ -528,8 +574,21 @@ def serviceDeleteIterationById(
             "status": -2,
             "message": "You are neither the owner of this service, nor the creator of this service iteration",
         }
+    # 写时复制：后续版本可能沿用本迭代的草稿，删除前将其并入以本迭代为基线的迭代
+    child = None
+    if service_iteration.is_committed:  # type: ignore
+        child = foldIterationIntoChild(db=db, service_iteration=service_iteration)
+    # 参数通过 CASCADE 删除
+    db.query(ApiDraft).filter(
+        ApiDraft.service_iteration_id == service_iteration.id
+    ).delete(synchronize_session=False)
+    service_id, child_id = service_iteration.service_id, child.id if child else None
     db.delete(service_iteration)
     db.commit()
+    invalidateServiceCache(service_id)  # type: ignore
+    invalidateFrozenCache(service_iteration_id)
+    if child_id:
+        invalidateFrozenCache(child_id)  # type: ignore
     return {
         "status": 200,
         "message": "Delete service iteration success",
@@ -545,7 +604,7 @@ def serviceGetServiceIterationById(db: Session, id: int, user_id: int) -> dict:
             "status": -1,
             "message": "Service iteration not found",
         }
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户，为当前service owner或maintainer或当前迭代creator，才有权限查看
     if iteration.creator_id != user_id and iteration.service.owner_id != user_id and user.level.value != 0:  # type: ignore
         return {
@@ -557,10 +616,13 @@ def serviceGetServiceIterationById(db: Session, id: int, user_id: int) -> dict:
             "status": -3,
             "message": "Service iteration has been committed",
         }
+    # 未物化的正式api以虚拟草稿（id为负数）返回
+    iteration_info = iteration.toJson(include_relations=True, exclude=["api_drafts"])
+    iteration_info["api_drafts"] = resolveIterationApiDraftsJson(db, iteration)
     return {
         "status": 200,
         "message": "Get service iteration success",
-        "iteration": iteration.toJson(include_relations=True),
+        "iteration": iteration_info,
     }
 
 
@@ -574,8 +636,8 @@ def serviceStartIteration(db: Session, service_id: int, user_id: int) -> dict:
             "message": "Service not found",
         }
     # 非L0用户，为当前service owner或当前迭代creator，才有权限发起迭代
-    user = db.get(User, user_id)
-    if curr_service.owner_id != user_id and user not in curr_service.maintainers and user.level.value != 0:  # type: ignore
+    user = userGetCurrentUser(db, user_id)
+    if curr_service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, curr_service.id, user_id):  # type: ignore
         return {
             "status": -2,
             "message": "You are neither the owner nor the maintainer of this service",
@@ -598,94 +660,18 @@ def serviceStartIteration(db: Session, service_id: int, user_id: int) -> dict:
             "service_iteration_id": existing_new_iteration.id,
         }
     # 符合发起迭代条件
+    # 写时复制：发起迭代时不拷贝任何api，只有被编辑 / 复制 / 删除的api才会物化为草稿
     new_iteration = ServiceIteration(
         service_id=service_id,
         creator_id=user_id,
         version=None,
         description=None,
         is_committed=False,
+        is_copy_on_write=True,
     )
     db.add(new_iteration)
-    db.flush()  # 获取 new_iteration.id
-    # 将当前服务最新版本全部信息备份到新迭代周期
-    for api in curr_service.apis:
-        api_draft = ApiDraft(
-            service_iteration_id=new_iteration.id,
-            owner_id=api.owner_id,
-            category_id=api.category_id,
-            name=api.name,
-            method=api.method,
-            path=api.path,
-            description=api.description,
-            level=api.level,
-            is_enabled=api.is_enabled,
-        )
-        db.add(api_draft)
-        db.flush()
-
-        # 建立请求参数的ID映射关系
-        req_param_id_mapping = {}
-        for req in api.request_params:
-            request_param_draft = RequestParamDraft(
-                api_draft_id=api_draft.id,
-                name=req.name,
-                location=req.location,
-                type=req.type,
-                required=req.required,
-                default_value=req.default_value,
-                description=req.description,
-                example=req.example,
-                array_child_type=req.array_child_type,
-                parent_param_id=None,  # 先设为None，后续更新
-            )
-            db.add(request_param_draft)
-            db.flush()
-            req_param_id_mapping[req.id] = request_param_draft.id
-
-        # 更新请求参数的parent_param_id
-        for req in api.request_params:
-            if req.parent_param_id is not None:
-                draft_param = (
-                    db.query(RequestParamDraft)
-                    .filter(RequestParamDraft.id == req_param_id_mapping[req.id])
-                    .first()
-                )
-                if draft_param:
-                    draft_param.parent_param_id = req_param_id_mapping[
-                        req.parent_param_id
-                    ]
-
-        # 建立响应参数的ID映射关系
-        resp_param_id_mapping = {}
-        for resp in api.response_params:
-            response_param_draft = ResponseParamDraft(
-                api_draft_id=api_draft.id,
-                status_code=resp.status_code,
-                name=resp.name,
-                type=resp.type,
-                required=resp.required,
-                description=resp.description,
-                example=resp.example,
-                array_child_type=resp.array_child_type,
-                parent_param_id=None,  # 先设为None，后续更新
-            )
-            db.add(response_param_draft)
-            db.flush()
-            resp_param_id_mapping[resp.id] = response_param_draft.id
-
-        # 更新响应参数的parent_param_id
-        for resp in api.response_params:
-            if resp.parent_param_id is not None:
-                draft_param = (
-                    db.query(ResponseParamDraft)
-                    .filter(ResponseParamDraft.id == resp_param_id_mapping[resp.id])
-                    .first()
-                )
-                if draft_param:
-                    draft_param.parent_param_id = resp_param_id_mapping[
-                        resp.parent_param_id
-                    ]
     db.commit()
+    invalidateServiceCache(service_id)
     return {
         "status": 200,
         "message": "Start service iteration success",
@@ -693,8 +679,8 @@ def serviceStartIteration(db: Session, service_id: int, user_id: int) -> dict:
     }
 
 
-# 完成service迭代流程，service版本更新
-async def serviceCommitIteration(
+# 完成service迭代流程的数据库部分（含写入发布事件）
+def _commitIteration(
     db: Session, service_iteration_id: int, new_version: str, user_id: int
 ) -> dict:
     # 版本迭代行为权限校验
@@ -704,7 +690,7 @@ async def serviceCommitIteration(
         user_id=user_id,
     )
     if not check_res["is_ok"]:
-        return check_res
+        return check_res["error"]
     service_iteration = check_res["service_iteration"]
     service = service_iteration.service
     if new_version == service.version:
@@ -713,104 +699,109 @@ async def serviceCommitIteration(
             "message": "New version is the same as current version",
         }
     # 符合提交迭代条件
+    # 基线迭代：发布前与service最新版本对齐的已发布迭代
+    base_iteration = (
+        db.query(ServiceIteration)
+        .filter(
+            ServiceIteration.service_id == service.id,
+            ServiceIteration.is_committed,
+            ServiceIteration.version == service.version,
+        )
+        .order_by(ServiceIteration.id.desc())
+        .first()
+    )
+    # 完整快照的基线迭代（历史数据）可能缺少base_api_id，按method+path补齐
+    if base_iteration and not base_iteration.is_copy_on_write:
+        backfillBaseApiIds(
+            db=db, service_iteration_id=base_iteration.id, service_id=service.id
+        )
+        # 顺带转存其参数（历史数据，只在首次作为基线时执行）
+        compactIterationParams(db=db, service_iteration_id=base_iteration.id)
     # 将service_iteration全部信息更新到service
     service.description = service_iteration.description
     service.version = new_version
-    # 递归删除service下所有api，并通过CASCADE删除api下所有相关的request_params和response_params
-    db.query(Api).filter(Api.service_id == service.id).delete(synchronize_session=False)
-
-    for api_draft in service_iteration.api_drafts:
-        new_api = Api(
-            service_id=service.id,
-            owner_id=api_draft.owner_id,
-            category_id=api_draft.category_id,
-            name=api_draft.name,
-            method=api_draft.method,
-            path=api_draft.path,
-            description=api_draft.description,
-            level=api_draft.level,
-            is_enabled=api_draft.is_enabled,
+    if service_iteration.is_copy_on_write:
+        # 写时复制迭代：只将物化的草稿（编辑 / 新增 / 墓碑）应用到正式表
+        sync_res = applyApiOverlay(
+            db=db, service_iteration_id=service_iteration.id, service_id=service.id
         )
-        db.add(new_api)
-        db.flush()
-
-        # 建立请求参数的ID映射关系
-        req_param_id_mapping = {}
-        for req in api_draft.request_params:
-            request_param = RequestParam(
-                api_id=new_api.id,
-                name=req.name,
-                location=req.location,
-                type=req.type,
-                required=req.required,
-                default_value=req.default_value,
-                description=req.description,
-                example=req.example,
-                array_child_type=req.array_child_type,
-                parent_param_id=None,  # 先设为None，后续更新
-            )
-            db.add(request_param)
-            db.flush()
-            req_param_id_mapping[req.id] = request_param.id
-
-        # 更新请求参数的parent_param_id
-        for req in api_draft.request_params:
-            if req.parent_param_id is not None:
-                param = (
-                    db.query(RequestParam)
-                    .filter(RequestParam.id == req_param_id_mapping[req.id])
-                    .first()
+    else:
+        # 完整快照迭代：比较草稿与正式表中的api树（api通过method+path匹配），仅执行必要的插入、更新与删除
+        sync_res = syncApiTrees(
+            db=db,
+            src=DRAFT_TABLES,
+            dst=LIVE_TABLES,
+            src_owner_id=service_iteration.id,
+            dst_owner_id=service.id,
+        )
+    # 未变更的api及参数保留原有id；回填草稿对应的正式api id，用于历史版本中跨版本标识同一个api
+    recordBaseApiIds(
+        db=db,
+        service_iteration_id=service_iteration.id,
+        draft_to_api=sync_res["api_id_mapping"],
+    )
+    if service_iteration.is_copy_on_write:
+        if base_iteration:
+            service_iteration.base_iteration_id = base_iteration.id
+        else:
+            # 无基线迭代（如服务首次迭代）：将未变更的正式api物化到本迭代，使其成为完整快照
+            overridden_api_ids = {
+                api_id
+                for (api_id,) in db.query(ApiDraft.base_api_id).filter(
+                    ApiDraft.service_iteration_id == service_iteration.id,
+                    ApiDraft.base_api_id.isnot(None),
                 )
-                if param:
-                    param.parent_param_id = req_param_id_mapping[req.parent_param_id]
-
-        # 建立响应参数的ID映射关系
-        resp_param_id_mapping = {}
-        for resp in api_draft.response_params:
-            response_param = ResponseParam(
-                api_id=new_api.id,
-                status_code=resp.status_code,
-                name=resp.name,
-                type=resp.type,
-                required=resp.required,
-                description=resp.description,
-                example=resp.example,
-                array_child_type=resp.array_child_type,
-                parent_param_id=None,  # 先设为None，后续更新
+            }
+            unchanged_api_ids = [
+                api_id
+                for (api_id,) in db.query(Api.id).filter(Api.service_id == service.id)
+                if api_id not in overridden_api_ids
+            ]
+            api_id_mapping = copyApiTrees(
+                db=db,
+                src=LIVE_TABLES,
+                dst=DRAFT_TABLES,
+                src_owner_id=service.id,
+                dst_owner_id=service_iteration.id,
+                api_ids=unchanged_api_ids,
             )
-            db.add(response_param)
-            db.flush()
-            resp_param_id_mapping[resp.id] = response_param.id
-
-        # 更新响应参数的parent_param_id
-        for resp in api_draft.response_params:
-            if resp.parent_param_id is not None:
-                param = (
-                    db.query(ResponseParam)
-                    .filter(ResponseParam.id == resp_param_id_mapping[resp.id])
-                    .first()
-                )
-                if param:
-                    param.parent_param_id = resp_param_id_mapping[resp.parent_param_id]
+            recordBaseApiIds(
+                db=db,
+                service_iteration_id=service_iteration.id,
+                draft_to_api={v: k for k, v in api_id_mapping.items()},
+            )
+            service_iteration.is_copy_on_write = False
 
+    # 已发布迭代的参数转存到内容寻址存储（param_node），相同的参数子树只存储一次
+    compactIterationParams(db=db, service_iteration_id=service_iteration.id)
     service_iteration.version = new_version
     service_iteration.is_committed = True
-    db.commit()
-    # 发送邮件通知当前service全部相关人
+    # 发布事件与发布在同一事务中写入发件箱，由分发器投递（邮件通知当前service全部相关人）
     # 收集收件人并去重
     recipients = {service.owner.email}
     for maintainer in service.maintainers:
         if maintainer.email:
             recipients.add(maintainer.email)
-    mailRes = await send_email(
-        to_email=list(recipients),
-        subject=f"服务 {service.service_uuid} 版本更新",
-        content=f"您好！您负责 / 维护的服务 {service.service_uuid} 已更新到版本 {new_version}。\n"
-        f"可通过 https://cam-api.com/service?uuid={service.service_uuid} 查看详情。\n\n"
-        f"操作人：{check_res["user"].nickname} ({check_res["user"].username}) - {check_res["user"].email}\n",
+    recordEvent(
+        db=db,
+        event_type=SERVICE_VERSION_COMMITTED,
+        payload={
+            "service_id": service.id,
+            "service_uuid": service.service_uuid,
+            "service_iteration_id": service_iteration.id,
+            "version": new_version,
+            "operator_id": user_id,
+            "mail": dict(
+                to_email=sorted(r for r in recipients if r),
+                subject=f"服务 {service.service_uuid} 版本更新",
+                content=f"您好！您负责 / 维护的服务 {service.service_uuid} 已更新到版本 {new_version}。\n"
+                f"可通过 https://cam-api.com/service?uuid={service.service_uuid} 查看详情。\n\n"
+                f"操作人：{check_res["user"].nickname} ({check_res["user"].username}) - {check_res["user"].email}\n",
+            ),
+        },
     )
-    if mailRes["status"] != 200:
-        print(f"Send email failed: {mailRes.get('message', 'Unknown error')}")
+    db.commit()
+    invalidateServiceCache(service.id)  # type: ignore
     return {
         "status": 200,
         "message": "Commit service iteration success",
@@ -820,6 +811,63 @@ async def serviceCommitIteration(
     }
 
 
+# 完成service迭代流程，service版本更新
+async def serviceCommitIteration(
+    db: Session, service_iteration_id: int, new_version: str, user_id: int
+) -> dict:
+    res = _commitIteration(
+        db=db,
+        service_iteration_id=service_iteration_id,
+        new_version=new_version,
+        user_id=user_id,
+    )
+    # 发布事件由分发器在后台投递，接口在数据库事务完成后即返回
+    if res["status"] == 200:
+        outbox_dispatcher.notify()
+        precomputeOpenapiDocument(db=db, service_iteration_id=service_iteration_id)
+    return res
+
+
+# 异步版本：数据库部分在run_sync中执行
+# OpenAPI文档的预生成（序列化、gzip / brotli压缩、YAML转换）是纯CPU计算，放在run_sync中会阻塞事件循环，
+# 因此在发布事务提交后通过 asyncio.to_thread 在线程池中使用独立的同步session执行
+async def serviceCommitIterationAsync(
+    db: AsyncSession, service_iteration_id: int, new_version: str, user_id: int
+) -> dict:
+    res = await db.run_sync(
+        _commitIteration,
+        service_iteration_id=service_iteration_id,
+        new_version=new_version,
+        user_id=user_id,
+    )
+    if res["status"] == 200:
+        outbox_dispatcher.notify()
+        await asyncio.to_thread(_precomputeOpenapiDocumentInThread, service_iteration_id)
+    return res
+
+
+# 预生成已发布版本的OpenAPI文档，导出历史版本时直接返回；生成失败不影响发布（导出时会重新生成）
+def precomputeOpenapiDocument(db: Session, service_iteration_id: int) -> None:
+    try:
+        service_iteration = db.get(ServiceIteration, service_iteration_id)
+        storeOpenapiDocument(
+            db=db,
+            service_iteration_id=service_iteration_id,
+            openapi=buildIterationOpenapi(db, service_iteration),  # type: ignore
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Precompute openapi document failed: {e}")
+
+
+def _precomputeOpenapiDocumentInThread(service_iteration_id: int) -> None:
+    from database.database import session
+
+    with session() as db:
+        precomputeOpenapiDocument(db=db, service_iteration_id=service_iteration_id)
+
+
 # 通过 service_iteration_id 修改 service description
 def serviceUpdateDescription(
     db: Session, service_iteration_id: int, description: str, user_id: int
@@ -834,15 +882,29 @@ def serviceUpdateDescription(
     # 符合修改条件
     service_iteration.description = description
     db.commit()
+    invalidateServiceCache(service_iteration.service_id)
     return {
         "status": 200,
         "message": "Update service description success",
     }
 
 
+# 生成已发布迭代（历史版本）的OpenAPI文档
+def buildIterationOpenapi(db: Session, service_iteration: ServiceIteration) -> dict:
+    api_drafts = resolveCommittedApiDrafts(db, service_iteration)
+    return openapiTemplate(
+        service=service_iteration,
+        is_latest=False,
+        apis=api_drafts,  # type: ignore
+        params=loadApiDraftParams(db, api_drafts),
+    )
+
+
 # 导出openapi
+# 历史版本返回预生成的文档（openapi_document，JSON经gzip压缩），最新版本返回openapi_object
+# stream为True时最新版本只返回service_id，由调用方通过streamOpenapiTemplate流式生成文档
 def serviceExportOpenapiByUuidAndVersion(
-    db: Session, service_uuid: str, version: str, user_id: int
+    db: Session, service_uuid: str, version: str, user_id: int, stream: bool = False
 ) -> dict:
     # 把 url 编码的字符串解码，否则 / 是 %2F
     service_uuid = unquote(service_uuid).strip()
@@ -879,9 +941,9 @@ def serviceExportOpenapiByUuidAndVersion(
                 "message": "Service version not found",
             }
 
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     # 非L0用户，为当前service owner或maintainer或当前迭代creator，才有权限查看
-    if curr_service.owner_id != user_id and user not in curr_service.maintainers and user.level.value != 0:  # type: ignore
+    if curr_service.owner_id != user_id and user.level.value != 0 and not isServiceMaintainer(db, curr_service.id, user_id):  # type: ignore
         if is_latest:  # 最新版
             return {
                 "status": -3,
@@ -892,9 +954,40 @@ def serviceExportOpenapiByUuidAndVersion(
                 "status": -4,
                 "message": "You are not the creator of this service iteration",
             }
-    openapi = openapiTemplate(
-        service=service,
-        is_latest=is_latest,
+    if not is_latest:
+        # 历史版本不可变，返回发布时预生成的文档（历史数据首次导出时生成）
+        document = db.get(OpenapiDocument, service.id)
+        if document is None:
+            # 并发的首次导出会各自生成，写入时保留先写入的文档，提交后重新读取
+            storeOpenapiDocument(
+                db=db,
+                service_iteration_id=service.id,  # type: ignore
+                openapi=buildIterationOpenapi(db, service),  # type: ignore
+            )
+            db.commit()
+            document = db.get(OpenapiDocument, service.id)
+        return {
+            "status": 200,
+            "message": "Get service success",
+            "openapi_document": {
+                "etag": document.etag,
+                "json_gzip": document.json_gzip,
+                "json_br": document.json_br,
+                "yaml_gzip": document.yaml_gzip,
+            },
+            "is_latest": is_latest,
+        }
+    if stream:
+        return {
+            "status": 200,
+            "message": "Get service success",
+            "service_id": curr_service.id,
+            "is_latest": is_latest,
+        }
+    openapi = shared_cache.getOrLoad(
+        key="openapi:latest",
+        loader=lambda: openapiTemplate(service=service, is_latest=is_latest),
+        scope=serviceCacheScope(curr_service.id),  # type: ignore
     )
     return {
         "status": 200,
@@ -902,3 +995,23 @@ def serviceExportOpenapiByUuidAndVersion(
         "openapi_object": openapi,
         "is_latest": is_latest,
     }
+
+
+# ---- 异步版本（db为AsyncSession），见 services/aio.py ----
+serviceGetAllServicesAsync = asyncVariant(serviceGetAllServices)
+serviceGetServiceByIdAsync = asyncVariant(serviceGetServiceById)
+serviceGetHisNewestServicesByOwnerIdAsync = asyncVariant(serviceGetHisNewestServicesByOwnerId)
+serviceGetHisMaintainedServicesByUserIdAsync = asyncVariant(serviceGetHisMaintainedServicesByUserId)
+serviceGetServiceByUuidAndVersionAsync = asyncVariant(serviceGetServiceByUuidAndVersion)
+serviceGetAllVersionsByUuidAsync = asyncVariant(serviceGetAllVersionsByUuid)
+serviceCreateNewServiceAsync = asyncVariant(serviceCreateNewService)
+serviceGetAllDeletedServicesByUserIdAsync = asyncVariant(serviceGetAllDeletedServicesByUserId)
+serviceIsMaintainerAsync = asyncVariant(serviceIsMaintainer)
+serviceAddOrRemoveServiceMaintainerByIdAsync = asyncVariant(serviceAddOrRemoveServiceMaintainerById)
+serviceDeleteServiceByIdAsync = asyncVariant(serviceDeleteServiceById)
+serviceRestoreServiceByIdAsync = asyncVariant(serviceRestoreServiceById)
+serviceDeleteIterationByIdAsync = asyncVariant(serviceDeleteIterationById)
+serviceGetServiceIterationByIdAsync = asyncVariant(serviceGetServiceIterationById)
+serviceStartIterationAsync = asyncVariant(serviceStartIteration)
+serviceUpdateDescriptionAsync = asyncVariant(serviceUpdateDescription)
+serviceExportOpenapiByUuidAndVersionAsync = asyncVariant(serviceExportOpenapiByUuidAndVersion)
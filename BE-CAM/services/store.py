@@ -0,0 +1,321 @@
+import hashlib
+import json
+from typing import Dict, List, Tuple
+from sqlalchemy import cast, delete, literal, null, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.models import (
+    ApiDraft,
+    RequestParamDraft,
+    ResponseParamDraft,
+    ServiceIteration,
+    ParamNode,
+)
+from services.bulk import (
+    DRAFT_TABLES,
+    REQ_PARAM_FIELDS,
+    RESP_PARAM_FIELDS,
+    sortParamsByLevel,
+)
+from services.parampath import paramPath
+
+
+# ---- 历史参数树的内容寻址存储 ----
+# 已发布迭代的参数不再逐行存储在 request_param_draft / response_param_draft 中：
+# 每个参数节点按 自身字段 + 有序子节点哈希 计算 sha256（Merkle 树），相同子树（如通用分页对象、错误响应体）
+# 无论出现在哪个api、哪个版本，在 param_node 中都只存储一次；ApiDraft 只记录各根参数的哈希
+# 读取时按层级批量加载节点（查询次数 = 参数树深度），还原为与草稿表相同结构的参数对象
+
+NODE_FIELDS = [
+    "name",
+    "location",
+    "status_code",
+    "type",
+    "required",
+    "default_value",
+    "description",
+    "example",
+    "array_child_type",
+]
+# 单条 IN 查询的哈希数量上限
+_CHUNK_SIZE = 1000
+
+
+def _plain(value):
+    return getattr(value, "value", value)
+
+
+# 计算参数节点哈希：字段缺失（如响应参数没有location）统一记为None
+def hashParamNode(fields: Dict, child_hashes: List[str]) -> str:
+    payload = [_plain(fields.get(f)) for f in NODE_FIELDS] + [child_hashes]
+    return hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+# 将一组草稿参数行（按api分组）转换为节点，返回{api_draft_id: [根节点哈希]}，节点写入nodes
+def _hashParamTrees(rows: List[Dict], nodes: Dict[str, Dict]) -> Dict[int, List[str]]:
+    ids = {r["id"] for r in rows}
+    children_by_parent = {}
+    for r in rows:
+        if r["parent_param_id"] in ids:
+            children_by_parent.setdefault(r["parent_param_id"], []).append(r["id"])
+    hashes = {}
+    # 子参数先于父参数计算
+    for r in reversed(sortParamsByLevel(rows)):
+        child_hashes = [hashes[c] for c in children_by_parent.get(r["id"], [])]
+        node_hash = hashParamNode(r, child_hashes)
+        hashes[r["id"]] = node_hash
+        if node_hash not in nodes:
+            node = {f: r.get(f) for f in NODE_FIELDS}
+            node["hash"] = node_hash
+            node["child_hashes"] = child_hashes
+            nodes[node_hash] = node
+    roots_by_api = {}
+    for r in rows:
+        if r["parent_param_id"] not in ids:
+            roots_by_api.setdefault(r["api_draft_id"], []).append(hashes[r["id"]])
+    return roots_by_api
+
+
+def _loadDraftParamRows(
+    db: Session, model, fields: List[str], api_draft_ids: List[int]
+) -> List[Dict]:
+    columns = [getattr(model, f) for f in ["id", "api_draft_id", "parent_param_id"]]
+    columns += [getattr(model, f) for f in fields]
+    return [
+        dict(row._mapping)
+        for row in db.execute(
+            select(*columns)
+            .where(model.api_draft_id.in_(api_draft_ids))
+            .order_by(model.id)
+        )
+    ]
+
+
+# 批量写入尚不存在的节点（并发发布写入同一节点时忽略冲突）
+def _saveNodes(db: Session, nodes: Dict[str, Dict]) -> int:
+    hashes = list(nodes)
+    existing = set()
+    for i in range(0, len(hashes), _CHUNK_SIZE):
+        existing.update(
+            db.scalars(
+                select(ParamNode.hash).where(
+                    ParamNode.hash.in_(hashes[i : i + _CHUNK_SIZE])
+                )
+            )
+        )
+    rows = [node for node_hash, node in nodes.items() if node_hash not in existing]
+    if rows:
+        db.execute(insert(ParamNode).on_conflict_do_nothing(), rows)
+    return len(rows)
+
+
+# 将迭代中全部api草稿的参数转存到param_node，并删除草稿参数行，返回新写入的节点数
+# 应在迭代发布后调用（进行中的迭代仍需按行编辑参数）
+def compactIterationParams(db: Session, service_iteration_id: int) -> int:
+    api_draft_ids = list(
+        db.scalars(
+            select(ApiDraft.id).where(
+                ApiDraft.service_iteration_id == service_iteration_id,
+                ApiDraft.request_param_hashes.is_(None),
+            )
+        )
+    )
+    if not api_draft_ids:
+        return 0
+    nodes = {}
+    req_roots = _hashParamTrees(
+        _loadDraftParamRows(db, RequestParamDraft, REQ_PARAM_FIELDS, api_draft_ids),
+        nodes,
+    )
+    resp_roots = _hashParamTrees(
+        _loadDraftParamRows(db, ResponseParamDraft, RESP_PARAM_FIELDS, api_draft_ids),
+        nodes,
+    )
+    inserted = _saveNodes(db, nodes)
+    db.execute(
+        update(ApiDraft),
+        [
+            {
+                "id": api_draft_id,
+                "request_param_hashes": req_roots.get(api_draft_id, []),
+                "response_param_hashes": resp_roots.get(api_draft_id, []),
+            }
+            for api_draft_id in api_draft_ids
+        ],
+    )
+    # 子参数通过 CASCADE 删除
+    for model in (RequestParamDraft, ResponseParamDraft):
+        db.execute(
+            delete(model)
+            .where(model.api_draft_id.in_(api_draft_ids))
+            .execution_options(synchronize_session=False)
+        )
+    return inserted
+
+
+# 按层级批量加载节点及其全部子孙节点
+def _loadNodes(db: Session, root_hashes: set) -> Dict[str, ParamNode]:
+    nodes = {}
+    pending = list(root_hashes)
+    while pending:
+        for i in range(0, len(pending), _CHUNK_SIZE):
+            for node in db.scalars(
+                select(ParamNode).where(ParamNode.hash.in_(pending[i : i + _CHUNK_SIZE]))
+            ):
+                nodes[node.hash] = node
+        pending = list(
+            {
+                child_hash
+                for node_hash in pending
+                if node_hash in nodes
+                for child_hash in nodes[node_hash].child_hashes
+                if child_hash not in nodes
+            }
+        )
+    return nodes
+
+
+# 将节点树还原为（不入库的）草稿参数对象，id在本次还原中唯一（tree_path由还原后的id生成），
+# 用于organizeReqParams / organizeRespParams
+def _buildParams(
+    model,
+    fields: List[str],
+    api_draft_id: int,
+    root_hashes: List[str],
+    nodes: Dict[str, ParamNode],
+    next_id: List[int],
+) -> list:
+    params = []
+    stack = [(node_hash, None, "") for node_hash in reversed(root_hashes)]
+    while stack:
+        node_hash, parent_id, parent_path = stack.pop()
+        node = nodes.get(node_hash)
+        if node is None:
+            continue
+        next_id[0] += 1
+        param = model(
+            id=next_id[0],
+            api_draft_id=api_draft_id,
+            parent_param_id=parent_id,
+            tree_path=paramPath(parent_path, next_id[0]),
+            **{f: getattr(node, f) for f in fields},
+        )
+        params.append(param)
+        stack.extend(
+            (child, param.id, param.tree_path) for child in reversed(node.child_hashes)
+        )
+    return params
+
+
+# 参数行的全部列（请求参数与响应参数的并集）
+_PARAM_COLUMNS = [
+    "id",
+    "parent_param_id",
+    "name",
+    "location",
+    "status_code",
+    "type",
+    "required",
+    "default_value",
+    "description",
+    "example",
+    "array_child_type",
+    "tree_path",
+    "updated_at",
+]
+
+
+# 批量获取api的请求参数和响应参数（tables为 LIVE_TABLES / DRAFT_TABLES）：返回{api_id: (请求参数列表, 响应参数列表)}
+# 两张参数表通过 UNION ALL 在一条语句中查询，结果还原为（不入库的）参数对象，按id排序
+def loadApiParams(
+    db: Session, tables: Dict, api_ids: List[int]
+) -> Dict[int, Tuple[list, list]]:
+    req_model, resp_model, api_key = tables["req"], tables["resp"], tables["api_key"]
+    params = {api_id: ([], []) for api_id in api_ids}
+
+    def _select(model, kind: int, api_ids: List[int]):
+        columns = [literal(kind).label("kind"), getattr(model, api_key).label("api_key")]
+        for f in _PARAM_COLUMNS:
+            column = getattr(model, f, None)
+            if column is None:
+                # 另一张表特有的列以同类型的NULL补齐
+                other = resp_model if model is req_model else req_model
+                column = cast(null(), getattr(other, f).type)
+            columns.append(column.label(f))
+        return select(*columns).where(getattr(model, api_key).in_(api_ids))
+
+    for i in range(0, len(api_ids), _CHUNK_SIZE):
+        chunk = api_ids[i : i + _CHUNK_SIZE]
+        stmt = union_all(_select(req_model, 0, chunk), _select(resp_model, 1, chunk))
+        for row in db.execute(stmt.order_by("kind", "id")):
+            mapping = row._mapping
+            model = resp_model if mapping["kind"] else req_model
+            fields = {
+                f: mapping[f]
+                for f in _PARAM_COLUMNS
+                if hasattr(model, f)
+            }
+            params[mapping["api_key"]][mapping["kind"]].append(
+                model(**{api_key: mapping["api_key"]}, **fields)
+            )
+    return params
+
+
+# 批量获取api草稿的请求参数和响应参数：返回{api_draft_id: (请求参数列表, 响应参数列表)}
+# 已转存的草稿从param_node还原，其余从草稿参数表批量读取
+def loadApiDraftParams(
+    db: Session, api_drafts: List[ApiDraft]
+) -> Dict[int, Tuple[list, list]]:
+    root_hashes = set()
+    for api_draft in api_drafts:
+        if api_draft.request_param_hashes is not None:
+            root_hashes.update(api_draft.request_param_hashes)
+            root_hashes.update(api_draft.response_param_hashes or [])
+    nodes = _loadNodes(db, root_hashes) if root_hashes else {}
+    row_api_draft_ids = [d.id for d in api_drafts if d.request_param_hashes is None]
+    params = loadApiParams(db, DRAFT_TABLES, row_api_draft_ids) if row_api_draft_ids else {}
+    next_id = [0]
+    for api_draft in api_drafts:
+        if api_draft.request_param_hashes is None:
+            continue
+        params[api_draft.id] = (
+            _buildParams(
+                RequestParamDraft,
+                REQ_PARAM_FIELDS,
+                api_draft.id,
+                api_draft.request_param_hashes,
+                nodes,
+                next_id,
+            ),
+            _buildParams(
+                ResponseParamDraft,
+                RESP_PARAM_FIELDS,
+                api_draft.id,
+                api_draft.response_param_hashes or [],
+                nodes,
+                next_id,
+            ),
+        )
+    return params
+
+
+# 转存全部已发布迭代（历史数据）的参数
+# 用法（在 BE-CAM 目录下）：uv run python -m services.store
+if __name__ == "__main__":
+    from database.database import session
+
+    with session() as db:
+        service_iteration_ids = list(
+            db.scalars(
+                select(ServiceIteration.id)
+                .where(ServiceIteration.is_committed.is_(True))
+                .order_by(ServiceIteration.id)
+            )
+        )
+        for service_iteration_id in service_iteration_ids:
+            inserted = compactIterationParams(db, service_iteration_id)
+            db.commit()
+            print(f"iteration {service_iteration_id}: {inserted} new param nodes")
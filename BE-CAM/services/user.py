@@ -1,14 +1,20 @@
 from urllib.parse import unquote
+from dataclasses import dataclass
 from robyn.robyn import Request
 from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import jwt
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
+import asyncio
+import time
 
+from cache import TTLCache
+from services.aio import asyncVariant
 from database.models import User
-from database.enums import UserRole
+from database.enums import UserRole, UserLevel
 
 # 加载 .env 文件
 load_dotenv()
@@ -29,11 +35,59 @@ def createAccessToken(
     return encoded_jwt
 
 
+# ---- 鉴权缓存：已解析的token、用户身份（id / 用户名 / 等级等），热路径上鉴权无需访问数据库 ----
+# 已解析的token payload，缓存时间不超过token自身的过期时间
+TOKEN_CACHE = TTLCache(maxsize=4096, ttl=300)
+# 用户身份：进程内缓存，每个worker各自一份，鉴权热路径上不访问网络（不使用共享缓存，否则每个请求都要访问Redis）
+# userInvalidateIdentity 只清除当前worker中的条目，其他worker中的旧身份最多在ttl（60秒）后过期；
+# 用户等级等字段变更后，其他worker最多延迟ttl才生效，这一延迟是可接受的（等级在数据库中直接修改，token本身也不因此失效）
+IDENTITY_CACHE = TTLCache(maxsize=4096, ttl=60)
+
+
+# 当前登录用户身份（鉴权与权限校验所需的字段）
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    username: str
+    nickname: str | None
+    email: str | None
+    level: UserLevel
+
+
 # 解析access token
 def decodeAccessToken(token: str) -> dict:
     if not ALGORITHM or not SECRET_KEY:
         raise Exception("ALGORITHM or SECRET_KEY is not set in .env file")
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    payload = TOKEN_CACHE.get(token)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    TOKEN_CACHE.set(token, payload, ttl=payload.get("exp", time.time()) - time.time())
+    return payload
+
+
+# 通过user id获取当前用户身份（优先读取缓存），用户不存在返回None
+def userGetCurrentUser(db: Session, id: int) -> CurrentUser | None:
+    current_user = IDENTITY_CACHE.get(id)
+    if current_user is not None:
+        return current_user
+    user = db.get(User, id)
+    if user is None:
+        return None
+    current_user = CurrentUser(
+        id=user.id,  # type: ignore
+        username=user.username,  # type: ignore
+        nickname=user.nickname,  # type: ignore
+        email=user.email,  # type: ignore
+        level=user.level,  # type: ignore
+    )
+    IDENTITY_CACHE.set(id, current_user)
+    return current_user
+
+
+# 用户等级、密码等信息变更后失效其身份缓存（只作用于当前worker，见 IDENTITY_CACHE）
+def userInvalidateIdentity(id: int) -> None:
+    IDENTITY_CACHE.delete(id)
 
 
 # 通过access token获取user id
@@ -42,6 +96,10 @@ def userGetUserIdByAccessToken(
 ) -> int:
     if request is not None and token is not None:
         raise Exception("Request and token should not be provided at the same time")
+    # 鉴权中间件已将用户身份放入request.identity，无需再次解析token
+    identity = getattr(request, "identity", None) if request is not None else None
+    if identity is not None and "id" in identity.claims:
+        return int(identity.claims["id"])
     if request is not None:
         authorization = request.headers.get("Authorization")
         if not authorization or not authorization.startswith("Bearer "):
@@ -93,19 +151,27 @@ def userGetUserByUsernameOrNicknameOrEmail(
     }
 
 
-# 用户登录
-def userLogin(db: Session, username: str, password: str) -> dict:
-    user = (
+# ---- 登录、注册、修改密码 ----
+# 查询、校验规则与写入放在同步函数中，同步与异步版本共用（异步版本通过run_sync执行）；
+# bcrypt计算（CPU密集）由调用方执行：同步版本直接计算，异步版本在线程池中计算，不阻塞事件循环
+
+
+# 通过用户名或邮箱查找登录用户
+def _userFindLoginUser(db: Session, username: str) -> User | None:
+    return (
         db.query(User)
         .filter(or_(User.username == username, User.email == username))
         .first()
     )
+
+
+def _userLoginResult(user: User | None, password_ok: bool) -> dict:
     if user is None:
         return {
             "status": -1,
             "message": "User not found",
         }
-    if not user.checkPassword(password):
+    if not password_ok:
         return {
             "status": -2,
             "message": "Wrong password",
@@ -118,12 +184,10 @@ def userLogin(db: Session, username: str, password: str) -> dict:
     }
 
 
-# 用户注册
-def userRegister(
-    db: Session, username: str, password: str, nickname: str, email: str, role: str
-) -> dict:
+# 用户名或邮箱已注册时返回错误，否则返回None
+def _userCheckRegister(db: Session, username: str, email: str) -> dict | None:
     existing_user = (
-        db.query(User)
+        db.query(User.id)
         .filter(or_(User.username == username, User.email == email))
         .first()
     )
@@ -132,37 +196,46 @@ def userRegister(
             "status": -1,
             "message": "Username or email already registered",
         }
+    return None
+
+
+def _userCreate(
+    db: Session,
+    username: str,
+    password_hash: str,
+    nickname: str,
+    email: str,
+    role: str,
+) -> dict:
     try:
         user_role = UserRole(role)
     except ValueError:
         user_role = UserRole.GUEST
     user = User(
         username=username,
-        password=User.hashPassword(password),
+        password=password_hash,
         nickname=nickname,
         email=email,
         role=user_role,
     )
     db.add(user)
     db.commit()
-    db.refresh(user)
     return {
         "status": 200,
         "message": "Register success",
     }
 
 
-# 修改密码
-def userModifyPassword(
-    db: Session, id: int, old_password: str, new_password: str
-) -> dict:
-    user = db.get(User, id)
+# 修改密码的校验，不满足条件时返回错误，否则返回None
+def _userCheckModifyPassword(
+    user: User | None, old_password_ok: bool, old_password: str, new_password: str
+) -> dict | None:
     if user is None:
         return {
             "status": -1,
             "message": "User not found",
         }
-    if not user.checkPassword(old_password):
+    if not old_password_ok:
         return {
             "status": -2,
             "message": "Wrong old password",
@@ -172,9 +245,97 @@ def userModifyPassword(
             "status": -3,
             "message": "New password cannot be the same as old password",
         }
-    user.password = User.hashPassword(new_password)  # type: ignore
+    return None
+
+
+def _userSetPassword(db: Session, user: User, password_hash: str) -> dict:
+    id = user.id
+    user.password = password_hash  # type: ignore
     db.commit()
+    userInvalidateIdentity(id)  # type: ignore
     return {
         "status": 200,
         "message": "Modify password success",
     }
+
+
+# 用户登录
+def userLogin(db: Session, username: str, password: str) -> dict:
+    user = _userFindLoginUser(db, username)
+    return _userLoginResult(user, user is not None and user.checkPassword(password))
+
+
+# 用户注册
+def userRegister(
+    db: Session, username: str, password: str, nickname: str, email: str, role: str
+) -> dict:
+    error = _userCheckRegister(db, username, email)
+    if error:
+        return error
+    return _userCreate(
+        db, username, User.hashPassword(password), nickname, email, role
+    )
+
+
+# 修改密码
+def userModifyPassword(
+    db: Session, id: int, old_password: str, new_password: str
+) -> dict:
+    user = db.get(User, id)
+    error = _userCheckModifyPassword(
+        user,
+        user is not None and user.checkPassword(old_password),
+        old_password,
+        new_password,
+    )
+    if error:
+        return error
+    return _userSetPassword(db, user, User.hashPassword(new_password))
+
+
+# ---- 异步版本（db为AsyncSession），见 services/aio.py ----
+userGetCurrentUserAsync = asyncVariant(userGetCurrentUser)
+userGetUserByIdAsync = asyncVariant(userGetUserById)
+userGetUserByUsernameOrNicknameOrEmailAsync = asyncVariant(
+    userGetUserByUsernameOrNicknameOrEmail
+)
+
+
+# 登录、注册、修改密码：与同步版本共用查询与校验规则，bcrypt计算在线程池中执行
+async def userLoginAsync(db: AsyncSession, username: str, password: str) -> dict:
+    user = await db.run_sync(_userFindLoginUser, username)
+    password_ok = user is not None and await asyncio.to_thread(
+        user.checkPassword, password
+    )
+    return _userLoginResult(user, password_ok)
+
+
+async def userRegisterAsync(
+    db: AsyncSession,
+    username: str,
+    password: str,
+    nickname: str,
+    email: str,
+    role: str,
+) -> dict:
+    error = await db.run_sync(_userCheckRegister, username, email)
+    if error:
+        return error
+    password_hash = await asyncio.to_thread(User.hashPassword, password)
+    return await db.run_sync(
+        _userCreate, username, password_hash, nickname, email, role
+    )
+
+
+async def userModifyPasswordAsync(
+    db: AsyncSession, id: int, old_password: str, new_password: str
+) -> dict:
+    user = await db.get(User, id)
+    old_password_ok = user is not None and await asyncio.to_thread(
+        user.checkPassword, old_password
+    )
+    error = _userCheckModifyPassword(user, old_password_ok, old_password, new_password)
+    if error:
+        return error
+    password_hash = await asyncio.to_thread(User.hashPassword, new_password)
+    return await db.run_sync(_userSetPassword, user, password_hash)
@@ -1,7 +1,12 @@
 from database.models import Api
 from database.models import ApiDraft
-from sqlalchemy.orm import Session
-from typing import List, Dict
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Dict, Tuple
+import gzip
+import hashlib
+import json
 import re
 
 from database.models import (
@@ -12,8 +17,54 @@ from database.models import (
     RequestParamDraft,
     ResponseParam,
     ResponseParamDraft,
+    OpenapiDocument,
+    user_service_link,
 )
 from database.enums import ParamLocation, ParamType
+from services.user import userGetCurrentUser
+from services.paramtree import ParamTree, ParamTreeNode, enumValue, paramsToJson
+from cache import shared_cache
+import brotli
+import yaml
+
+
+# service相关共享缓存的作用域：service详情、api详情、OpenAPI导出等均挂在所属service的作用域下
+def serviceCacheScope(service_id: int) -> str:
+    return f"service:{service_id}"
+
+
+# service下任意数据变更（发布、分类、维护者、删除等）后使其全部缓存失效，需在事务提交后调用
+def invalidateServiceCache(service_id: int) -> None:
+    shared_cache.invalidate(serviceCacheScope(service_id))
+
+
+# 已发布的历史版本内容不可变，按迭代id缓存（不挂service作用域，不随service其他变更失效）
+FROZEN_CACHE_TTL = 7 * 24 * 3600
+# 历史版本的OpenAPI文档在发布时预生成并存储于openapi_document，不经过缓存
+FROZEN_CACHE_KINDS = ["detail"]
+
+
+def frozenCacheKey(kind: str, service_iteration_id: int) -> str:
+    return f"frozen:{kind}:{service_iteration_id}"
+
+
+# 迭代被删除或其自身字段（如基线迭代）变化时清除其不可变缓存
+def invalidateFrozenCache(service_iteration_id: int) -> None:
+    for kind in FROZEN_CACHE_KINDS:
+        shared_cache.delete(frozenCacheKey(kind, service_iteration_id))
+
+
+# 判断用户是否为service的维护者（EXISTS查询，无需加载维护者列表）
+def isServiceMaintainer(db: Session, service_id: int, user_id: int) -> bool:
+    return db.query(maintainerExists(service_id, user_id)).scalar()
+
+
+# 用户是否为服务维护者的EXISTS表达式：service_id可以是列，便于作为一列嵌入其他查询，省去单独一次查询
+def maintainerExists(service_id, user_id: int):
+    return exists().where(
+        user_service_link.c.service_id == service_id,
+        user_service_link.c.user_id == user_id,
+    )
 
 
 # service 版本迭代行为权限校验（校验service_iteration是否存在，是否已提交，是否为当前user有权限操作）
@@ -41,7 +92,7 @@ def checkServiceIterationPermission(
             },
         }
     # 非L0用户，为当前service owner或当前迭代creator，才有权限进行迭代操作（维护者也不可操作别人的迭代）
-    user = db.get(User, user_id)
+    user = userGetCurrentUser(db, user_id)
     if (
         service_iteration.service.owner_id != user_id
         and service_iteration.creator_id != user_id
@@ -65,7 +116,6 @@ def checkServiceIterationPermission(
 def organizeReqParams(
     request_params: List[RequestParam | RequestParamDraft],
 ) -> Dict[str, List[Dict]]:
-    request_params_raw = [rp.toJson() for rp in request_params]
     request_params_by_location = {
         ParamLocation.QUERY.value: [],
         ParamLocation.PATH.value: [],
@@ -73,269 +123,409 @@ def organizeReqParams(
         ParamLocation.COOKIE.value: [],
         ParamLocation.BODY.value: [],
     }
-    # 构建id到param的索引表，用于处理子参数
-    req_index = {p["id"]: p for p in request_params_raw}
-    # 处理location、type、array_child_type等枚举值，将其转换为对应的value
-    for p in request_params_raw:
-        loc = p.get("location")
-        p["location"] = getattr(loc, "value", loc)
-        t = p.get("type")
-        p["type"] = getattr(t, "value", t)
-        act = p.get("array_child_type")
-        p["array_child_type"] = getattr(act, "value", act)
-    for p in request_params_raw:
-        parent_id = p.get("parent_param_id")
-        # 存在parent_param_id的参数为子参数，将其添加到父参数的children_params中
-        if parent_id:
-            parent = req_index.get(parent_id)
-            if parent is not None:
-                parent.setdefault("children_params", []).append(p)
-        # 不存在parent_param_id的参数为根参数，根据location添加到对应的列表中
-        else:
-            request_params_by_location[p["location"]].append(p)
-
+    # 根参数（子参数已挂载到父参数的children_params中）根据location添加到对应的列表中
+    for p in paramsToJson(request_params):
+        request_params_by_location[p["location"]].append(p)
     return request_params_by_location
 
 
 def organizeRespParams(
     response_params: List[ResponseParam | ResponseParamDraft],
 ) -> Dict[str, List[Dict]]:
-    response_params_raw = [rp.toJson() for rp in response_params]
-    # 构建id到param的索引表，用于处理子参数
-    resp_index = {p["id"]: p for p in response_params_raw}
-    # 处理type、array_child_type等枚举值，将其转换为对应的value
-    for p in response_params_raw:
-        t = p.get("type")
-        p["type"] = getattr(t, "value", t)
-        act = p.get("array_child_type")
-        p["array_child_type"] = getattr(act, "value", act)
     response_params_by_status_code = {}
-    for p in response_params_raw:
-        parent_id = p.get("parent_param_id")
-        # 存在parent_param_id的参数为子参数，将其添加到父参数的children_params中
-        if parent_id:
-            parent = resp_index.get(parent_id)
-            if parent is not None:
-                parent.setdefault("children_params", []).append(p)
-        # 不存在parent_param_id的参数为根参数，根据status_code添加到对应的列表中
+    # 根参数根据status_code添加到对应的列表中
+    for p in paramsToJson(response_params):
+        key = str(p["status_code"])  # Python中dict的key必须是str
+        response_params_by_status_code.setdefault(key, []).append(p)
+    return response_params_by_status_code
+
+
+# 组件名使用的正则，模块加载时编译一次
+_CAMEL_BOUNDARY_RE = re.compile(r"(?<!^)(?=[A-Z])")
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9]")
+_TYPE_SCHEMAS = {
+    "string": {"type": "string"},
+    "int": {"type": "integer", "format": "int64"},
+    "double": {"type": "number", "format": "double"},
+    "boolean": {"type": "boolean"},
+    "binary": {"type": "string", "format": "binary"},
+    "object": {"type": "object"},
+    "array": {"type": "array"},
+}
+
+
+def _to_component_name(name: str) -> str:
+    """
+    Convert name to PascalCase for component names.
+    """
+    # Insert space before capital letters to handle camelCase/PascalCase
+    s1 = _CAMEL_BOUNDARY_RE.sub(" ", name)
+    # Replace non-alphanumeric characters with spaces
+    clean = _NON_ALNUM_RE.sub(" ", s1)
+    return "".join(word.capitalize() for word in clean.split())
+
+
+def _get_type_schema(type_name: str) -> Dict:
+    """
+    将内部类型映射为 OpenAPI 支持的数据类型。
+    例如：int -> integer (int64), double -> number (double)
+    """
+    return dict(_TYPE_SCHEMAS.get(type_name, {"type": "string"}))
+
+
+# 参数的子参数是否生成Schema（object的properties，或元素为object的array的items.properties）
+def _hasPropertySchemas(node: ParamTreeNode) -> bool:
+    row = node.row
+    param_type = enumValue(row["type"])
+    return param_type == "object" or (
+        param_type == "array" and enumValue(row["array_child_type"]) == "object"
+    )
+
+
+def _build_properties_schema(
+    children: List[ParamTreeNode] | None, child_schemas: List[Dict]
+) -> Dict:
+    schema = {"type": "object"}
+    properties = {}
+    required = []
+    for child, child_schema in zip(children or (), child_schemas):
+        row = child.row
+        name = row["name"]
+        properties[name] = child_schema
+        if row["required"]:
+            required.append(name)
+    if properties:
+        schema["properties"] = properties
+        schema["additionalProperties"] = False
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def _build_node_schema(node: ParamTreeNode, child_schemas: List[Dict]) -> Dict:
+    """
+    由子参数的 Schema 构建参数的 Schema。
+    - 如果是 object 类型，子参数构成 properties。
+    - 如果是 array 类型，构建 items（元素为 object 时子参数构成 items 的 properties）。
+    - 处理 description, example, default 等元数据。
+    """
+    row = node.row
+    param_type = enumValue(row["type"])
+    schema = _get_type_schema(param_type)
+
+    if param_type == "object":
+        schema.update(_build_properties_schema(node.children, child_schemas))
+
+    elif param_type == "array":
+        child_type = enumValue(row["array_child_type"])
+        if child_type == "object":
+            schema["items"] = _build_properties_schema(node.children, child_schemas)
         else:
-            key = str(p["status_code"])  # Python中dict的key必须是str
-            response_params_by_status_code.setdefault(key, []).append(p)
+            schema["items"] = _get_type_schema(child_type)
 
-    return response_params_by_status_code
+    example = row["example"]
+    if example:
+        schema["example"] = example
+    default_value = row.get("default_value")
+    if default_value:
+        if default_value == "null" or default_value == "undefined":
+            schema["default"] = None
+        else:
+            match param_type:
+                case "string":
+                    schema["default"] = str(default_value)
+                case "int":
+                    schema["default"] = int(default_value)
+                case "double":
+                    schema["default"] = float(default_value)
+                case "boolean":
+                    schema["default"] = bool(default_value)
+                case _:
+                    schema["default"] = default_value
+
+    return schema
 
 
-def openapiTemplate(service: Service | ServiceIteration, is_latest: bool) -> Dict:
+def _build_param_schema(node: ParamTreeNode) -> Dict:
+    """
+    构建参数（含全部子参数）的 Schema，自底向上迭代构建，不受嵌套深度限制。
+    """
+    return ParamTree.fold(node, _build_node_schema, expand=_hasPropertySchemas)
+
+
+def _build_root_schema(
+    params: List[ParamTreeNode],
+    components_schemas: Dict,
+    schema_name: str = None,
+) -> Dict:
+    """
+    构建根对象的 Schema（用于 RequestBody 或 Response Content）。
+    将一组参数列表转换为一个 Object Schema。
+    如果提供了 schema_name，则将其注册到 components_schemas 中并返回引用。
+    """
+    schema = {
+        "type": "object",
+        "properties": {},
+        "required": [],
+        "additionalProperties": False,
+    }
+    for p in params:
+        name = p.get("name")
+        schema["properties"][name] = _build_param_schema(p)
+        if p.get("required"):
+            schema["required"].append(name)
+    if not schema["required"]:
+        del schema["required"]
+
+    if schema_name:
+        # 同名组件保留先注册的定义（与流式导出一致）
+        components_schemas.setdefault(schema_name, schema)
+        return {"$ref": f"#/components/schemas/{schema_name}"}
+
+    return schema
+
+
+# 生成单个API的OpenAPI Operation对象，返回 (小写method, operation)；请求体 / 响应体Schema注册到components_schemas
+def openapiOperation(
+    api: Api | ApiDraft,
+    request_params: List[RequestParam | RequestParamDraft],
+    response_params: List[ResponseParam | ResponseParamDraft],
+    components_schemas: Dict,
+) -> Tuple[str, Dict]:
+    # 处理request_params：根参数按location分组
+    req_tree = ParamTree.fromParams(request_params)
+    request_params_by_location = {}
+    for p in req_tree.roots:
+        request_params_by_location.setdefault(p.get("location"), []).append(p)
+    # 处理response_params：根参数按status_code分组
+    resp_tree = ParamTree.fromParams(response_params)
+    response_params_by_status_code = {}
+    for p in resp_tree.roots:
+        status_code = str(p.get("status_code"))
+        response_params_by_status_code.setdefault(status_code, []).append(p)
+
+    parameters = []
+    for loc in ["query", "path", "header", "cookie"]:
+        for p in request_params_by_location.get(loc, []):
+            param_obj = {
+                "name": p.get("name"),
+                "in": loc,
+                "required": p.get("required"),
+                "schema": _build_param_schema(p),
+            }
+            description = p.get("description")
+            if description:
+                param_obj["description"] = description
+            parameters.append(param_obj)
+
+    request_body = None
+    body_params = request_params_by_location.get("body", [])
+    if body_params:
+        req_name = _to_component_name(api.name) + "Request"
+        request_body = {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": _build_root_schema(
+                        body_params, components_schemas, req_name
+                    )
+                }
+            },
+        }
+
+    responses = {}
+    for status_code, status_params in response_params_by_status_code.items():
+        suffix = "" if str(status_code) == "200" else str(status_code)
+        resp_name = _to_component_name(api.name) + "Response" + suffix
+        responses[status_code] = {
+            "description": f"Response for {status_code}",
+            "content": {
+                "application/json": {
+                    "schema": _build_root_schema(
+                        status_params, components_schemas, resp_name
+                    )
+                }
+            },
+        }
+
+    operation = {
+        "description": api.description,
+        "operationId": api.name,
+        "parameters": parameters,
+        "responses": responses,
+        "deprecated": not api.is_enabled,
+    }
+    if request_body:
+        operation["requestBody"] = request_body
+
+    return _methodStr(api.method), operation
+
+
+# Use method.value.lower() to ensure we get 'get', 'post', etc.
+def _methodStr(method) -> str:
+    return method.value.lower() if hasattr(method, "value") else str(method).lower()
+
+
+# OpenAPI文档的info字段
+def openapiInfo(service: Service | ServiceIteration, is_latest: bool) -> Dict:
+    contact: User = service.owner if is_latest else service.creator
+    return {
+        "title": (
+            service.service_uuid if is_latest else service.service.service_uuid
+        ),
+        "description": service.description
+        or (service.service.description if not is_latest else ""),
+        "contact": {
+            "name": contact.username,
+            "email": contact.email,
+        },
+        "version": service.version,
+    }
+
+
+def openapiTemplate(
+    service: Service | ServiceIteration,
+    is_latest: bool,
+    apis: List[Api | ApiDraft] | None = None,
+    params: Dict[int, Tuple[list, list]] | None = None,
+) -> Dict:
     """
     根据 Service 或 ServiceIteration 生成 OpenAPI 3.1.0 规范文档。
     参考：https://openapi.apifox.cn/
     原理：
     1. 遍历 Service 中的所有 API。
     2. 将内部定义的 RequestParam 和 ResponseParam 转换为 OpenAPI 的 Schema 对象。
-    3. 递归处理对象和数组类型的嵌套结构。
+    3. 自底向上处理对象和数组类型的嵌套结构（services/paramtree.py）。
     4. 根据参数位置（query, path, header, cookie, body）将参数放置到对应的 OpenAPI 字段中。
     5. 组装 Info, Paths, Components 等顶级字段。
+    apis 为空时使用 service 下的全部 API；历史版本需传入还原后的 API 草稿列表，
+    params 为 {api_id: (请求参数, 响应参数)}，传入时代替 API 上关联的参数。
+    API 按 id 顺序处理：path 与 method 相同的 API 只保留 id 最小的一个，同名组件保留先注册的定义，
+    与 streamOpenapiTemplate 的输出一致。
     """
-    contact: User = service.owner if is_latest else service.creator
-    apis: List[Api | ApiDraft] = service.apis if is_latest else service.api_drafts
+    if apis is None:
+        apis = service.apis if is_latest else service.api_drafts
     paths = {}
     components_schemas = {}
 
-    def _to_component_name(name: str) -> str:
-        """
-        Convert name to PascalCase for component names.
-        """
-        # Insert space before capital letters to handle camelCase/PascalCase
-        s1 = re.sub(r"(?<!^)(?=[A-Z])", " ", name)
-        # Replace non-alphanumeric characters with spaces
-        clean = re.sub(r"[^a-zA-Z0-9]", " ", s1)
-        return "".join(word.capitalize() for word in clean.split())
-
-    def _get_type_schema(type_name: str) -> Dict:
-        """
-        将内部类型映射为 OpenAPI 支持的数据类型。
-        例如：int -> integer (int64), double -> number (double)
-        """
-        mapping = {
-            "string": {"type": "string"},
-            "int": {"type": "integer", "format": "int64"},
-            "double": {"type": "number", "format": "double"},
-            "boolean": {"type": "boolean"},
-            "binary": {"type": "string", "format": "binary"},
-            "object": {"type": "object"},
-            "array": {"type": "array"},
-        }
-        return mapping.get(type_name, {"type": "string"})
-
-    def _build_param_schema(param: Dict) -> Dict:
-        """
-        递归构建参数的 Schema。
-        - 如果是 object 类型，递归构建 properties。
-        - 如果是 array 类型，递归构建 items。
-        - 处理 description, example, default 等元数据。
-        """
-        schema = _get_type_schema(param.get("type", "string"))
-
-        if param.get("type") == "object":
-            properties = {}
-            required = []
-            for child in param.get("children_params", []):
-                properties[child["name"]] = _build_param_schema(child)
-                if child.get("required"):
-                    required.append(child["name"])
-            if properties:
-                schema["properties"] = properties
-                schema["additionalProperties"] = False
-            if required:
-                schema["required"] = required
-
-        elif param.get("type") == "array":
-            child_type = param.get("array_child_type", "string")
-            if child_type == "object":
-                item_schema = {"type": "object"}
-                properties = {}
-                required = []
-                for child in param.get("children_params", []):
-                    properties[child["name"]] = _build_param_schema(child)
-                    if child.get("required"):
-                        required.append(child["name"])
-                if properties:
-                    item_schema["properties"] = properties
-                    item_schema["additionalProperties"] = False
-                if required:
-                    item_schema["required"] = required
-                schema["items"] = item_schema
-            else:
-                schema["items"] = _get_type_schema(child_type)
-
-        if param.get("example"):
-            schema["example"] = param.get("example")
-        if param.get("default_value"):
-            if (
-                param.get("default_value") == "null"
-                or param.get("default_value") == "undefined"
-            ):
-                schema["default"] = None
-            else:
-                match param.get("type"):
-                    case "string":
-                        schema["default"] = str(param.get("default_value"))
-                    case "int":
-                        schema["default"] = int(param.get("default_value"))
-                    case "double":
-                        schema["default"] = float(param.get("default_value"))
-                    case "boolean":
-                        schema["default"] = bool(param.get("default_value"))
-                    case _:
-                        schema["default"] = param.get("default_value")
-
-        return schema
-
-    def _build_root_schema(params: List[Dict], schema_name: str = None) -> Dict:
-        """
-        构建根对象的 Schema（用于 RequestBody 或 Response Content）。
-        将一组参数列表转换为一个 Object Schema。
-        如果提供了 schema_name，则将其注册到 components 中并返回引用。
-        """
-        schema = {
-            "type": "object",
-            "properties": {},
-            "required": [],
-            "additionalProperties": False,
-        }
-        for p in params:
-            schema["properties"][p["name"]] = _build_param_schema(p)
-            if p.get("required"):
-                schema["required"].append(p["name"])
-        if not schema["required"]:
-            del schema["required"]
-
-        if schema_name:
-            components_schemas[schema_name] = schema
-            return {"$ref": f"#/components/schemas/{schema_name}"}
-
-        return schema
-
-    for api in apis:
-        # 处理request_params
-        request_params_by_location = organizeReqParams(api.request_params)
-        # 处理response_params
-        response_params_by_status_code = organizeRespParams(api.response_params)
-
-        if api.path not in paths:
-            paths.setdefault(api.path, {})
-
-        parameters = []
-        for loc in ["query", "path", "header", "cookie"]:
-            for p in request_params_by_location.get(loc, []):
-                param_obj = {
-                    "name": p["name"],
-                    "in": loc,
-                    "required": p.get("required", False),
-                    "schema": _build_param_schema(p),
-                }
-                if p.get("description"):
-                    param_obj["description"] = p["description"]
-                parameters.append(param_obj)
-
-        request_body = None
-        body_params = request_params_by_location.get("body", [])
-        if body_params:
-            req_name = _to_component_name(api.name) + "Request"
-            request_body = {
-                "required": True,
-                "content": {
-                    "application/json": {
-                        "schema": _build_root_schema(body_params, req_name)
-                    }
-                },
-            }
-
-        responses = {}
-        for status_code, params in response_params_by_status_code.items():
-            suffix = "" if str(status_code) == "200" else str(status_code)
-            resp_name = _to_component_name(api.name) + "Response" + suffix
-            responses[status_code] = {
-                "description": f"Response for {status_code}",
-                "content": {
-                    "application/json": {
-                        "schema": _build_root_schema(params, resp_name)
-                    }
-                },
-            }
-
-        operation = {
-            "description": api.description,
-            "operationId": api.name,
-            "parameters": parameters,
-            "responses": responses,
-            "deprecated": not api.is_enabled,
-        }
-        if request_body:
-            operation["requestBody"] = request_body
-
-        # Use api.method.value.lower() to ensure we get 'get', 'post', etc.
-        method_str = (
-            api.method.value.lower()
-            if hasattr(api.method, "value")
-            else str(api.method).lower()
+    for api in sorted(apis, key=lambda api: api.id):
+        if _methodStr(api.method) in paths.get(api.path, {}):
+            continue
+        # 已发布迭代的参数由调用方从内容寻址存储中还原后传入
+        request_params, response_params = (
+            params[api.id]
+            if params and api.id in params
+            else (api.request_params, api.response_params)
+        )
+        method_str, operation = openapiOperation(
+            api, request_params, response_params, components_schemas
         )
-        paths[api.path][method_str] = operation
+        paths.setdefault(api.path, {})[method_str] = operation
 
     return {
         "openapi": "3.1.0",
-        "info": {
-            "title": (
-                service.service_uuid if is_latest else service.service.service_uuid
-            ),
-            "description": service.description
-            or (service.service.description if not is_latest else ""),
-            "contact": {
-                "name": contact.username,
-                "email": contact.email,
-            },
-            "version": service.version,
-        },
+        "info": openapiInfo(service, is_latest),
         "paths": paths,
         "components": {"schemas": components_schemas},
     }
+
+
+# 流式导出时每批读取的api数量
+OPENAPI_STREAM_BATCH_SIZE = 200
+
+
+# 流式导出的api顺序（与openapiTemplate一致）：只读取 id / path / method，返回 [(path, [api_id, ...]), ...]
+# path按其第一个api的id排序，同一path下的method按id排序，path与method相同的api只保留id最小的一个
+def _streamApiOrder(db: Session, service_id: int) -> List[Tuple[str, List[int]]]:
+    methods_by_path = {}
+    for id, path, method in db.execute(
+        select(Api.id, Api.path, Api.method)
+        .where(Api.service_id == service_id)
+        .order_by(Api.id)
+    ):
+        methods_by_path.setdefault(path, {}).setdefault(_methodStr(method), id)
+    return [(path, list(methods.values())) for path, methods in methods_by_path.items()]
+
+
+# 按api_ids的顺序逐批读取api（含参数），每批读取后从session中移除，内存只占用一批
+def _iterApisByIds(db: Session, api_ids: List[int]):
+    for i in range(0, len(api_ids), OPENAPI_STREAM_BATCH_SIZE):
+        batch = api_ids[i : i + OPENAPI_STREAM_BATCH_SIZE]
+        apis = {
+            api.id: api
+            for api in db.scalars(
+                select(Api)
+                .where(Api.id.in_(batch))
+                .options(
+                    selectinload(Api.request_params), selectinload(Api.response_params)
+                )
+            )
+        }
+        for api_id in batch:
+            yield apis[api_id]
+        for api in apis.values():
+            for param in (*api.request_params, *api.response_params):
+                db.expunge(param)
+            db.expunge(api)
+
+
+def _dumpJson(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+# 流式生成service最新版本的OpenAPI文档（JSON文本片段），内容与openapiTemplate一致（api顺序与去重规则相同）
+# 先读取全部api的 id / path / method 确定输出顺序，paths与components再分两次逐批读取api，
+# 峰值内存取决于一批api的大小而非整个service
+def streamOpenapiTemplate(db: Session, service_id: int):
+    service = db.get(Service, service_id)
+    order = _streamApiOrder(db, service_id)
+    yield f'{{"openapi":"3.1.0","info":{_dumpJson(openapiInfo(service, True))},"paths":{{'
+    api_ids = [api_id for _, ids in order for api_id in ids]
+    apis = _iterApisByIds(db, api_ids)
+    for i, (path, ids) in enumerate(order):
+        yield f'{"," if i else ""}{_dumpJson(path)}:{{'
+        for j in range(len(ids)):
+            api = next(apis)
+            method_str, operation = openapiOperation(
+                api, api.request_params, api.response_params, {}
+            )
+            yield f'{"," if j else ""}{_dumpJson(method_str)}:{_dumpJson(operation)}'
+        yield "}"
+    yield '},"components":{"schemas":{'
+    emitted = set()
+    for api in _iterApisByIds(db, sorted(api_ids)):
+        components_schemas = {}
+        openapiOperation(
+            api, api.request_params, api.response_params, components_schemas
+        )
+        for name, schema in components_schemas.items():
+            if name in emitted:
+                continue
+            yield f'{"," if emitted else ""}{_dumpJson(name)}:{_dumpJson(schema)}'
+            emitted.add(name)
+    yield "}}}"
+
+
+# OpenAPI文档转为YAML
+def dumpOpenapiYaml(openapi: Dict) -> str:
+    return yaml.safe_dump(openapi, allow_unicode=True, sort_keys=False)
+
+
+# 序列化并预压缩OpenAPI文档，保存为迭代的预生成文档
+# 已存在时保留已有文档：历史版本内容不可变，并发生成（如同时首次导出）的文档相同，冲突时不报错
+# gzip固定mtime，保证相同文档压缩结果一致
+def storeOpenapiDocument(db: Session, service_iteration_id: int, openapi: Dict) -> None:
+    body = json.dumps(openapi, ensure_ascii=False, separators=(",", ":")).encode()
+    yaml_body = dumpOpenapiYaml(openapi).encode()
+    db.execute(
+        insert(OpenapiDocument)
+        .values(
+            service_iteration_id=service_iteration_id,
+            etag=hashlib.sha256(body).hexdigest(),
+            size=len(body),
+            json_gzip=gzip.compress(body, compresslevel=9, mtime=0),
+            json_br=brotli.compress(body),
+            yaml_gzip=gzip.compress(yaml_body, compresslevel=9, mtime=0),
+        )
+        .on_conflict_do_nothing()
+    )
@@ -7,7 +7,8 @@ from authentication import AuthHandler
 from database.database import session
 from services.user import userGetUserIdByAccessToken
 from services.api import *  # type: ignore
-from utils import string2Bool
+from services.projection import decodeCursor
+from utils import etagJsonResponse, string2Bool
 
 
 apiRouterV1 = SubRouter(__file__, prefix="/v1/api")
@@ -76,9 +77,126 @@ def getApiById(request: Request):
             user_id=user_id,
             is_latest=string2Bool(is_latest),
         )
+    return etagJsonResponse(request, res)
+
+
+# 通过点分路径获取api的单个参数及其子参数（如响应参数中的 data.items），可带location / status_code限定根参数
+@apiRouterV1.get("/getApiParamByPath", auth_required=True)
+def getApiParamByPath(request: Request):
+    api_id = request.query_params.get("api_id", None)
+    kind = request.query_params.get("kind", None)
+    path = request.query_params.get("path", None)
+    if not api_id or kind not in ("req", "resp") or not path:
+        return Response(
+            status_code=400,
+            headers={},
+            description="api_id, kind (req or resp) and path are required",
+        )
+    location = request.query_params.get("location", None)
+    status_code = request.query_params.get("status_code", None)
+    is_latest = request.query_params.get("is_latest", "true")
+    user_id = userGetUserIdByAccessToken(request)
+    with session() as db:
+        res = apiGetApiParamByPath(
+            db=db,
+            api_id=int(api_id),
+            user_id=user_id,
+            kind=kind,
+            path=path,
+            location=location or None,
+            status_code=int(status_code) if status_code else None,
+            is_latest=string2Bool(is_latest),
+        )
+    return res
+
+
+# 通过service_uuid和version批量获取该版本全部api的详情（包括params），分页返回
+@apiRouterV1.get("/getApiDetailsByServiceUuidAndVersion", auth_required=True)
+def getApiDetailsByServiceUuidAndVersion(request: Request):
+    service_uuid = request.query_params.get("service_uuid", None)
+    version = request.query_params.get("version", None)
+    if not service_uuid or not version:
+        return Response(
+            status_code=400,
+            headers={},
+            description="service_uuid and version are required",
+        )
+    page_size = request.query_params.get("page_size", None)
+    cursor = request.query_params.get("cursor", None)
+    if cursor:
+        try:
+            decodeCursor(cursor)
+        except ValueError:
+            return Response(
+                status_code=400,
+                description="invalid cursor",
+                headers={},
+            )
+    user_id = userGetUserIdByAccessToken(request)
+    with session() as db:
+        res = apiGetApiDetailsByServiceUuidAndVersion(
+            db=db,
+            service_uuid=service_uuid,
+            version=version,
+            user_id=user_id,
+            page_size=int(page_size) if page_size else API_DETAIL_PAGE_SIZE,
+            cursor=cursor or None,
+        )
+    return etagJsonResponse(request, res)
+
+
+# 批量查询服务版本的内容是否发生变化（客户端增量更新）
+@apiRouterV1.post("/getServiceVersionChanges", auth_required=True)
+def getServiceVersionChanges(request: Request):
+    data = request.json()
+    # services以JSON字符串形式传递
+    try:
+        services = json.loads(data.get("services", None) or "null")
+    except ValueError:
+        services = None
+    if not isinstance(services, list) or not all(
+        isinstance(item, dict) and item.get("service_uuid") and item.get("version")
+        for item in services
+    ):
+        return Response(
+            status_code=400,
+            headers={},
+            description="services must be a list of {service_uuid, version, hash}",
+        )
+    user_id = userGetUserIdByAccessToken(request)
+    with session() as db:
+        res = apiGetServiceVersionChanges(db=db, services=services, user_id=user_id)
     return res
 
 
+# 通过api_id列表（逗号分隔）批量获取api详情（包括params）
+@apiRouterV1.get("/getApiDetailsByIds", auth_required=True)
+def getApiDetailsByIds(request: Request):
+    api_ids = request.query_params.get("api_ids", None)
+    if not api_ids:
+        return Response(
+            status_code=400, headers={}, description="api_ids is required"
+        )
+    try:
+        api_ids = [int(api_id) for api_id in api_ids.split(",") if api_id.strip()]
+    except ValueError:
+        return Response(
+            status_code=400,
+            headers={},
+            description="api_ids must be comma separated integers",
+        )
+    is_latest = request.query_params.get("is_latest", "true")
+    user_id = userGetUserIdByAccessToken(request)
+    with session() as db:
+        res = apiGetApiDetailsByIds(
+            db=db,
+            api_ids=api_ids,
+            user_id=user_id,
+            is_latest=string2Bool(is_latest),
+        )
+    return etagJsonResponse(request, res)
+
+
 # 通过service_id新增category
 @apiRouterV1.post("/addCategoryByServiceId", auth_required=True)
 def addCategoryByServiceId(request: Request):
@@ -187,6 +305,27 @@ def copyApiByApiDraftId(request: Request):
     return res
 
 
+# 将api复制到另一个service迭代（可以是其他service，可指定目标service的category_id）
+@apiRouterV1.post("/copyApiToServiceIteration", auth_required=True)
+def copyApiToServiceIteration(request: Request):
+    data = request.json()
+    service_iteration_id = data["service_iteration_id"]
+    api_draft_id = data["api_draft_id"]
+    target_service_iteration_id = data["target_service_iteration_id"]
+    category_id = data.get("category_id", None)
+    user_id = userGetUserIdByAccessToken(request)
+    with session() as db:
+        res = apiCopyApiToServiceIteration(
+            db=db,
+            service_iteration_id=int(service_iteration_id),
+            api_draft_id=int(api_draft_id),
+            target_service_iteration_id=int(target_service_iteration_id),
+            user_id=user_id,
+            category_id=int(category_id) if category_id else None,
+        )
+    return res
+
+
 # 通过service_iteration_id、api_draft_id删除api
 @apiRouterV1.post("/deleteApiByApiDraftId", auth_required=True)
 def deleteApiByApiDraftId(request: Request):
@@ -234,3 +373,31 @@ def updateApiByApiDraftId(request: Request):
             resp_params=resp_params,
         )
     return res
+
+
+# 通过service_iteration_id、api_draft_id局部修改请求参数和响应参数（ops以JSON字符串形式传递）
+@apiRouterV1.post("/patchApiParamsByApiDraftId", auth_required=True)
+def patchApiParamsByApiDraftId(request: Request):
+    data = request.json()
+    service_iteration_id = data["service_iteration_id"]
+    api_draft_id = data["api_draft_id"]
+    try:
+        ops = json.loads(data.get("ops", None) or "null")
+    except ValueError:
+        ops = None
+    if not isinstance(ops, list) or not ops:
+        return Response(
+            status_code=400,
+            headers={},
+            description="ops must be a non-empty list of operations",
+        )
+    user_id = userGetUserIdByAccessToken(request)
+    with session() as db:
+        res = apiPatchApiParamsByApiDraftId(
+            db=db,
+            service_iteration_id=int(service_iteration_id),
+            api_draft_id=int(api_draft_id),
+            user_id=user_id,
+            ops=ops,
+        )
+    return res
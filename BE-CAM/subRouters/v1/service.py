@@ -4,9 +4,17 @@ from robyn.robyn import Request, Response
 from robyn.authentication import BearerGetter
 
 from authentication import AuthHandler
-from database.database import session
+from database.database import async_session, session
 from services.user import userGetUserIdByAccessToken
 from services.service import *  # type: ignore
+from services.utils import streamOpenapiTemplate
+from utils import (
+    OPENAPI_CONTENT_TYPES,
+    etagJsonResponse,
+    getPaginationCursor,
+    openapiExportResponse,
+    string2Bool,
+)
 
 
 serviceRouterV1 = SubRouter(__file__, prefix="/v1/service")
@@ -39,6 +47,14 @@ def getServiceById(request: Request):
 def getAllServices(request: Request):
     page_size = request.query_params.get("page_size", "10")
     current_page = request.query_params.get("current_page", "1")
+    try:
+        cursor = getPaginationCursor(request)
+    except ValueError:
+        return Response(
+            status_code=400,
+            description="invalid cursor",
+            headers={},
+        )
     user_id = userGetUserIdByAccessToken(request=request)
     with session() as db:
         res = serviceGetAllServices(
@@ -46,6 +62,7 @@ def getAllServices(request: Request):
             user_id=user_id,
             page_size=int(page_size) if page_size else 10,
             current_page=int(current_page) if current_page else 1,
+            cursor=cursor,
         )
     return res
 
@@ -56,6 +73,14 @@ def getHisNewestServicesByOwnerId(request: Request):
     page_size = request.query_params.get("page_size", "10")
     current_page = request.query_params.get("current_page", "1")
     is_my_services = request.query_params.get("is_my_services", "true")
+    try:
+        cursor = getPaginationCursor(request)
+    except ValueError:
+        return Response(
+            status_code=400,
+            description="invalid cursor",
+            headers={},
+        )
     my_id = userGetUserIdByAccessToken(request=request)
     assert is_my_services is not None
     if json.loads(is_my_services.lower()):
@@ -75,6 +100,7 @@ def getHisNewestServicesByOwnerId(request: Request):
             my_id=my_id,
             page_size=int(page_size) if page_size else 10,
             current_page=int(current_page) if current_page else 1,
+            cursor=cursor,
         )
     return res
 
@@ -86,6 +112,14 @@ def getHisMaintainedServicesByUserId(request: Request):
     current_page = request.query_params.get("current_page", "1")
     my_id = userGetUserIdByAccessToken(request=request)
     user_id = request.query_params.get("user_id", str(my_id))
+    try:
+        cursor = getPaginationCursor(request)
+    except ValueError:
+        return Response(
+            status_code=400,
+            description="invalid cursor",
+            headers={},
+        )
 
     with session() as db:
         res = serviceGetHisMaintainedServicesByUserId(
@@ -94,6 +128,7 @@ def getHisMaintainedServicesByUserId(request: Request):
             my_id=my_id,
             page_size=int(page_size) if page_size else 10,
             current_page=int(current_page) if current_page else 1,
+            cursor=cursor,
         )
     return res
 
@@ -117,7 +152,7 @@ def getServiceByUuidAndVersion(request: Request):
             version=version,
             user_id=user_id,
         )
-    return res
+    return etagJsonResponse(request, res)
 
 
 # 通过service_uuid获取全部版本号
@@ -162,6 +197,14 @@ def createNewService(request: Request):
 def getAllDeletedServicesByUserId(request: Request):
     page_size = request.query_params.get("page_size", "10")
     current_page = request.query_params.get("current_page", "1")
+    try:
+        cursor = getPaginationCursor(request)
+    except ValueError:
+        return Response(
+            status_code=400,
+            description="invalid cursor",
+            headers={},
+        )
     user_id = userGetUserIdByAccessToken(request=request)
     with session() as db:
         res = serviceGetAllDeletedServicesByUserId(
@@ -169,6 +212,7 @@ def getAllDeletedServicesByUserId(request: Request):
             user_id=user_id,
             page_size=int(page_size) if page_size else 10,
             current_page=int(current_page) if current_page else 1,
+            cursor=cursor,
         )
     return res
 
@@ -287,8 +331,8 @@ async def commitIteration(request: Request):
     service_iteration_id = data["service_iteration_id"]
     new_version = data["new_version"]
     user_id = userGetUserIdByAccessToken(request=request)
-    with session() as db:
-        res = await serviceCommitIteration(
+    async with async_session() as db:
+        res = await serviceCommitIterationAsync(
             db=db,
             service_iteration_id=service_iteration_id,
             new_version=new_version,
@@ -319,12 +363,22 @@ def updateDescription(request: Request):
 def exportOpenapiByUuidAndVersion(request: Request):
     service_uuid = request.query_params.get("service_uuid", None)
     version = request.query_params.get("version", None)
+    # 可选：json / yaml，只返回OpenAPI文档本身（支持gzip / br压缩传输）
+    format = request.query_params.get("format", None)
+    # 可选：true时分块传输，适用于api数量很多的service（YAML格式的最新版本不支持流式生成）
+    stream = string2Bool(request.query_params.get("stream", "false"))
     if not service_uuid or not version:
         return Response(
             status_code=400,
             description="service_uuid and version are required",
             headers={},
         )
+    if format not in (None, *OPENAPI_CONTENT_TYPES):
+        return Response(
+            status_code=400,
+            description="format must be json or yaml",
+            headers={},
+        )
     user_id = userGetUserIdByAccessToken(request=request)
     with session() as db:
         res = serviceExportOpenapiByUuidAndVersion(
@@ -332,5 +386,14 @@ def exportOpenapiByUuidAndVersion(request: Request):
             service_uuid=service_uuid,
             version=version,
             user_id=user_id,
+            stream=stream and format != "yaml",
         )
-    return res
+    if res.get("status") == 200 and "service_id" in res:
+        res["openapi_chunks"] = _streamLatestOpenapi(res["service_id"])
+    return openapiExportResponse(request, res, format, stream)
+
+
+# 流式生成最新版本的OpenAPI文档：响应返回后才逐段生成，需使用独立的session
+def _streamLatestOpenapi(service_id: int):
+    with session() as db:
+        yield from streamOpenapiTemplate(db, service_id)
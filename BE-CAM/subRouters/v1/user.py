@@ -1,15 +1,16 @@
-from services.user import userGetUserByUsernameOrNicknameOrEmail, userModifyPassword
 from robyn import SubRouter
 from robyn.robyn import Request, Response
 from robyn.authentication import BearerGetter
 
 from authentication import AuthHandler
-from database.database import session
+from database.database import async_session
 from services.user import (
     userGetUserIdByAccessToken,
-    userLogin,
-    userRegister,
-    userGetUserById,
+    userLoginAsync,
+    userRegisterAsync,
+    userGetUserByIdAsync,
+    userGetUserByUsernameOrNicknameOrEmailAsync,
+    userModifyPasswordAsync,
 )
 
 userRouterV1 = SubRouter(__file__, prefix="/v1/user")
@@ -35,8 +36,8 @@ async def getUserById(request: Request):
             description="id is required",
             headers={},
         )
-    with session() as db:
-        res = userGetUserById(db=db, id=int(id))
+    async with async_session() as db:
+        res = await userGetUserByIdAsync(db=db, id=int(id))
     return res
 
 
@@ -44,8 +45,8 @@ async def getUserById(request: Request):
 @userRouterV1.get("/getMyInfo", auth_required=True)
 async def getMyInfo(request: Request):
     user_id = userGetUserIdByAccessToken(request=request)
-    with session() as db:
-        res = userGetUserById(db=db, id=user_id)
+    async with async_session() as db:
+        res = await userGetUserByIdAsync(db=db, id=user_id)
     return res
 
 
@@ -61,8 +62,8 @@ async def getUserByUsernameOrNicknameOrEmail(request: Request):
             description="username_or_nickname_or_email is required",
             headers={},
         )
-    with session() as db:
-        res = userGetUserByUsernameOrNicknameOrEmail(
+    async with async_session() as db:
+        res = await userGetUserByUsernameOrNicknameOrEmailAsync(
             db=db,
             username_or_nickname_or_email=username_or_nickname_or_email,
         )
@@ -75,8 +76,8 @@ async def login(request: Request):
     data = request.json()
     username = data["username"]
     password = data["password"]
-    with session() as db:
-        res = userLogin(db=db, username=username, password=password)
+    async with async_session() as db:
+        res = await userLoginAsync(db=db, username=username, password=password)
     return res
 
 
@@ -89,8 +90,8 @@ async def register(request: Request):
     nickname = data["nickname"]
     email = data["email"]
     role = data["role"]
-    with session() as db:
-        res = userRegister(
+    async with async_session() as db:
+        res = await userRegisterAsync(
             db=db,
             username=username,
             password=password,
@@ -108,8 +109,8 @@ async def modifyPassword(request: Request):
     id = userGetUserIdByAccessToken(request=request)
     old_password = data["old_password"]
     new_password = data["new_password"]
-    with session() as db:
-        res = userModifyPassword(
+    async with async_session() as db:
+        res = await userModifyPasswordAsync(
             db=db,
             id=id,
             old_password=old_password,
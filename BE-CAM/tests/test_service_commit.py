@@ -0,0 +1,94 @@
+# 发布迭代的权限校验：非owner / creator的用户发布迭代时返回错误状态，而不是抛出异常
+# 不连接数据库：用内存中的假session返回迭代与用户，权限校验走真实的 checkServiceIterationPermission
+# 用法（在 BE-CAM 目录下）：
+#   uv run python -m tests.test_service_commit
+import asyncio
+from types import SimpleNamespace
+
+from database.enums import UserLevel
+from database.models import ServiceIteration, User
+from services import service as service_module
+from services.user import userInvalidateIdentity
+
+OWNER_ID = 1
+NON_MEMBER_ID = 2
+SERVICE_ITERATION_ID = 10
+
+
+class FakeSession:
+    def __init__(self):
+        self.objects = {
+            (ServiceIteration, SERVICE_ITERATION_ID): SimpleNamespace(
+                id=SERVICE_ITERATION_ID,
+                is_committed=False,
+                creator_id=OWNER_ID,
+                service_id=100,
+                service=SimpleNamespace(id=100, owner_id=OWNER_ID, version="0.0.1"),
+            ),
+            (User, NON_MEMBER_ID): SimpleNamespace(
+                id=NON_MEMBER_ID,
+                username="guest",
+                nickname="guest",
+                email="guest@example.com",
+                level=UserLevel.L1,
+            ),
+        }
+
+    def get(self, model, id):
+        return self.objects.get((model, id))
+
+
+class FakeAsyncSession:
+    def __init__(self):
+        self.sync_session = FakeSession()
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
+
+def _notCalled(*args, **kwargs):
+    raise AssertionError("commit side effects must not run for a rejected commit")
+
+
+def _commitAs(user_id: int, is_async: bool) -> dict:
+    userInvalidateIdentity(user_id)
+    notify = service_module.outbox_dispatcher.notify
+    service_module.outbox_dispatcher.notify = _notCalled
+    try:
+        if is_async:
+            return asyncio.run(
+                service_module.serviceCommitIterationAsync(
+                    db=FakeAsyncSession(),
+                    service_iteration_id=SERVICE_ITERATION_ID,
+                    new_version="0.0.2",
+                    user_id=user_id,
+                )
+            )
+        return asyncio.run(
+            service_module.serviceCommitIteration(
+                db=FakeSession(),
+                service_iteration_id=SERVICE_ITERATION_ID,
+                new_version="0.0.2",
+                user_id=user_id,
+            )
+        )
+    finally:
+        service_module.outbox_dispatcher.notify = notify
+
+
+def test_non_member_commit_returns_error():
+    res = _commitAs(NON_MEMBER_ID, is_async=False)
+    assert res["status"] == -30, res
+    assert "message" in res
+
+
+def test_non_member_commit_async_returns_error():
+    res = _commitAs(NON_MEMBER_ID, is_async=True)
+    assert res["status"] == -30, res
+    assert "message" in res
+
+
+if __name__ == "__main__":
+    for test in (test_non_member_commit_returns_error, test_non_member_commit_async_returns_error):
+        test()
+        print(f"{test.__name__}: ok")
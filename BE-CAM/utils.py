@@ -1,6 +1,17 @@
-# 版本号转换为数字，如1.0.0 -> 100
-from typing import List
+import codecs
+import gzip
+import hashlib
+import itertools
+import json
+import zlib
+from typing import List, Tuple
+from robyn import StreamingResponse, jsonify
+from robyn.robyn import Headers, Request, Response
+from services.projection import decodeCursor
+from services.utils import dumpOpenapiYaml
+
 
+# 版本号转换为数字，如1.0.0 -> 100
 
 def version2Number(version_str: str) -> int:
     try:
@@ -14,4 +25,173 @@ def version2Number(version_str: str) -> int:
 
 
 def string2Bool(str: str) -> bool:
-    return str.lower() == "true"
\ No newline at end of file
+    return str.lower() == "true"
+
+
+# 列表接口的分页游标：pagination=cursor 时使用游标分页，cursor为空表示第一页；否则返回None（按页码分页）
+# 游标格式错误时抛出ValueError
+def getPaginationCursor(request: Request) -> str | None:
+    if request.query_params.get("pagination", "page") != "cursor":
+        return None
+    cursor = request.query_params.get("cursor", "") or ""
+    if cursor:
+        decodeCursor(cursor)
+    return cursor
+
+
+# If-None-Match 是否命中ETag（忽略弱校验前缀W/）
+def _etagMatches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match") or ""
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+# 返回带强ETag的JSON响应：请求头If-None-Match与内容ETag一致时返回304，客户端直接复用本地副本
+# 只对成功响应（status为200）生效，其余原样返回
+def etagJsonResponse(request: Request, res: dict) -> Response | dict:
+    if res.get("status") != 200:
+        return res
+    body = jsonify(res)
+    etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+    headers = {
+        "ETag": etag,
+        # 需携带登录态访问，且历史版本可被删除后重新发布，客户端每次都需校验
+        "Cache-Control": "private, no-cache",
+    }
+    if _etagMatches(request, etag):
+        return Response(status_code=304, headers=headers, description="")
+    headers["Content-Type"] = "application/json"
+    return Response(status_code=200, headers=headers, description=body)
+
+
+OPENAPI_CONTENT_TYPES = {
+    "json": "application/json",
+    "yaml": "application/yaml",
+}
+
+
+# 流式导出时每次输出的解压数据量上限
+OPENAPI_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+# 逐块解压gzip数据并解码为文本（StreamingResponse只接受str；增量解码避免多字节字符被截断）
+def _gunzipTextChunks(data: bytes):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = data
+    while pending:
+        text = decoder.decode(
+            decompressor.decompress(pending, OPENAPI_STREAM_CHUNK_SIZE)
+        )
+        pending = decompressor.unconsumed_tail
+        if text:
+            yield text
+    text = decoder.decode(decompressor.flush(), final=True)
+    if text:
+        yield text
+
+
+# 导出openapi信封中文档前后的JSON文本
+def _openapiEnvelope(res: dict) -> Tuple[str, str]:
+    head = jsonify({"status": res["status"], "message": res["message"]})[:-1]
+    tail = jsonify({"is_latest": res["is_latest"]})[1:]
+    return f'{head},"openapi_object":', f",{tail}"
+
+
+def _openapiStreamResponse(
+    chunks, res: dict, format: str | None, headers: dict
+) -> StreamingResponse:
+    if format is None:
+        head, tail = _openapiEnvelope(res)
+        chunks = itertools.chain([head], chunks, [tail])
+    content_type = OPENAPI_CONTENT_TYPES[format or "json"]
+    return StreamingResponse(
+        chunks,
+        headers=Headers({**headers, "Content-Type": content_type}),
+        media_type=content_type,
+    )
+
+
+# 导出openapi的响应
+# - format为空：返回 {status, message, openapi_object, is_latest} 信封（与原接口一致），
+#   预生成的文档直接拼接到信封中，无需反序列化再序列化；ETag取自文档哈希，命中时不解压
+# - format为json / yaml：只返回OpenAPI文档本身，按Accept-Encoding直接返回预压缩的br / gzip内容
+# - stream为True：以分块传输（chunked）逐段输出未压缩的文档；最新版本由res中的openapi_chunks逐个api生成
+def openapiExportResponse(
+    request: Request, res: dict, format: str | None = None, stream: bool = False
+) -> Response | StreamingResponse | dict:
+    if res.get("status") != 200:
+        return res
+    document = res.get("openapi_document")
+    if document is None:
+        # 无预生成文档（最新版本），流式生成或即时序列化
+        if res.get("openapi_chunks") is not None:
+            return _openapiStreamResponse(res["openapi_chunks"], res, format, {})
+        if format is None:
+            return etagJsonResponse(request, res)
+        return _openapiFileResponse(request, res["openapi_object"], format)
+    if format is None:
+        etag = f'"{document["etag"][:32]}-envelope"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etagMatches(request, etag):
+            return Response(status_code=304, headers=headers, description="")
+        if stream:
+            return _openapiStreamResponse(
+                _gunzipTextChunks(document["json_gzip"]), res, format, headers
+            )
+        # 文档为紧凑JSON，直接嵌入信封
+        head, tail = _openapiEnvelope(res)
+        body = (
+            head.encode() + gzip.decompress(document["json_gzip"]) + tail.encode()
+        )
+        headers["Content-Type"] = "application/json"
+        return Response(status_code=200, headers=headers, description=body)
+    compressed = document["json_gzip"] if format == "json" else document["yaml_gzip"]
+    if compressed is None:
+        # brotli / PyYAML 成为必需依赖之前生成的文档没有YAML版本，由JSON即时转换
+        openapi = json.loads(gzip.decompress(document["json_gzip"]))
+        return _openapiFileResponse(request, openapi, format)
+    accept_encoding = request.headers.get("Accept-Encoding") or ""
+    encodings = {e.split(";")[0].strip() for e in accept_encoding.split(",")}
+    headers = {
+        "Content-Type": OPENAPI_CONTENT_TYPES[format],
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if format == "json" and document["json_br"] is not None and "br" in encodings:
+        headers["Content-Encoding"] = "br"
+        body = document["json_br"]
+    elif "gzip" in encodings:
+        headers["Content-Encoding"] = "gzip"
+        body = compressed
+    else:
+        body = None
+    etag = f'"{document["etag"][:32]}-{format}-{headers.get("Content-Encoding", "identity")}"'
+    headers["ETag"] = etag
+    if _etagMatches(request, etag):
+        return Response(status_code=304, headers=headers, description="")
+    if body is None:
+        # 客户端不接受压缩：解压后返回
+        if stream:
+            return _openapiStreamResponse(
+                _gunzipTextChunks(compressed), res, format, headers
+            )
+        body = gzip.decompress(compressed)
+    return Response(status_code=200, headers=headers, description=body)
+
+
+# 即时序列化OpenAPI文档（未预生成时）
+def _openapiFileResponse(request: Request, openapi: dict, format: str) -> Response:
+    if format == "json":
+        body = json.dumps(openapi, ensure_ascii=False, separators=(",", ":")).encode()
+    else:
+        body = dumpOpenapiYaml(openapi).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}-{format}"'
+    headers = {
+        "ETag": etag,
+        "Content-Type": OPENAPI_CONTENT_TYPES[format],
+        "Cache-Control": "private, no-cache",
+    }
+    if _etagMatches(request, etag):
+        return Response(status_code=304, headers=headers, description="")
+    return Response(status_code=200, headers=headers, description=body)
@@ -4,6 +4,8 @@ import type {
     GetAllCategoriesByServiceIdResponse,
     GetAllApisByServiceIdResponse,
     GetApiByIdResponse,
+    GetApiParamByPathRequest,
+    GetApiParamByPathResponse,
     AddCategoryByServiceIdRequest,
     AddCategoryByServiceIdResponse,
     DeleteCategoryByIdRequest,
@@ -16,8 +18,13 @@ import type {
     AddApiResponse,
     DeleteApiByApiDraftIdRequest,
     DeleteApiByApiDraftIdResponse,
+    CopyApiByApiDraftIdResponse,
+    CopyApiToServiceIterationRequest,
+    CopyApiToServiceIterationResponse,
     UpdateApiByApiDraftIdRequest,
     UpdateApiByApiDraftIdResponse,
+    PatchApiParamsByApiDraftIdRequest,
+    PatchApiParamsByApiDraftIdResponse,
 } from "./types";
 
 const prefix = "/v1/api";
@@ -48,6 +55,14 @@ export const GetApiById = async (api_id: number, is_latest?: boolean) => {
     return api.get<GetApiByIdResponse>(`${prefix}/getApiById`, params);
 };
 
+// 通过点分路径获取 api 的单个参数及其子参数（如响应参数中的 data.items）
+export const GetApiParamByPath = async (params: GetApiParamByPathRequest) => {
+    return api.get<GetApiParamByPathResponse>(
+        `${prefix}/getApiParamByPath`,
+        params
+    );
+};
+
 // 通过 service_id 新增 category
 export const AddCategoryByServiceId = async (
     data: AddCategoryByServiceIdRequest
@@ -95,7 +110,20 @@ export const AddApi = async (data: AddApiRequest) => {
 export const CopyApiByApiDraftId = async (
     data: DeleteApiByApiDraftIdRequest
 ) => {
-    return api.post<AddApiResponse>(`${prefix}/copyApiByApiDraftId`, data);
+    return api.post<CopyApiByApiDraftIdResponse>(
+        `${prefix}/copyApiByApiDraftId`,
+        data
+    );
+};
+
+// 将 API 复制到另一个迭代（可以是其他 service 的迭代，保留名称与路径）
+export const CopyApiToServiceIteration = async (
+    data: CopyApiToServiceIterationRequest
+) => {
+    return api.post<CopyApiToServiceIterationResponse>(
+        `${prefix}/copyApiToServiceIteration`,
+        data
+    );
 };
 
 // 删除 API 草稿
@@ -125,3 +153,17 @@ export const UpdateApiByApiDraftId = async (
         payload
     );
 };
+
+// 局部修改 API 草稿的请求/响应参数（只提交变更的操作），注意 ops 以字符串形式传递
+export const PatchApiParamsByApiDraftId = async (
+    data: PatchApiParamsByApiDraftIdRequest
+) => {
+    const payload = {
+        ...data,
+        ops: JSON.stringify(data.ops),
+    };
+    return api.post<PatchApiParamsByApiDraftIdResponse>(
+        `${prefix}/patchApiParamsByApiDraftId`,
+        payload
+    );
+};
@@ -58,6 +58,8 @@ export interface RequestParam {
     example?: string | null;
     array_child_type?: ParamType | null;
     parent_param_id?: number | null;
+    // 物化路径：从根参数到该参数的 id 序列，如 "12/34/56/"
+    tree_path?: string | null;
     children_params?: RequestParam[];
 }
 
@@ -72,6 +74,8 @@ export interface ResponseParam {
     example?: string | null;
     array_child_type?: ParamType | null;
     parent_param_id?: number | null;
+    // 物化路径：从根参数到该参数的 id 序列，如 "12/34/56/"
+    tree_path?: string | null;
     children_params?: ResponseParam[];
 }
 
@@ -102,6 +106,8 @@ export interface RequestParamDraft {
     example?: string | null;
     array_child_type?: ParamType | null;
     parent_param_id?: number | null;
+    // 物化路径：从根参数到该参数的 id 序列，如 "12/34/56/"
+    tree_path?: string | null;
     children_params?: RequestParamDraft[];
 }
 
@@ -116,6 +122,8 @@ export interface ResponseParamDraft {
     example?: string | null;
     array_child_type?: ParamType | null;
     parent_param_id?: number | null;
+    // 物化路径：从根参数到该参数的 id 序列，如 "12/34/56/"
+    tree_path?: string | null;
     children_params?: ResponseParamDraft[];
 }
 
@@ -171,6 +179,25 @@ export interface GetApiByIdResponse extends BaseResponse {
     api: ApiDetail | ApiDraftDetail;
 }
 
+export interface GetApiParamByPathRequest {
+    api_id: number;
+    kind: PatchApiParamKind;
+    path: string; // 点分路径，如 "data.items.name"
+    location?: ParamLocation; // 限定请求参数的根参数
+    status_code?: number; // 限定响应参数的根参数
+    is_latest?: boolean; // 默认 true
+}
+
+export interface GetApiParamByPathResponse extends BaseResponse {
+    param:
+        | RequestParam
+        | ResponseParam
+        | RequestParamDraft
+        | ResponseParamDraft;
+    // 子孙参数数（不含自身）
+    descendant_count: number;
+}
+
 export interface AddCategoryByServiceIdRequest {
     service_id: number;
     category_name: string;
@@ -226,6 +253,22 @@ export interface DeleteApiByApiDraftIdRequest {
 
 export type DeleteApiByApiDraftIdResponse = BaseResponse;
 
+export interface CopyApiByApiDraftIdResponse extends BaseResponse {
+    api_draft_id: number;
+}
+
+export interface CopyApiToServiceIterationRequest {
+    service_iteration_id: number;
+    api_draft_id: number;
+    // 目标迭代（可以属于其他 service）
+    target_service_iteration_id: number;
+    // 目标 service 中的分类，不传则不分类
+    category_id?: number | null;
+}
+
+// api_draft_id 为目标迭代中新建的 API 草稿
+export type CopyApiToServiceIterationResponse = CopyApiByApiDraftIdResponse;
+
 // 更新 API 草稿时携带的参数输入结构（会被 stringify 传给后端）
 export interface ApiReqParamInput {
     name: string;
@@ -263,3 +306,53 @@ export interface UpdateApiByApiDraftIdRequest {
 }
 
 export type UpdateApiByApiDraftIdResponse = BaseResponse;
+
+// 局部修改 API 草稿参数的操作（按顺序执行，任一操作失败则全部回滚）
+export type PatchApiParamKind = "req" | "resp";
+
+export type PatchApiParamOp =
+    | {
+          op: "add";
+          kind: "req";
+          parent_id: number | null; // null 表示新增根参数
+          param: ApiReqParamInput;
+      }
+    | {
+          op: "add";
+          kind: "resp";
+          parent_id: number | null;
+          param: ApiRespParamInput;
+      }
+    | { op: "remove"; kind: PatchApiParamKind; id: number }
+    | {
+          op: "replace";
+          kind: PatchApiParamKind;
+          id: number;
+          // 只修改传入的字段，不影响子参数
+          fields: Partial<Omit<ApiReqParamInput & ApiRespParamInput, "children">>;
+      }
+    | {
+          op: "move";
+          kind: PatchApiParamKind;
+          id: number;
+          parent_id: number | null; // null 表示移动为根参数
+      };
+
+export interface PatchApiParamsByApiDraftIdRequest {
+    service_iteration_id: number;
+    api_draft_id: number;
+    ops: PatchApiParamOp[];
+}
+
+export interface PatchApiParamsByApiDraftIdResponse extends BaseResponse {
+    // 未物化的 api（负数 id）会先物化，之后的编辑使用返回的 api_draft_id
+    api_draft_id: number;
+    // 变更后的子树（只包含最外层的变更参数）
+    params: {
+        req?: RequestParamDraft[];
+        resp?: ResponseParamDraft[];
+    };
+    removed_ids: Partial<Record<PatchApiParamKind, number[]>>;
+    // 物化时参数 id 的变化：原参数 id -> 新参数 id
+    param_id_mapping: Partial<Record<PatchApiParamKind, Record<string, number>>>;
+}
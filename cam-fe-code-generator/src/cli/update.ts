@@ -6,5 +6,6 @@ export const registerUpdateCommand = (program: Command) => {
     program
         .command("update")
         .description("Update and generate code for all services")
+        .option("-f, --force", "Regenerate code for all services")
         .action(loginRequired(pullAllApisInAllServices));
 };
@@ -1,6 +1,6 @@
 import axios, { AxiosHeaders } from "axios";
 import type { AxiosError, AxiosInstance, AxiosRequestConfig } from "axios";
-import { TokenManager } from "../utils/data-manager";
+import { ResponseCacheManager, TokenManager } from "../utils/data-manager";
 import { UserProfile } from "../services/apis/user/types";
 
 const BASE_URL = "https://cam-api.com/api";
@@ -33,36 +33,87 @@ http.interceptors.request.use(
     (error) => Promise.reject(error)
 );
 
+// 请求失败时的错误：status 为 HTTP 状态码，网络错误、超时等未收到响应时为 undefined
+export class HttpError extends Error {
+    readonly status: number | undefined;
+
+    constructor(message: string, status: number | undefined) {
+        super(message);
+        this.name = "HttpError";
+        this.status = status;
+    }
+
+    // 模板字符串与 console 输出与直接 reject message 时一致
+    toString(): string {
+        return this.message;
+    }
+
+    [Symbol.for("nodejs.util.inspect.custom")](): string {
+        return this.message;
+    }
+}
+
+// 可重试的请求错误：网络错误 / 超时（未收到响应）、5xx、429；其他错误（如 400、401）重试也不会成功
+export const isRetryableError = (error: unknown): boolean =>
+    error instanceof HttpError &&
+    (error.status === undefined || error.status >= 500 || error.status === 429);
+
 // 响应拦截器：统一错误格式
 http.interceptors.response.use(
     (response) => response,
     (error: AxiosError) => {
         const status = error?.response?.status;
         const message = error.message || "Request error";
-        // 处理 401 ：清除 token 和用户信息缓存
+        // 处理 401 ：清除 token 和用户信息缓存（已清除时不再重复提示）
         if (status === 401) {
             const tokenManager = TokenManager.getInstance();
-            if (!tokenManager.getToken()) {
-                return;
+            if (tokenManager.getToken()) {
+                tokenManager.setToken("");
+                tokenManager.setUser({} as UserProfile);
+                console.warn("User token expired, please login again.");
             }
-            tokenManager.setToken("");
-            tokenManager.setUser({} as UserProfile);
-            console.warn("User token expired, please login again.");
         } else {
             console.error("API Error:", message);
         }
 
-        return Promise.reject(message);
+        return Promise.reject(new HttpError(message, status));
     }
 );
 
 // 封装常用请求方法（返回 data）
+// GET 请求：服务端返回 ETag 时缓存响应，再次请求携带 If-None-Match，304 时复用本地副本
+// useCache 为 false 时不读写缓存（如体积较大、已由代码生成清单判断是否变化的批量详情接口）
 const get = async <T = unknown>(
     url: string,
     params?: Record<string, unknown>,
-    config?: AxiosRequestConfig
+    config?: AxiosRequestConfig,
+    useCache: boolean = true
 ): Promise<T> => {
-    const res = await http.get<T>(url, { ...config, params });
+    if (!useCache) {
+        const res = await http.get<T>(url, { ...config, params });
+        return res.data as T;
+    }
+    const responseCache = ResponseCacheManager.getInstance();
+    const cacheKey = `${url}?${JSON.stringify(params || {})}`;
+    const cached = responseCache.get(cacheKey);
+    const headers = AxiosHeaders.from(config?.headers || {});
+    if (cached) {
+        headers.set("If-None-Match", cached.etag);
+    }
+    const res = await http.get<T>(url, {
+        ...config,
+        params,
+        headers,
+        validateStatus: (status) =>
+            (status >= 200 && status < 300) || status === 304,
+    });
+    if (res.status === 304 && cached) {
+        return cached.data as T;
+    }
+    const etag = res.headers["etag"];
+    if (typeof etag === "string" && etag) {
+        responseCache.set(cacheKey, etag, res.data);
+    }
     return res.data as T;
 };
 
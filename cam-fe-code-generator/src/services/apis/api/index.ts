@@ -4,6 +4,10 @@ import type {
     GetAllCategoriesByServiceIdResponse,
     GetAllApisByServiceIdResponse,
     GetApiByIdResponse,
+    GetApiDetailsByServiceUuidAndVersionResponse,
+    GetApiDetailsByIdsResponse,
+    GetServiceVersionChangesResponse,
+    ServiceVersionHash,
     AddCategoryByServiceIdRequest,
     AddCategoryByServiceIdResponse,
     DeleteCategoryByIdRequest,
@@ -48,6 +52,48 @@ export const GetApiById = async (api_id: number, is_latest?: boolean) => {
     return api.get<GetApiByIdResponse>(`${prefix}/getApiById`, params);
 };
 
+// 通过 service_uuid 和 version 分页获取该版本全部 api 详情（包含 params）；cursor 取上一页返回的 next_cursor
+export const GetApiDetailsByServiceUuidAndVersion = async (
+    service_uuid: string,
+    version: string,
+    cursor?: string | null,
+    page_size?: number
+) => {
+    const params: Record<string, unknown> = { service_uuid, version };
+    if (cursor) params.cursor = cursor;
+    if (page_size !== undefined) params.page_size = page_size;
+    // 分页详情体积较大，是否变化由代码生成清单判断，不写入响应缓存
+    return api.get<GetApiDetailsByServiceUuidAndVersionResponse>(
+        `${prefix}/getApiDetailsByServiceUuidAndVersion`,
+        params,
+        undefined,
+        false
+    );
+};
+
+// 通过 api_id 列表批量获取 api 详情（包含 params）；is_latest 缺省为 true
+export const GetApiDetailsByIds = async (
+    api_ids: number[],
+    is_latest?: boolean
+) => {
+    const params: Record<string, unknown> = { api_ids: api_ids.join(",") };
+    if (is_latest !== undefined) params.is_latest = is_latest;
+    return api.get<GetApiDetailsByIdsResponse>(
+        `${prefix}/getApiDetailsByIds`,
+        params
+    );
+};
+
+// 一次性查询多个服务版本的内容是否变化（services 以字符串形式传递）
+export const GetServiceVersionChanges = async (
+    services: ServiceVersionHash[]
+) => {
+    return api.post<GetServiceVersionChangesResponse>(
+        `${prefix}/getServiceVersionChanges`,
+        { services: JSON.stringify(services) }
+    );
+};
+
 // 通过 service_id 新增 category
 export const AddCategoryByServiceId = async (
     data: AddCategoryByServiceIdRequest
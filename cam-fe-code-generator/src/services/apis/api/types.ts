@@ -171,6 +171,36 @@ export interface GetApiByIdResponse extends BaseResponse {
     api: ApiDetail | ApiDraftDetail;
 }
 
+export interface GetApiDetailsByServiceUuidAndVersionResponse
+    extends BaseResponse {
+    is_latest: boolean;
+    apis: (ApiDetail | ApiDraftDetail)[];
+    next_cursor: string | null; // 没有下一页时为 null
+    total: number;
+}
+
+export interface ServiceVersionHash {
+    service_uuid: string;
+    version: string;
+    hash?: string | null; // 上次拉取时记录的内容哈希
+}
+
+export interface ServiceVersionChange extends BaseResponse {
+    service_uuid: string;
+    version: string;
+    hash: string | null; // 当前内容哈希；服务版本不存在或无权限查看时为 null
+    changed: boolean;
+}
+
+export interface GetServiceVersionChangesResponse extends BaseResponse {
+    services: ServiceVersionChange[];
+}
+
+export interface GetApiDetailsByIdsResponse extends BaseResponse {
+    apis: (ApiDetail | ApiDraftDetail)[];
+    failed_api_ids: number[]; // 不存在或无权限查看的 api
+}
+
 export interface AddCategoryByServiceIdRequest {
     service_id: number;
     category_name: string;
@@ -2,13 +2,28 @@ import * as fs from "fs";
 import * as path from "path";
 import { CONFIG_FILE_NAME } from "../../templates/init";
 import { GetServiceByUuidAndVersion } from "../apis/service";
-import { GetApiById } from "../apis/api";
+import {
+    GetApiDetailsByServiceUuidAndVersion,
+    GetServiceVersionChanges,
+} from "../apis/api";
 import { ApiDetail } from "../apis/api/types";
 import { ApiDraftDetail } from "../apis/api/types";
+import {
+    GetApiDetailsByServiceUuidAndVersionResponse,
+    ServiceVersionChange,
+    ServiceVersionHash,
+} from "../apis/api/types";
 import { generateTSCode } from "./generator";
 import { ApiOption, serviceClassCode } from "../../templates/service-class";
-import { formatCodeByPrettier } from "../../utils/utils";
+import {
+    StageTimer,
+    createPool,
+    formatCodeByPrettier,
+    withRetry,
+} from "../../utils/utils";
 import { requestDemoCode } from "../../templates/request-demo";
+import { ManifestManager } from "../../utils/data-manager";
+import { VERSION } from "../../version";
 
 const autoGeneratePrefix = `
 // THIS IS AN AUTOGENERATED FILE. DO NOT EDIT THIS FILE DIRECTLY.
@@ -100,8 +115,112 @@ export const removeService = async (serviceName: string) => {
     }
 };
 
+// 拉取全部api详情时同时进行中的请求数上限（cam.config.json中的fetchConcurrency可覆盖）
+const DEFAULT_FETCH_CONCURRENCY = 4;
+// 单个请求失败后的重试次数
+const FETCH_RETRIES = 3;
+
+interface GeneratedFile {
+    filePath: string;
+    code: string;
+}
+
+// 拉取一个服务版本全部api的详情并生成（未格式化的）代码，失败时返回null
+// 分页请求按游标依次发出，每个请求占用一个请求池名额；每页到达后立即生成该页api的代码，与其他请求重叠进行
+const fetchServiceCode = async (
+    name: string,
+    service_uuid: string,
+    version: string,
+    outputDir: string,
+    runInPool: ReturnType<typeof createPool>,
+    timer: StageTimer,
+    stats: { requests: number; retries: number }
+): Promise<GeneratedFile[] | null> => {
+    let namespaceCode = autoGeneratePrefix;
+    let apiOptions: ApiOption[] = []; // 存放当前service全部api的一些信息
+    try {
+        let cursor: string | null = null;
+        let logged = false;
+        do {
+            const pageCursor: string | null = cursor;
+            const res: GetApiDetailsByServiceUuidAndVersionResponse =
+                await runInPool(() =>
+                    withRetry(
+                        () => {
+                            stats.requests++;
+                            return GetApiDetailsByServiceUuidAndVersion(
+                                service_uuid,
+                                version,
+                                pageCursor
+                            );
+                        },
+                        FETCH_RETRIES,
+                        300,
+                        () => {
+                            stats.retries++;
+                        }
+                    )
+                );
+            if (res.status !== 200) {
+                throw new Error(res.message);
+            }
+            if (!logged) {
+                console.log(
+                    `Service ${name} has ${res.total} api${res.total === 1 ? "" : "s"}`
+                );
+                logged = true;
+            }
+            await timer.time("generate", async () => {
+                for (const apiDetail of res.apis) {
+                    // 生成当前api的namespace代码
+                    const { namespaceCodeForThisApi, apiOption } =
+                        await generateNamespaceCodeByApiDetail(apiDetail);
+                    namespaceCode += `\n\n${namespaceCodeForThisApi}`;
+                    apiOptions.push(apiOption);
+                }
+            });
+            cursor = res.next_cursor;
+        } while (cursor);
+    } catch (error) {
+        console.error(`Failed to get service info for service ${name}: ${error}`);
+        return null;
+    }
+    return [
+        // 统一生成namespaces.ts
+        { filePath: path.join(outputDir, "namespaces.ts"), code: namespaceCode },
+        // 统一生成index.ts
+        {
+            filePath: path.join(outputDir, "index.ts"),
+            code: `${autoGeneratePrefix}\n${serviceClassCode(name, apiOptions)}`,
+        },
+    ];
+};
+
+// 查询各服务版本相对清单中记录的内容哈希是否变化；查询失败时视为全部变化
+const getServiceVersionChanges = async (
+    services: ServiceVersionHash[]
+): Promise<(ServiceVersionChange | null)[]> => {
+    if (services.length === 0) {
+        return [];
+    }
+    try {
+        const res = await GetServiceVersionChanges(services);
+        if (res.status === 200) {
+            return res.services;
+        }
+        console.warn(`Failed to check service changes: ${res.message}`);
+    } catch (error) {
+        console.warn(`Failed to check service changes: ${error}`);
+    }
+    return services.map(() => null);
+};
+
 // 入口：基于cam.config.json中存储的service信息，拉取全部service的全部api
-export const pullAllApisInAllServices = async () => {
+// 输出目录中的清单记录了每个服务已生成代码对应的内容哈希，只有内容变化的服务才会重新拉取和生成；force为true时全部重新生成
+export const pullAllApisInAllServices = async (
+    options: { force?: boolean } = {}
+) => {
+    const timer = new StageTimer();
     const config = readConfig();
     if (!config.services || Object.keys(config.services).length === 0) {
         console.warn(
@@ -109,16 +228,37 @@ export const pullAllApisInAllServices = async () => {
         );
         process.exit(1);
     }
-    // 清空cam-auto-generate目录下的所有文件
     const outDir = config.outDir || ".";
-    if (fs.existsSync(outDir)) {
-        // 递归删除整个目录及其内容
+    // CLI版本或生成配置变化时，已生成的代码全部失效
+    const generator = JSON.stringify({
+        version: VERSION,
+        generateConfig: config.generateConfig || {},
+    });
+    let manifest = new ManifestManager(outDir);
+    const force = options.force || manifest.getGenerator() !== generator;
+    if (force && fs.existsSync(outDir)) {
+        // 清空cam-auto-generate目录下的所有文件（递归删除整个目录及其内容）
         fs.rmSync(outDir, { recursive: true, force: true });
     }
-    // 重新创建一个干净的目录
     fs.mkdirSync(outDir, { recursive: true });
+    if (force) {
+        manifest = new ManifestManager(outDir);
+    }
+    manifest.setGenerator(generator);
+
+    // 删除已从cam.config.json中移除的service的代码
+    for (const name of manifest.names()) {
+        if (!(name in config.services)) {
+            fs.rmSync(path.join(outDir, name), {
+                recursive: true,
+                force: true,
+            });
+            manifest.delete(name);
+        }
+    }
 
-    // 遍历cam.config.json中存储的service信息，拉取全部service的全部api
+    const services: { name: string; service_uuid: string; version: string }[] =
+        [];
     for (const [name, UuidAndVersion] of Object.entries(config.services)) {
         const [service_uuid, version] = (UuidAndVersion as string).split("@");
         if (!service_uuid || !version) {
@@ -127,83 +267,94 @@ export const pullAllApisInAllServices = async () => {
             );
             continue;
         }
+        services.push({ name, service_uuid, version });
+    }
+    // 一次请求查询全部service的内容是否变化；清单中的记录与当前配置不一致或代码文件缺失时不携带哈希
+    const hashes = services.map(({ name, service_uuid, version }) => {
+        const entry = manifest.get(name);
+        const outputDir = path.join(outDir, name);
+        const generated =
+            fs.existsSync(path.join(outputDir, "namespaces.ts")) &&
+            fs.existsSync(path.join(outputDir, "index.ts"));
+        const hash =
+            entry &&
+            generated &&
+            entry.service_uuid === service_uuid &&
+            entry.version === version
+                ? entry.hash
+                : null;
+        return { service_uuid, version, hash };
+    });
+    const changes = await timer.time("check", () =>
+        getServiceVersionChanges(hashes)
+    );
 
-        // 一个service确定一个输出目录
-        const outputDir = path.join(outDir || ".", name);
-        // 确认输出目录存在
-        if (!fs.existsSync(outputDir)) {
-            fs.mkdirSync(outputDir, { recursive: true });
-        }
-        let namespaceCode = autoGeneratePrefix;
-        let apiOptions: ApiOption[] = []; // 存放当前service全部api的一些信息
-        // 拉取service信息
-        try {
-            const serviceRes = await GetServiceByUuidAndVersion(
-                service_uuid,
-                version
-            );
-            if (serviceRes.status !== 200) {
-                console.warn(
-                    `Failed to get service info for service ${name}: ${serviceRes.message}`
-                );
-                continue;
+    // 只拉取内容变化的service的全部api：各service并发拉取（请求总数受请求池限制），代码生成与拉取重叠进行
+    const runInPool = createPool(
+        Math.max(Number(config.fetchConcurrency) || DEFAULT_FETCH_CONCURRENCY, 1)
+    );
+    const stats = { requests: 0, retries: 0 };
+    const fetchStart = performance.now();
+    const results = await Promise.all(
+        services.map(async ({ name, service_uuid, version }, i) => {
+            const change = changes[i];
+            if (change && !change.changed) {
+                console.log(`Service ${name} is up to date`);
+                return null;
             }
-            const apis =
-                "apis" in serviceRes.service
-                    ? serviceRes.service.apis
-                    : "api_drafts" in serviceRes.service
-                      ? serviceRes.service.api_drafts || []
-                      : [];
-            const isLatest = serviceRes.is_latest;
-            console.log(
-                `Service ${name} has ${apis.length} api${apis.length === 1 ? "" : "s"}`
+            // 一个service确定一个输出目录
+            const outputDir = path.join(outDir, name);
+            const files = await fetchServiceCode(
+                name,
+                service_uuid,
+                version,
+                outputDir,
+                runInPool,
+                timer,
+                stats
             );
-
-            // 获取api的参数信息
-            for (const api of apis) {
-                const apiRes = await GetApiById(api.id, isLatest);
-                if (apiRes.status !== 200) {
-                    console.warn(
-                        `Failed to get api info for api ${api.name} in service ${name}: ${apiRes.message}`
-                    );
-                    continue;
-                }
-                const apiDetail = apiRes.api as ApiDetail | ApiDraftDetail;
-
-                // 生成当前api的namespace代码
-                const { namespaceCodeForThisApi, apiOption } =
-                    await generateNamespaceCodeByApiDetail(apiDetail);
-                namespaceCode += `\n\n${namespaceCodeForThisApi}`;
-                apiOptions.push(apiOption);
+            if (files && change && change.hash) {
+                manifest.set(name, { service_uuid, version, hash: change.hash });
+            } else {
+                manifest.delete(name);
             }
-        } catch (error) {
-            console.error(
-                `Failed to get service info for service ${name}: ${error}`
-            );
-            continue;
-        }
-
-        // 统一生成namespaces.ts
-        fs.writeFileSync(
-            path.join(outputDir, "namespaces.ts"),
-            await formatCodeByPrettier(namespaceCode)
-        );
-        // 统一生成index.ts
-        const code = await formatCodeByPrettier(
-            `${autoGeneratePrefix}\n${serviceClassCode(name, apiOptions)}`
-        );
-        fs.writeFileSync(path.join(outputDir, "index.ts"), code);
-    }
+            return files;
+        })
+    );
+    timer.add(
+        `fetch (${stats.requests} requests, ${stats.retries} retries)`,
+        performance.now() - fetchStart
+    );
+    const files = results.flatMap((serviceFiles) => serviceFiles || []);
 
-    // 生成request-demo.ts（已格式化）
+    // 生成request-demo.ts
     const demoServiceName = Object.keys(config.services)[0];
     if (!demoServiceName) {
         process.exit(1);
     }
-    const code = await formatCodeByPrettier(requestDemoCode(demoServiceName));
-    fs.writeFileSync(path.join(outDir || ".", "request-demo.ts"), code);
+    const demoPath = path.join(outDir, "request-demo.ts");
+    if (
+        manifest.getDemoServiceName() !== demoServiceName ||
+        !fs.existsSync(demoPath)
+    ) {
+        files.push({ filePath: demoPath, code: requestDemoCode(demoServiceName) });
+        manifest.setDemoServiceName(demoServiceName);
+    }
+
+    // 全部文件拉取完成后统一格式化、写入
+    const formatted = await timer.time("format", () =>
+        Promise.all(files.map(({ code }) => formatCodeByPrettier(code)))
+    );
+    await timer.time("write", () => {
+        files.forEach(({ filePath }, i) => {
+            fs.mkdirSync(path.dirname(filePath), { recursive: true });
+            fs.writeFileSync(filePath, formatted[i]!);
+        });
+        manifest.save();
+    });
 
-    console.log(`All services' apis have been generated in ${outDir || "."}.`);
+    console.log(`All services' apis have been generated in ${outDir}.`);
+    console.log(`Timing: ${timer.report()}`);
 };
 
 const generateNamespaceCodeByApiDetail = async (
@@ -70,3 +70,187 @@ export class TokenManager {
         }
     }
 }
+
+const RESPONSE_CACHE_FILE = ".cam-cache.json";
+// 缓存上限：超出时按最近使用时间淘汰最久未使用的响应（LRU）
+const RESPONSE_CACHE_MAX_ENTRIES = 200;
+const RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024;
+
+interface CachedResponse {
+    etag: string;
+    data: unknown;
+}
+
+// 带ETag的GET响应缓存：再次请求时携带If-None-Match，服务端返回304时直接复用本地副本
+// 条目按最近使用的先后顺序存放（对象的键保持插入顺序，命中时移到末尾），写入文件时只保留最近使用的条目，
+// 条目数不超过 RESPONSE_CACHE_MAX_ENTRIES，文件大小不超过 RESPONSE_CACHE_MAX_BYTES
+export class ResponseCacheManager {
+    private static instance: ResponseCacheManager;
+    private cachePath: string;
+    private cache: Record<string, CachedResponse> | null = null;
+    private dirty = false;
+
+    // 确保单例
+    private constructor() {
+        this.cachePath = path.join(os.homedir(), RESPONSE_CACHE_FILE);
+    }
+
+    public static getInstance(): ResponseCacheManager {
+        if (!ResponseCacheManager.instance) {
+            ResponseCacheManager.instance = new ResponseCacheManager();
+        }
+        return ResponseCacheManager.instance;
+    }
+
+    private readCache(): Record<string, CachedResponse> {
+        if (this.cache) {
+            return this.cache;
+        }
+        this.cache = {};
+        if (fs.existsSync(this.cachePath)) {
+            try {
+                this.cache = JSON.parse(
+                    fs.readFileSync(this.cachePath, "utf-8")
+                );
+            } catch (error) {
+                this.cache = {};
+            }
+        }
+        return this.cache!;
+    }
+
+    get(key: string): CachedResponse | null {
+        const cache = this.readCache();
+        const entry = cache[key];
+        if (!entry) {
+            return null;
+        }
+        // 命中的条目移到末尾（最近使用）
+        delete cache[key];
+        cache[key] = entry;
+        this.markDirty();
+        return entry;
+    }
+
+    set(key: string, etag: string, data: unknown): void {
+        const cache = this.readCache();
+        delete cache[key];
+        cache[key] = { etag, data };
+        this.markDirty();
+    }
+
+    // 批量拉取时逐条写文件代价较高，进程退出前统一写入
+    private markDirty(): void {
+        if (!this.dirty) {
+            this.dirty = true;
+            process.once("exit", () => this.flush());
+        }
+    }
+
+    // 从最近使用的条目开始保留，直到达到条目数或文件大小上限，其余条目淘汰
+    flush(): void {
+        const cache = this.cache;
+        if (!this.dirty || !cache) {
+            return;
+        }
+        const kept: string[] = [];
+        let bytes = 2;
+        for (const key of Object.keys(cache).reverse()) {
+            if (kept.length >= RESPONSE_CACHE_MAX_ENTRIES) {
+                break;
+            }
+            const item = `${JSON.stringify(key)}:${JSON.stringify(cache[key])}`;
+            const size = Buffer.byteLength(item) + 1;
+            if (bytes + size > RESPONSE_CACHE_MAX_BYTES) {
+                continue;
+            }
+            kept.push(item);
+            bytes += size;
+        }
+        fs.writeFileSync(this.cachePath, `{${kept.reverse().join(",")}}`, {
+            mode: 0o600,
+        });
+        this.dirty = false;
+    }
+
+    clearCache(): void {
+        this.cache = {};
+        this.dirty = false;
+        if (fs.existsSync(this.cachePath)) {
+            fs.unlinkSync(this.cachePath);
+        }
+    }
+}
+
+const MANIFEST_FILE = ".cam-manifest.json";
+
+export interface ManifestEntry {
+    service_uuid: string;
+    version: string;
+    hash: string; // 服务端返回的该版本内容哈希
+}
+
+interface Manifest {
+    generator?: string; // 生成代码的 CLI 版本与生成配置，变化时全部重新生成
+    demoServiceName?: string;
+    services: Record<string, ManifestEntry>;
+}
+
+// 代码生成清单：记录输出目录中每个服务的生成代码对应的 (service_uuid, version, 内容哈希)
+// cam update 时只重新拉取、生成内容有变化的服务；清单存放在输出目录中，删除输出目录即全部重新生成
+export class ManifestManager {
+    private manifestPath: string;
+    private manifest: Manifest;
+
+    constructor(outDir: string) {
+        this.manifestPath = path.join(outDir, MANIFEST_FILE);
+        this.manifest = { services: {} };
+        if (fs.existsSync(this.manifestPath)) {
+            try {
+                const content = fs.readFileSync(this.manifestPath, "utf-8");
+                this.manifest = { services: {}, ...JSON.parse(content) };
+            } catch (error) {
+                this.manifest = { services: {} };
+            }
+        }
+    }
+
+    getGenerator(): string | null {
+        return this.manifest.generator || null;
+    }
+
+    setGenerator(generator: string): void {
+        this.manifest.generator = generator;
+    }
+
+    getDemoServiceName(): string | null {
+        return this.manifest.demoServiceName || null;
+    }
+
+    setDemoServiceName(name: string): void {
+        this.manifest.demoServiceName = name;
+    }
+
+    get(name: string): ManifestEntry | null {
+        return this.manifest.services[name] || null;
+    }
+
+    set(name: string, entry: ManifestEntry): void {
+        this.manifest.services[name] = entry;
+    }
+
+    delete(name: string): void {
+        delete this.manifest.services[name];
+    }
+
+    names(): string[] {
+        return Object.keys(this.manifest.services);
+    }
+
+    save(): void {
+        fs.writeFileSync(
+            this.manifestPath,
+            JSON.stringify(this.manifest, null, 2) + "\n"
+        );
+    }
+}
@@ -1,6 +1,7 @@
 import prettier from "prettier";
 import { login } from "../cli/user";
 import { TokenManager } from "./data-manager";
+import { isRetryableError } from "../request";
 
 export const loginRequired = (fn: (...args: any[]) => Promise<void> | void) => {
     return async (...args: any[]) => {
@@ -70,3 +71,80 @@ export const formatCodeByPrettier = async (code: string) => {
     }
     return formattedCode;
 };
+
+// 并发数受限的任务池：同时执行的任务不超过 limit 个，其余按提交顺序排队
+export const createPool = (limit: number) => {
+    let active = 0;
+    const queue: (() => void)[] = [];
+    const next = () => {
+        if (active >= limit || queue.length === 0) {
+            return;
+        }
+        active++;
+        queue.shift()!();
+    };
+    return <T>(task: () => Promise<T>): Promise<T> =>
+        new Promise<T>((resolve, reject) => {
+            queue.push(() => {
+                task()
+                    .then(resolve, reject)
+                    .finally(() => {
+                        active--;
+                        next();
+                    });
+            });
+            next();
+        });
+};
+
+// 失败时按指数退避重试（带随机抖动），最多重试 retries 次
+// 只重试 shouldRetry 判定为可重试的错误（默认为网络错误、5xx 与 429），其他错误直接抛出
+export const withRetry = async <T>(
+    task: () => Promise<T>,
+    retries: number = 3,
+    baseDelayMs: number = 300,
+    onRetry?: (attempt: number, error: unknown) => void,
+    shouldRetry: (error: unknown) => boolean = isRetryableError
+): Promise<T> => {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await task();
+        } catch (error) {
+            if (attempt >= retries || !shouldRetry(error)) {
+                throw error;
+            }
+            onRetry?.(attempt + 1, error);
+            const delay = baseDelayMs * 2 ** attempt * (0.5 + Math.random());
+            await new Promise((resolve) => setTimeout(resolve, delay));
+        }
+    }
+};
+
+// 分阶段计时：同一阶段多次计时累加，report 按阶段首次出现的顺序输出
+export class StageTimer {
+    private stages = new Map<string, number>();
+    private startedAt = performance.now();
+
+    add(stage: string, ms: number): void {
+        this.stages.set(stage, (this.stages.get(stage) || 0) + ms);
+    }
+
+    async time<T>(stage: string, task: () => Promise<T> | T): Promise<T> {
+        const start = performance.now();
+        try {
+            return await task();
+        } finally {
+            this.add(stage, performance.now() - start);
+        }
+    }
+
+    report(): string {
+        const parts = [...this.stages].map(
+            ([stage, ms]) => `${stage} ${(ms / 1000).toFixed(2)}s`
+        );
+        parts.push(
+            `total ${((performance.now() - this.startedAt) / 1000).toFixed(2)}s`
+        );
+        return parts.join(" | ");
+    }
+}